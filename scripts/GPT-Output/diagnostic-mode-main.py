@@ -6,6 +6,12 @@ CONFIG_FILE = "config.json"
 BAR_WIDTH = 32
 UPDATE_HZ = 5
 
+# Raw capture for the host calibration tool (scripts/calibrate_sticks.py):
+# prints only "RAW,<ms>,LX,LY,RX,RY,LT,RT" lines of 16-bit ADC values
+# (-1 for axes that aren't wired) at CAPTURE_HZ
+RAW_CAPTURE = False
+CAPTURE_HZ = 100
+
 def _resolve_pin(label):
     label = (label or "").strip()
     if "(" in label and ")" in label:
@@ -32,6 +38,7 @@ AXES    = mapping.get("axes", {})
 config  = _load_json(CONFIG_FILE, {})
 INV     = config.get("invert", {})
 DZ      = config.get("deadzone", {})
+CTR     = config.get("center", {})
 TCFG    = config.get("triggers", {})
 
 # ---- Setup I/O ----
@@ -71,8 +78,9 @@ def axis_calibrated(name, ain_obj):
     # invert
     if INV.get(name, False):
         val = 255 - val
-    # deadzone for sticks
+    # recenter + deadzone for sticks
     if name in DZ:
+        val = max(0, min(255, val - int(CTR.get(name, 128)) + 128))
         dz = int(DZ[name])
         if abs(val - 128) < dz:
             val = 128
@@ -96,6 +104,15 @@ def bar(val, width=BAR_WIDTH, lo=0, hi=255, center=None):
     right = int(max(0, (val - center) * width / (2.0 * (hi - center + 1))))
     return "<" * left + "|" + ">" * right + "." * (width - (left + right + 1))
 
+if RAW_CAPTURE:
+    capture_keys = ("LX","LY","RX","RY","LT","RT")
+    capture_period = 1.0 / float(CAPTURE_HZ)
+    t0 = time.monotonic()
+    while True:
+        vals = [str(ain[k].value) if k in ain else "-1" for k in capture_keys]
+        print("RAW,{},{}".format(int((time.monotonic() - t0) * 1000), ",".join(vals)))
+        time.sleep(capture_period)
+
 print("Diagnostics using {} + {} ({} Hz)".format(PINMAP_FILE, CONFIG_FILE, UPDATE_HZ))
 period = 1.0 / float(UPDATE_HZ)
 
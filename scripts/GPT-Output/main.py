@@ -1,11 +1,18 @@
 # main.py — Pi Switch controller using JSON pin mapping
 # Files on CIRCUITPY:
 #   - pins.json      (required)
-#   - config.json    (optional: invert/deadzone/trigger min/max)
+#   - config.json    (optional: invert/deadzone/center/trigger min/max/idle)
 #
 # boot.py (HID descriptor) remains the same as before.
+#
+# Idle mode: after idle.after_s seconds with no button change and no
+# stick/trigger movement past idle.wake_threshold, reports stop and the
+# axes are only sampled idle.sample_hz times a second; buttons keep being
+# scanned by keypad in the background. The first button event or axis
+# movement past the threshold returns to full rate. State changes print
+# the idle/active counters on the serial console.
 
-import time, json, csv, board, digitalio, analogio, usb_hid
+import time, json, board, analogio, usb_hid, keypad
 
 PINS_FILE = "button-pinout.json"
 CONFIG_FILE = "config.json"  # optional
@@ -22,9 +29,10 @@ def _resolve_pin(label: str):
     raise ValueError("Unknown pin label: " + label)
 
 def _load_json(path, default=None):
+    # Skips // comment lines, which json.load rejects
     try:
         with open(path, "r") as f:
-            return json.load(f)
+            return json.loads("".join(l for l in f if not l.lstrip().startswith("//")))
     except Exception:
         return default
 
@@ -39,30 +47,32 @@ AXES    = mapping.get("axes",    {})
 CONFIG  = _load_json(CONFIG_FILE, default={})
 INV     = CONFIG.get("invert", {})            # e.g. {"LY": true, "RY": true}
 DZ      = CONFIG.get("deadzone", {})          # e.g. {"LX": 12, "LY": 12}
+CTR     = CONFIG.get("center", {})            # measured rest position, e.g. {"LX": 131}
 TCFG    = CONFIG.get("triggers", {})          # e.g. {"LT_min": 20, "LT_max": 240, "RT_min": 15, "RT_max": 250}
+IDLE    = CONFIG.get("idle", {})              # e.g. {"after_s": 60, "sample_hz": 4, "wake_threshold": 6}
+
+ACTIVE_PERIOD  = 0.01                                  # ~100 Hz reports
+IDLE_AFTER     = float(IDLE.get("after_s", 60))        # 0 disables idle mode
+IDLE_SAMPLE    = 1.0 / float(IDLE.get("sample_hz", 4))
+WAKE_THRESHOLD = int(IDLE.get("wake_threshold", 6))    # 0-255 counts
+IDLE_POLL      = 0.02                                  # keypad queue check while idle
 
-# ---- Init GPIO ----
-btn_ios = []
-for name, pin_label in BUTTONS.items():
-    p = digitalio.DigitalInOut(_resolve_pin(pin_label))
-    p.direction = digitalio.Direction.INPUT
-    p.pull = digitalio.Pull.UP  # active-low to GND
-    btn_ios.append((name, p))
-
-dpad_ios = {}
-for k in ("Up","Down","Left","Right"):
-    pin_label = DPAD.get(k)
-    if pin_label:
-        io = digitalio.DigitalInOut(_resolve_pin(pin_label))
-        io.direction = digitalio.Direction.INPUT
-        io.pull = digitalio.Pull.UP
-        dpad_ios[k] = io
+# ---- Init buttons (keypad scans and debounces in the background) ----
+# Deterministic button ordering: alphabetical by name
+button_order = sorted(BUTTONS)
+dpad_order = [k for k in ("Up","Down","Left","Right") if DPAD.get(k)]
+keys = keypad.Keys(
+    [_resolve_pin(BUTTONS[nm]) for nm in button_order] +
+    [_resolve_pin(DPAD[k]) for k in dpad_order],
+    value_when_pressed=False, pull=True)  # active-low to GND
+key_event = keypad.Event()
 
 def _ain(label):
     return analogio.AnalogIn(_resolve_pin(label)) if label else None
 
+AXIS_ORDER = ("LX","LY","RX","RY","LT","RT")
 ain = {}
-for key in ("LX","LY","RX","RY","LT","RT"):
+for key in AXIS_ORDER:
     pin = AXES.get(key)
     if pin:
         ain[key] = _ain(pin)
@@ -88,17 +98,15 @@ def _hat(u, d, l, r):
     if u and l: return 7
     return 8
 
-def _btn(io):  # active-low
-    return 0 if io.value else 1
-
 def _axis(a, name=None):
     if not a: return 128
     val = a.value >> 8  # 0..255
     # invert
     if name and INV.get(name, False):
         val = 255 - val
-    # deadzone (sticks)
+    # recenter + deadzone (sticks)
     if name in DZ:
+        val = max(0, min(255, val - int(CTR.get(name, 128)) + 128))
         dz = int(DZ[name])
         if abs(val - 128) < dz:
             val = 128
@@ -110,31 +118,86 @@ def _axis(a, name=None):
             val = max(0, min(255, int((val - lo) * 255 / (hi - lo))))
     return val
 
-# Deterministic button ordering: alphabetical by name
-button_order = sorted([nm for nm,_ in btn_ios])
+# ---- State + counters ----
+bits = 0
+dpad = {k: 0 for k in dpad_order}
+idle = False
+idle_entries = 0
+wakes = 0
+reports = 0
+adc_reads = 0
+
+def read_axes():
+    global adc_reads
+    adc_reads += len(ain)
+    return [_axis(ain.get(k), k) for k in AXIS_ORDER]
+
+def moved(axes, ref):
+    for a, b in zip(axes, ref):
+        if abs(a - b) > WAKE_THRESHOLD:
+            return True
+    return False
+
+def drain_keys():
+    # Apply queued button/d-pad events; True if there were any
+    global bits
+    changed = False
+    while keys.events.get_into(key_event):
+        n = key_event.key_number
+        if n < len(button_order):
+            if key_event.pressed:
+                bits |= (1 << n)
+            else:
+                bits &= ~(1 << n)
+        else:
+            dpad[dpad_order[n - len(button_order)]] = 1 if key_event.pressed else 0
+        changed = True
+    return changed
+
+def log_state():
+    print("{}: idle_entries={} wakes={} reports={} adc_reads={}".format(
+        "idle" if idle else "active", idle_entries, wakes, reports, adc_reads))
 
 # ---- Main loop ----
+rest_axes = read_axes()   # last position that counted as activity
+last_activity = time.monotonic()
+next_sample = 0.0
 while True:
-    bits = 0
-    for i, name in enumerate(button_order):
-        for nm, io in btn_ios:
-            if nm == name and _btn(io):
-                bits |= (1 << i)
-                break
-
-    u = _btn(dpad_ios.get("Up"))    if dpad_ios.get("Up")    else 0
-    d = _btn(dpad_ios.get("Down"))  if dpad_ios.get("Down")  else 0
-    l = _btn(dpad_ios.get("Left"))  if dpad_ios.get("Left")  else 0
-    r = _btn(dpad_ios.get("Right")) if dpad_ios.get("Right") else 0
-    hat = _hat(u, d, l, r)
-
-    lx = _axis(ain.get("LX"), "LX")
-    ly = _axis(ain.get("LY"), "LY")
-    rx = _axis(ain.get("RX"), "RX")
-    ry = _axis(ain.get("RY"), "RY")
-    lt = _axis(ain.get("LT"), "LT")
-    rt = _axis(ain.get("RT"), "RT")
-
-    report = bytes([bits & 0xFF, (bits >> 8) & 0xFF, hat, lx, ly, rx, ry, lt, rt])
+    now = time.monotonic()
+    if drain_keys():
+        last_activity = now
+        if idle:
+            idle = False
+            wakes += 1
+            log_state()
+
+    if idle:
+        if now >= next_sample:
+            next_sample = now + IDLE_SAMPLE
+            axes = read_axes()
+            if moved(axes, rest_axes):
+                idle = False
+                wakes += 1
+                last_activity = now
+                log_state()
+        if idle:
+            time.sleep(IDLE_POLL)
+            continue
+    else:
+        axes = read_axes()
+
+    if moved(axes, rest_axes):
+        rest_axes = axes
+        last_activity = now
+
+    hat = _hat(dpad.get("Up", 0), dpad.get("Down", 0), dpad.get("Left", 0), dpad.get("Right", 0))
+    report = bytes([bits & 0xFF, (bits >> 8) & 0xFF, hat] + axes)
     gp.send_report(report)
-    time.sleep(0.01)  # ~100 Hz
\ No newline at end of file
+    reports += 1
+
+    if IDLE_AFTER and now - last_activity >= IDLE_AFTER:
+        idle = True
+        idle_entries += 1
+        next_sample = now + IDLE_SAMPLE
+        log_state()
+    time.sleep(ACTIVE_PERIOD)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Command console for the amp and mixer: scripted bursts or manual testing.
+
+  python3 amp_console.py                       # interactive (real hardware)
+  python3 amp_console.py burst.txt             # run a script, print stats
+  printf 'repeat 200 up; repeat 200 down\\n' | python3 amp_console.py -
+  python3 amp_console.py --fake burst.txt      # fake SMBus + mixer (fake_hw.py)
+
+Commands, one per line or separated by ";", "#" starts a comment:
+
+  up / down            one step on the unified volume curve
+  gain + | - | <dB>    amp base gain of the volume curve (-28..30)
+  comp [1:1|4:1]       AGC compression (toggles without an argument)
+  sws [on|off]         software shutdown, reg 0x01 bit 5 (toggles)
+  shdn [on|off]        hardware mute via SHDN (toggles)
+  jack                 show the headphone switch
+  fault nack N | brownout    inject a bus fault (--fake only)
+  repeat N <command>   run a command N times back to back
+  sleep <ms>           pause (not counted as an op)
+  stats / reset        print / clear the counters
+  quit
+
+The old keyboard_mode keys still work: u d m b s + - c q. As in
+keyboard_mode, an interactive session mutes the speakers (SHDN) while
+headphones are plugged in.
+
+Each op is timed until its I2C traffic has gone out (the i2c worker is
+drained), unless --async is given, in which case ops are only queued and
+repeated writes coalesce. --verify reads the amp's registers and the
+mixer back after every op and counts mismatches against the shadow.
+"""
+import argparse
+import shlex
+import sys
+import time
+
+ALIASES = {"u": "up", "d": "down", "m": "shdn", "b": "shdn", "s": "sws",
+           "+": "gain +", "-": "gain -", "c": "comp", "q": "quit"}
+
+
+def _percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+class AmpConsole:
+    def __init__(self, ops, settle=None, verify=None, stats=None, sync=True,
+                 out=print, clock=time.perf_counter):
+        self.ops = ops              # name -> fn(*args)
+        self.settle = settle        # blocks until queued bus traffic is done
+        self.verify = verify        # -> number of mismatching registers/controls
+        self.extra_stats = stats    # -> dict of counters to show with stats
+        self.sync = sync
+        self.out = out
+        self.clock = clock
+        self.reset()
+
+    def reset(self):
+        self.latency = {}           # op -> [seconds]
+        self.failures = 0
+        self.mismatches = 0
+        self.busy = 0.0             # time spent inside ops
+        self.started = None
+
+    # ── parsing ────────────────────────────────────────────────────────────
+    def run_line(self, line):
+        """Run every command on one line; returns False after quit."""
+        for command in line.split("#", 1)[0].split(";"):
+            try:
+                words = shlex.split(ALIASES.get(command.strip(), command.strip()))
+                if words and not self.command(words):
+                    return False
+            except (ValueError, IndexError) as e:
+                self.out(f"bad command {command.strip()!r}: {e}")
+        return True
+
+    def command(self, words):
+        name, args = words[0], words[1:]
+        if name == "quit":
+            return False
+        if name == "repeat":
+            for _ in range(int(args[0])):
+                self.command(args[1:])
+        elif name == "sleep":
+            time.sleep(float(args[0]) / 1000)
+        elif name == "stats":
+            self.report()
+        elif name == "reset":
+            self.reset()
+        elif name == "help":
+            self.out(__doc__.split("Commands", 1)[1].split("Each op")[0].rstrip())
+        elif name in self.ops:
+            self.op(name, args)
+        else:
+            self.out(f"unknown command: {name} (try help)")
+        return True
+
+    # ── ops ────────────────────────────────────────────────────────────────
+    def op(self, name, args):
+        if self.started is None:
+            self.started = self.clock()
+        t = self.clock()
+        try:
+            self.ops[name](*args)
+            if self.sync and self.settle:
+                self.settle()
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.failures += 1
+            self.out(f"{name}: {e}")
+        elapsed = self.clock() - t
+        self.busy += elapsed
+        self.latency.setdefault(name, []).append(elapsed)
+        if self.verify:
+            bad = self.verify()
+            if bad:
+                self.mismatches += bad
+                self.out(f"{name} {' '.join(args)}: {bad} readback mismatch(es)")
+
+    def run(self, lines):
+        """Run a script or a stdin stream, as fast as the ops allow."""
+        for line in lines:
+            if not self.run_line(line):
+                break
+        if self.settle:
+            self.settle()
+
+    def interactive(self, prompt="amp> "):
+        self.out("Amp console; 'help' lists commands, 'q' quits.")
+        while True:
+            try:
+                line = input(prompt)
+            except EOFError:
+                break
+            if not self.run_line(line):
+                break
+
+    # ── report ─────────────────────────────────────────────────────────────
+    def report(self):
+        n = sum(len(v) for v in self.latency.values())
+        if not n:
+            self.out("no ops run")
+            return
+        wall = self.clock() - self.started
+        self.out(f"{n} ops in {wall * 1000:.1f} ms: {n / wall:.0f} ops/s "
+                 f"({n / self.busy:.0f} ops/s counting op time only), "
+                 f"{self.failures} failed, {self.mismatches} readback mismatches")
+        self.out(f"{'op':<8}{'count':>7}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+        for name, values in sorted(self.latency.items()):
+            self.out(f"{name:<8}{len(values):>7}{_percentile(values, 0.5) * 1000:>9.3f}"
+                     f"{_percentile(values, 0.99) * 1000:>9.3f}{max(values) * 1000:>9.3f}")
+        if self.extra_stats:
+            self.out("  ".join(f"{k} {v}" for k, v in self.extra_stats().items()))
+
+
+# ─── MAIN ──────────────────────────────────────────────────────────────────────
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("script", nargs="?", help="command file, or - for stdin (default: interactive)")
+    ap.add_argument("--fake", action="store_true", help="fake TPA2016 on a fake SMBus, fake mixer")
+    ap.add_argument("--async", dest="sync", action="store_false", help="don't wait for the bus per op")
+    ap.add_argument("--verify", action="store_true", help="read back amp and mixer after every op")
+    args = ap.parse_args()
+
+    if args.fake:
+        from fake_hw import fake_volumecombo
+        vc, bus = fake_volumecombo()
+    else:
+        import volumecombo as vc
+    console = vc.make_console(sync=args.sync, verify=args.verify)
+    if args.fake:
+        console.ops["fault"] = lambda kind, n=1: bus.nack(int(n)) if kind == "nack" else bus.brownout()
+    vc.init_console_hw()
+    try:
+        if args.script is None:
+            vc.auto_mute_on_jack(console)
+            console.interactive()
+        else:
+            with (sys.stdin if args.script == "-" else open(args.script)) as f:
+                console.run(f)
+            console.report()
+    finally:
+        vc.GPIO.cleanup()
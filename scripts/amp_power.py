@@ -0,0 +1,124 @@
+"""
+TPA2016 power-state handling for the Pi Switch amp.
+
+Pulling SHDN low resets every TPA2016 register (0x01-0x07) to its power-on
+default. AmpPower keeps a shadow copy of the values we want, and on wake
+replays only the registers that differ from those defaults, in a single
+auto-increment block write, as soon as the amp ACKs on the bus again.
+
+The bus is anything smbus2-shaped (read_byte_data, write_byte_data,
+write_i2c_block_data) and SHDN is driven through a callback, so the same
+code runs against the real amp and against fake_hw.FakeTPA2016.
+"""
+import time
+
+TPA2016_I2C_ADDR = 0x58
+
+CONFIG_REGISTER = 0x01
+GAIN_REGISTER = 0x05
+COMPRESS_REGISTER = 0x07
+
+# Power-on defaults for registers 0x01..0x07 (TPA2016D2 datasheet, table 3)
+POWER_ON_DEFAULTS = {
+    0x01: 0xC3,
+    0x02: 0x05,
+    0x03: 0x0B,
+    0x04: 0x00,
+    0x05: 0x06,
+    0x06: 0x3A,
+    0x07: 0xC2,
+}
+
+# Readiness polling after SHDN goes high: the amp NACKs until it has started.
+# 50 x 1 ms caps the wait at the old fixed 50 ms sleep.
+WAKE_POLL_INTERVAL = 0.001
+WAKE_MAX_ATTEMPTS = 50
+
+# Optional anti-pop ramp: start at minimum gain and step up to the target
+RAMP_STEPS = 4
+RAMP_STEP_TIME = 0.002
+RAMP_START_VALUE = 0x00
+
+
+class AmpPower:
+    def __init__(self, bus, set_shdn, addr=TPA2016_I2C_ADDR, sleep=time.sleep):
+        self.bus = bus
+        self.set_shdn = set_shdn
+        self.addr = addr
+        self.sleep = sleep
+        self.shadow = dict(POWER_ON_DEFAULTS)
+        self.powered = True
+
+    # ── shadow register access ─────────────────────────────────────────────
+    def write_register(self, reg, value):
+        """Record value in the shadow and write it if the amp is powered."""
+        self.shadow[reg] = value & 0xFF
+        if self.powered:
+            self.bus.write_byte_data(self.addr, reg, self.shadow[reg])
+
+    def update_bits(self, reg, mask, value):
+        """Read-modify-write against the shadow, so no bus read is needed."""
+        self.write_register(reg, (self.shadow[reg] & ~mask) | (value & mask))
+        return self.shadow[reg]
+
+    def dirty_registers(self):
+        """Registers whose wanted value differs from the power-on default."""
+        return [r for r in sorted(self.shadow) if self.shadow[r] != POWER_ON_DEFAULTS[r]]
+
+    def sync(self):
+        """Write every dirty register to the amp (startup / after SWS)."""
+        return self._replay(self.dirty_registers(), ramp=False)
+
+    def restore(self):
+        """Write the whole shadow (after a bus fault the amp's contents are
+        unknown: reset by a brown-out, or a write lost halfway)."""
+        if not self.powered:
+            return 0
+        self.wait_ready()
+        return self._replay(sorted(self.shadow), ramp=False)
+
+    # ── power state ────────────────────────────────────────────────────────
+    def shutdown(self):
+        self.set_shdn(False)
+        self.powered = False
+
+    def wake(self, ramp=False):
+        """Drive SHDN high, wait for the amp to ACK, replay lost registers.
+
+        Returns the number of readiness polls it took.
+        """
+        self.set_shdn(True)
+        polls = self.wait_ready()
+        self.powered = True
+        self._replay(self.dirty_registers(), ramp)
+        return polls
+
+    def wait_ready(self):
+        for attempt in range(1, WAKE_MAX_ATTEMPTS + 1):
+            try:
+                self.bus.read_byte_data(self.addr, CONFIG_REGISTER)
+                return attempt
+            except OSError:
+                self.sleep(WAKE_POLL_INTERVAL)
+        raise OSError(f"TPA2016 did not ACK within {WAKE_MAX_ATTEMPTS} polls after SHDN high")
+
+    def _replay(self, dirty, ramp):
+        if not dirty:
+            return 0
+        first, last = dirty[0], dirty[-1]
+        values = [self.shadow[r] for r in range(first, last + 1)]
+        ramping = ramp and GAIN_REGISTER in dirty
+        if ramping:
+            values[GAIN_REGISTER - first] = RAMP_START_VALUE
+        # One auto-increment transaction covering the dirty span; registers
+        # in between are still at their defaults, which equal the shadow.
+        self.bus.write_i2c_block_data(self.addr, first, values)
+        if ramping:
+            self._ramp_gain(RAMP_START_VALUE, self.shadow[GAIN_REGISTER])
+        return len(values)
+
+    def _ramp_gain(self, start, target):
+        for step in range(1, RAMP_STEPS + 1):
+            self.sleep(RAMP_STEP_TIME)
+            value = start + (target - start) * step // RAMP_STEPS
+            self.bus.write_byte_data(self.addr, GAIN_REGISTER, value)
@@ -0,0 +1,135 @@
+"""
+PiSugar 3 battery telemetry for the Pi Switch.
+
+BatteryService polls the PiSugar over I2C and keeps the latest reading in
+memory (BatteryService.state) for the OSD and anything else that wants it,
+so nobody else has to touch the bus. Each poll is one combined I2C read of
+the status..percent register span.
+
+Polling adapts to what the battery is doing: once a minute while it is
+stable on battery, every few seconds while it is low, charging, or the
+level is moving. Crossing the low/critical thresholds calls on_low(state).
+"""
+import threading
+import time
+
+PISUGAR_I2C_ADDR = 0x57
+
+# PiSugar 3 register map (firmware 1.x)
+REG_STATUS = 0x02
+STATUS_POWER_PLUGGED = 1 << 7
+STATUS_CHARGING_ENABLED = 1 << 6
+REG_BUTTON = 0x08
+BUTTON_TAP = 1 << 0
+REG_VOLTAGE_H = 0x22
+REG_VOLTAGE_L = 0x23
+REG_PERCENT = 0x2A
+
+BLOCK_START = REG_STATUS
+BLOCK_LEN = REG_PERCENT - REG_STATUS + 1
+
+POLL_STABLE = 60.0   # s, on battery and not moving
+POLL_ACTIVE = 5.0    # s, low / charging / changing
+LOW_PERCENT = 15
+CRITICAL_PERCENT = 5
+
+
+class BatteryState:
+    __slots__ = ("percent", "voltage_mv", "plugged", "charging", "button", "updated")
+
+    def __init__(self):
+        self.percent = None
+        self.voltage_mv = None
+        self.plugged = False
+        self.charging = False
+        self.button = False
+        self.updated = None
+
+
+# ─── READERS ───────────────────────────────────────────────────────────────────
+class SMBusPiSugarReader:
+    """Reads the PiSugar with one write-then-read i2c_rdwr transaction."""
+    def __init__(self, bus_num=1, addr=PISUGAR_I2C_ADDR):
+        from smbus2 import SMBus, i2c_msg
+        self._msg = i2c_msg
+        self.bus = SMBus(bus_num)
+        self.addr = addr
+
+    def read_block(self, start, length):
+        # SMBus block reads stop at 32 bytes; a raw combined transfer doesn't
+        write = self._msg.write(self.addr, [start])
+        read = self._msg.read(self.addr, length)
+        self.bus.i2c_rdwr(write, read)
+        return bytes(read)
+
+    def write_byte(self, reg, value):
+        self.bus.write_byte_data(self.addr, reg, value)
+
+
+# ─── SERVICE ───────────────────────────────────────────────────────────────────
+class BatteryService:
+    def __init__(self, reader, on_low=None, on_change=None, clock=time.monotonic):
+        self.reader = reader
+        self.on_low = on_low
+        self.on_change = on_change
+        self.clock = clock
+        self.state = BatteryState()
+        self.polls = 0
+        self._last_percent = None
+        self._warned_at = None  # lowest threshold we've already warned about
+
+    def poll(self):
+        block = self.reader.read_block(BLOCK_START, BLOCK_LEN)
+        self.polls += 1
+        status = block[REG_STATUS - BLOCK_START]
+        percent = min(100, block[REG_PERCENT - BLOCK_START])
+        button = bool(block[REG_BUTTON - BLOCK_START] & BUTTON_TAP)
+        if button:
+            # The tap flag is latched by the PiSugar until we clear it
+            self.reader.write_byte(REG_BUTTON, block[REG_BUTTON - BLOCK_START] & ~BUTTON_TAP)
+
+        s = self.state
+        self._last_percent = s.percent
+        changed = percent != s.percent or bool(status & STATUS_POWER_PLUGGED) != s.plugged
+        s.percent = percent
+        s.voltage_mv = (block[REG_VOLTAGE_H - BLOCK_START] << 8) | block[REG_VOLTAGE_L - BLOCK_START]
+        s.plugged = bool(status & STATUS_POWER_PLUGGED)
+        s.charging = s.plugged and bool(status & STATUS_CHARGING_ENABLED) and percent < 100
+        s.button = button
+        s.updated = self.clock()
+
+        self._check_low()
+        if changed and self.on_change:
+            self.on_change(s)
+        return s
+
+    def _check_low(self):
+        s = self.state
+        if s.plugged or s.percent > LOW_PERCENT:
+            self._warned_at = None  # re-arm
+            return
+        threshold = CRITICAL_PERCENT if s.percent <= CRITICAL_PERCENT else LOW_PERCENT
+        if self._warned_at is None or threshold < self._warned_at:
+            self._warned_at = threshold
+            if self.on_low:
+                self.on_low(s)
+
+    def next_interval(self):
+        s = self.state
+        moving = self._last_percent is not None and s.percent != self._last_percent
+        if s.plugged or s.percent is None or s.percent <= LOW_PERCENT or moving:
+            return POLL_ACTIVE
+        return POLL_STABLE
+
+    def run(self, stop=None, sleep=None):
+        """Poll forever (or until stop is set); I2C errors just retry later."""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                self.poll()
+            except OSError as e:
+                print(f"Battery read error: {e}")
+            if sleep:
+                sleep(self.next_interval())
+            else:
+                stop.wait(self.next_interval())
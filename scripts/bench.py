@@ -0,0 +1,1490 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Pi Switch control code, run against the simulated
+hardware in fake_hw.py so they work on any machine:
+
+  python3 bench.py            # run everything
+  python3 bench.py amp-wake   # run one benchmark
+"""
+import sys
+
+from fake_hw import FakeClock, FakeTPA2016
+
+BENCHES = {}
+
+
+def bench(name):
+    def register(fn):
+        BENCHES[name] = fn
+        return fn
+    return register
+
+
+def header(title):
+    print(f"\n── {title} " + "─" * max(0, 60 - len(title)))
+
+
+# ─── AMP WAKE (unmute / headphone unplug) ─────────────────────────────────────
+def legacy_unmute(amp_bus, clock, gain_value, compression):
+    """The pre-AmpPower unmute_amp() sequence from volumecombo.py."""
+    amp_bus.set_shdn(True)
+    clock.sleep(0.05)
+    amp_bus.write_byte_data(amp_bus.addr, 0x05, gain_value)
+    val = amp_bus.read_byte_data(amp_bus.addr, 0x07)
+    amp_bus.write_byte_data(amp_bus.addr, 0x07, (val & 0xFC) | (compression & 0x03))
+
+
+@bench("amp-wake")
+def bench_amp_wake():
+    from amp_power import AmpPower, COMPRESS_REGISTER, GAIN_REGISTER
+
+    header("Amp wake-to-audio (simulated TPA2016, 5 ms startup)")
+    gain_value = 28  # 0 dB in volumecombo's db_to_regval()
+    print(f"{'path':<22}{'wake ms':>9}{'I2C txns':>10}{'bytes':>8}")
+
+    clock = FakeClock()
+    amp_bus = FakeTPA2016(clock)
+    amp_bus.set_shdn(False)
+    start, txns = clock.now(), amp_bus.transactions
+    legacy_unmute(amp_bus, clock, gain_value, 0)
+    print(f"{'legacy fixed sleep':<22}{(clock.now() - start) * 1000:>9.1f}"
+          f"{amp_bus.transactions - txns:>10}{amp_bus.bytes_moved:>8}")
+
+    for ramp in (False, True):
+        clock = FakeClock()
+        amp_bus = FakeTPA2016(clock)
+        amp = AmpPower(amp_bus, amp_bus.set_shdn, sleep=clock.sleep)
+        amp.write_register(GAIN_REGISTER, gain_value)
+        amp.update_bits(COMPRESS_REGISTER, 0x03, 0)
+        amp.shutdown()
+        start, txns, moved = clock.now(), amp_bus.transactions, amp_bus.bytes_moved
+        amp.wake(ramp=ramp)
+        assert all(amp_bus.regs[r] == amp.shadow[r] for r in amp.shadow)
+        label = "AmpPower + ramp" if ramp else "AmpPower"
+        print(f"{label:<22}{(clock.now() - start) * 1000:>9.1f}"
+              f"{amp_bus.transactions - txns:>10}{amp_bus.bytes_moved - moved:>8}")
+    print("(I2C txns include NACKed readiness polls)")
+
+
+# ─── VOLUME CURVE ─────────────────────────────────────────────────────────────
+@bench("volume-curve")
+def bench_volume_curve():
+    from volume_curve import VolumeModel, build_table, ALSA_MIN_DB, ALSA_MAX_DB
+
+    header("Unified volume curve")
+    table = build_table()
+    loudness = [(pct / 100) * (ALSA_MAX_DB - ALSA_MIN_DB) + ALSA_MIN_DB + amp
+                for pct, amp in table[1:]]
+    assert all(b > a for a, b in zip(table, table[1:])), "table not monotonic"
+    assert all(b > a for a, b in zip(loudness, loudness[1:])), "loudness not monotonic"
+    steps_db = [b - a for a, b in zip(loudness, loudness[1:])]
+    print(f"{len(table) - 1} steps, {loudness[0]:.1f} .. {loudness[-1]:+.1f} dB, "
+          f"step size {min(steps_db):.2f}-{max(steps_db):.2f} dB "
+          f"(legacy 5% step = {0.05 * (ALSA_MAX_DB - ALSA_MIN_DB):.2f} dB)")
+
+    writes = {"alsa": 0, "amp": 0}
+
+    def alsa(pct):
+        writes["alsa"] += 1
+
+    def amp(db):
+        writes["amp"] += 1
+
+    model = VolumeModel(alsa, amp, table, step=0)
+    model.apply()
+    writes.update(alsa=0, amp=0)
+    per_step = []
+    for _ in range(model.max_step):
+        per_step.append(model.step_up())
+    for _ in range(model.max_step):
+        per_step.append(model.step_down())
+    assert max(per_step) <= 2 and per_step.count(2) <= 2
+    print(f"full sweep up+down: {len(per_step)} steps, {writes['alsa']} ALSA writes, "
+          f"{writes['amp']} amp writes ({sum(per_step) / len(per_step):.2f} writes/step)")
+    print(f"legacy: {len(per_step)} amixer set + {len(per_step)} amixer get forks")
+
+
+# ─── HOTKEY ENGINE ────────────────────────────────────────────────────────────
+@bench("hotkeys")
+def bench_hotkeys():
+    import random
+    import time
+    from hotkeys import HOTKEYS_FILE, HotkeyEngine
+
+    header("Hotkey engine throughput")
+    calls = []
+    engine = HotkeyEngine({"volume": calls.append, "mute": lambda: calls.append("mute"),
+                           "compression": lambda: calls.append("comp")}, clock=lambda: 0.0)
+    engine.load(HOTKEYS_FILE, {"gpio": {"VOL_UP": 17, "VOL_DOWN": 27}.__getitem__})
+    for key, pressed in ((17, True), (27, True), (27, False), (17, False), (27, True), (27, False)):
+        engine.feed("gpio", key, pressed)
+    assert calls == [1, "mute", -1], calls
+
+    rng = random.Random(26)
+    events = [(rng.randrange(256), rng.random() < 0.5) for _ in range(200_000)]
+    print(f"{'bindings':>9}{'events/s':>14}{'fired':>8}")
+    for n in (10, 100, 500, 1000):
+        engine = HotkeyEngine({"noop": lambda arg: None})
+        for i in range(n):
+            keys = rng.sample(range(256), rng.choice((1, 2, 3)))
+            kind = rng.choice(("chord", "chord", "long", "double"))
+            engine.add(f"dev{i % 4}", keys, "noop", i, kind)
+        devices = [f"dev{i}" for i in range(4)]
+        start = time.perf_counter()
+        for i, (key, pressed) in enumerate(events):
+            engine.feed(devices[i & 3], key, pressed, i * 0.001)
+        elapsed = time.perf_counter() - start
+        print(f"{n:>9}{len(events) / elapsed:>14,.0f}{engine.fired:>8}")
+
+
+# ─── INPUT ROUTER ─────────────────────────────────────────────────────────────
+@bench("input-router")
+def bench_input_router():
+    import os
+    import time
+    from fake_hw import FakeEvdevDevice, FakeInputEvent as Ev
+    from hotkeys import HotkeyEngine, hat_key
+    from input_router import (BTN_DPAD_UP, EV_ABS, EV_KEY, EV_SYN, INPUT_EVENT, InputRouter,
+                              find_sources, itsybitsy_table, joycon_table)
+
+    header("Input router: added latency / CPU per 1,000 events")
+    fired = []
+    hotkeys = HotkeyEngine({"backlight": fired.append})
+    hotkeys.add("joycon", [0x66, hat_key(0x11, -1)], "backlight", 16, trigger=hat_key(0x11, -1))
+    sink = os.open(os.devnull, os.O_WRONLY)
+    router = InputRouter(sink, hotkeys)
+    pad = FakeEvdevDevice("ItsyBitsy", vendor=0x239A)
+    joy = FakeEvdevDevice("Nintendo Switch Combined Joy-Cons")
+    router.add_source(pad, "gamepad", itsybitsy_table())
+    router.add_source(joy, "joycon", joycon_table())
+    assert pad.grabbed and joy.grabbed
+
+    # Hotkey chord is swallowed, the rest of the report still goes through
+    r, w = os.pipe()
+    router.sink_fd = w
+    router.handle(router.sources[joy.fd], [Ev(EV_KEY, 0x66, 1), Ev(EV_SYN, 0, 0),
+                                           Ev(EV_ABS, 0x11, -1), Ev(EV_KEY, 0x130, 1),
+                                           Ev(EV_SYN, 0, 0)])
+    out = os.read(r, 4096)
+    events = [INPUT_EVENT.unpack_from(out, i)[2:] for i in range(0, len(out), INPUT_EVENT.size)]
+    assert fired == [16] and events == [(EV_KEY, 0x130, 1), (EV_SYN, 0, 0)], events
+
+    # The Joy-Con d-pad is BTN_DPAD_*, but the bindings name the hat it becomes
+    batches = router.batches_out
+    router.handle(router.sources[joy.fd], [Ev(EV_ABS, 0x11, 0), Ev(EV_SYN, 0, 0),
+                                           Ev(EV_KEY, BTN_DPAD_UP, 1), Ev(EV_SYN, 0, 0),
+                                           Ev(EV_KEY, BTN_DPAD_UP, 0), Ev(EV_KEY, 0x66, 0),
+                                           Ev(EV_SYN, 0, 0)])
+    assert fired == [16, 16] and router.batches_out == batches, fired  # chord kept back
+
+    # A held d-pad button autorepeats (value 2): dropped, not a LUT overrun
+    router.handle(router.sources[joy.fd], [Ev(EV_KEY, BTN_DPAD_UP, 1), Ev(EV_SYN, 0, 0),
+                                           Ev(EV_KEY, BTN_DPAD_UP, 2), Ev(EV_SYN, 0, 0),
+                                           Ev(EV_KEY, BTN_DPAD_UP, 0), Ev(EV_SYN, 0, 0)])
+    out = os.read(r, 4096)
+    events = [INPUT_EVENT.unpack_from(out, i)[2:] for i in range(0, len(out), INPUT_EVENT.size)]
+    assert events == [(EV_ABS, 0x11, -1), (EV_SYN, 0, 0), (EV_ABS, 0x11, 0), (EV_SYN, 0, 0)], events
+    os.close(r)
+    os.close(w)
+    router.sink_fd = sink
+
+    # Only the combined pair and the pad; single Joy-Cons and IMUs stay ungrabbed
+    devices = {name: FakeEvdevDevice(name, vendor=vendor, path=name) for name, vendor in (
+        ("Nintendo Switch Left Joy-Con", 0x57E), ("Nintendo Switch Right Joy-Con (IMU)", 0x57E),
+        ("Nintendo Switch Combined Joy-Cons", 0x57E), ("ItsyBitsy M0 Express", 0x239A))}
+    found = [name for _, name, _ in find_sources(list(devices).copy, devices.__getitem__)]
+    assert found == ["joycon", "gamepad"], found
+    assert [dev.closed for dev in devices.values()] == [True, True, False, False]
+
+    # Hotplug: run() returns when asked to, and a rescan skips what is routed
+    plugged = []
+    hot = InputRouter(sink)
+    hot.add_source(devices["ItsyBitsy M0 Express"], "gamepad", itsybitsy_table(), grab=False)
+    hot.run(timeout=0, until=lambda: plugged.append(1) or len(plugged) > 3)
+    again = find_sources(list(devices).copy, devices.__getitem__, skip=hot.paths())
+    assert len(plugged) == 4 and [name for _, name, _ in again] == ["joycon"], again
+    for dev in devices.values():
+        dev.close()
+
+    # One ItsyBitsy report: 6 axes + 1 button + SYN = 8 events
+    report = [Ev(EV_ABS, code, 100 + code) for code in (0, 1, 2, 3, 4, 5)]
+    report += [Ev(EV_KEY, 0x130, 1), Ev(EV_SYN, 0, 0)]
+    reports = 12_500
+    src = router.sources[pad.fd]
+    batches0 = router.batches_out
+    latencies = []
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    for _ in range(reports):
+        t0 = time.perf_counter()
+        router.handle(src, report)
+        latencies.append(time.perf_counter() - t0)
+    cpu, wall = time.process_time() - cpu0, time.perf_counter() - wall0
+    latencies.sort()
+    n = reports * len(report)
+    batches = router.batches_out - batches0
+    print(f"{n:,} events in {batches:,} batches ({batches / reports:.0f} write per SYN_REPORT)")
+    print(f"CPU per 1,000 events: {cpu / n * 1e6:.2f} ms")
+    print(f"added latency per report: mean {wall / reports * 1e6:.1f} us, "
+          f"p99 {latencies[int(reports * 0.99)] * 1e6:.1f} us")
+    os.close(sink)
+
+
+# ─── BATTERY TELEMETRY ────────────────────────────────────────────────────────
+@bench("battery")
+def bench_battery():
+    from battery import BatteryService
+    from fake_hw import FakeClock, FakePiSugar
+
+    header("PiSugar telemetry: I2C transactions per hour")
+    print(f"{'scenario':<26}{'adaptive':>10}{'naive 5s':>10}{'low evts':>10}")
+    for label, percent, plugged in (("on battery, 80%", 80, False),
+                                    ("on battery, 20% -> low", 20, False),
+                                    ("charging from 30%", 30, True)):
+        clock = FakeClock()
+        sugar = FakePiSugar(clock, percent)
+        sugar.plug(plugged)
+        lows = []
+        svc = BatteryService(sugar, on_low=lows.append, clock=clock.now)
+        while clock.now() < 3600:
+            svc.poll()
+            clock.sleep(svc.next_interval())
+        # Naive: poll every 5 s with one read per value (status, button, V hi, V lo, %)
+        naive = int(3600 / 5) * 5
+        print(f"{label:<26}{sugar.transactions:>10}{naive:>10}{len(lows):>10}")
+        assert svc.state.percent == int(sugar.level) or svc.state.plugged
+    clock = FakeClock()
+    sugar = FakePiSugar(clock)
+    svc = BatteryService(sugar, clock=clock.now)
+    sugar.tap_button()
+    assert svc.poll().button and not svc.poll().button
+
+
+# ─── POWER PROFILES ───────────────────────────────────────────────────────────
+PROFILE_WINDOW = 1.0   # s of wall time per profile measurement
+
+
+@bench("power-profiles")
+def bench_power_profiles():
+    import threading
+    import time
+    from battery import POLL_ACTIVE, POLL_STABLE
+    from fake_hw import FakePowerSource, install_fake_backends, remove_fake_backends
+    from power_profiles import PROFILES, PowerProfileManager
+
+    header("Power profiles: wakeups/s and CPU of the button loop")
+    source = FakePowerSource(plugged=True)
+    manager = PowerProfileManager(source)
+    seen = []
+    manager.add_listener(lambda p: seen.append(p.name))
+    manager.refresh()
+    source.plugged, source.percent = False, 60
+    manager.refresh()
+    source.percent = 25
+    manager.refresh()
+    manager.cycle()
+    manager.cycle("auto")
+    assert seen == ["balanced", "performance", "balanced", "saver", "performance", "saver"], seen
+
+    # The daemon's real button_loop on fake GPIO, in each profile: wakeups
+    # and CPU time of that thread, from /proc (Linux)
+    finder = install_fake_backends(scale=0)
+    try:
+        import volume_backlight_control as vbc
+        vbc.init_input()
+    finally:
+        remove_fake_backends(finder)
+    pins = vbc.btn_up, vbc.btn_down, vbc.hp_detect
+    tid, started = [], threading.Event()
+
+    class Stop(Exception):
+        pass
+
+    def loop():
+        tid.append(threading.get_native_id())
+        started.set()
+        try:
+            vbc.button_loop()
+        except Stop:
+            pass
+    threading.Thread(target=loop, name="button_loop", daemon=True).start()
+    started.wait()
+
+    def sample():
+        with open(f"/proc/self/task/{tid[0]}/schedstat") as f:
+            cpu_ns = int(f.read().split()[0])
+        return cpu_ns, _voluntary_switches({"loop": tid[0]})["loop"]
+
+    print(f"{'profile':<13}{'idle wk/s':>10}{'OSD wk/s':>10}{'idle CPU ms/s':>15}")
+    for name in ("performance", "balanced", "saver"):
+        vbc.profiles.cycle(name)
+        time.sleep(0.1)
+        cpu0, wake0 = sample()
+        time.sleep(PROFILE_WINDOW)
+        cpu1, wake1 = sample()
+        loop_wakeups = (wake1 - wake0) / PROFILE_WINDOW
+        battery = 1 / POLL_ACTIVE if name != "balanced" else 1 / POLL_STABLE
+        idle = loop_wakeups + battery
+        print(f"{name:<13}{idle:>10.1f}{idle + PROFILES[name].osd_fps:>10.1f}"
+              f"{(cpu1 - cpu0) / 1e6 / PROFILE_WINDOW:>15.3f}")
+        assert abs(loop_wakeups - 1 / PROFILES[name].poll_interval) < 0.3 / PROFILES[name].poll_interval
+    vbc.profiles.cycle("auto")
+
+    # Stop the loop: its next pin read raises
+    class Dead:
+        @property
+        def value(self):
+            raise Stop
+    vbc.btn_up = Dead()
+    vbc.gpio_edge.set()
+    time.sleep(0.05)
+    vbc.btn_up, vbc.btn_down, vbc.hp_detect = pins
+    print("(button_loop thread measured on this host, battery polls added from their "
+          "intervals; OSD frames cost extra while visible)")
+
+
+# ─── EVENT TRACE ──────────────────────────────────────────────────────────────
+@bench("trace")
+def bench_trace():
+    import os
+    import tempfile
+    import time
+    from eventtrace import DEBUG, INFO, TraceBuffer, define, load
+
+    header("Trace ring buffer vs print() per event")
+    ev = define("bench_volume", "ALSA {a}%, amp {b} dB, {dur} us")
+    buf = TraceBuffer(capacity=1024)
+    n = 200_000
+
+    start = time.perf_counter()
+    for i in range(n):
+        buf.record(ev, INFO, i & 0x7F, 3, 120)
+    recorded = (time.perf_counter() - start) / n
+
+    start = time.perf_counter()
+    for i in range(n):
+        buf.record(ev, DEBUG, i & 0x7F, 3, 120)
+    filtered = (time.perf_counter() - start) / n
+
+    # The old path: format + line-buffered write (journald pipe without PYTHONUNBUFFERED)
+    with open(os.devnull, "w", buffering=1) as out:
+        start = time.perf_counter()
+        for i in range(n):
+            print(f"Volume UP, now at step {i & 0x7F}/24 (ALSA {i & 0x7F}%, amp 3 dB)", file=out)
+        printed = (time.perf_counter() - start) / n
+
+    with tempfile.TemporaryDirectory() as tmp:
+        records, types = load(buf.dump(os.path.join(tmp, "trace.bin")))
+    assert len(records) == 1024 and records[-1][3] == (n - 1) & 0x7F
+    assert types[ev][0] == "bench_volume"
+
+    # Input threads and the i2c worker share the buffer: nothing lost or torn
+    import threading
+    shared, per_thread, writers = TraceBuffer(capacity=4 * 20_000), 20_000, 4
+    def write(tid):
+        for i in range(per_thread):
+            shared.record(ev, INFO, tid, i, tid)
+    threads = [threading.Thread(target=write, args=(t,)) for t in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    seen = {}
+    for _, _, _, a, b, dur in shared.records():
+        assert a == dur, "torn record"
+        seen.setdefault(a, []).append(b)
+    assert all(sorted(v) == list(range(per_thread)) for v in seen.values()) and len(seen) == writers
+
+    print(f"print() to line-buffered fd : {printed * 1e9:8.0f} ns/event (+ journald + SD write)")
+    print(f"trace.record()              : {recorded * 1e9:8.0f} ns/event")
+    print(f"trace.record() below level  : {filtered * 1e9:8.0f} ns/event")
+    print(f"{writers} threads x {per_thread:,} records: none lost or torn")
+
+
+# ─── METRICS ──────────────────────────────────────────────────────────────────
+# Per-sample budget on a Pi 3A+ is ~10x these host numbers; keep well inside it
+METRIC_BUDGET_NS = {"counter": 1000, "histogram": 2000}
+
+
+@bench("metrics")
+def bench_metrics():
+    import threading
+    import time
+    from metrics import Counter, Histogram, render, REGISTRY
+
+    header("Metrics: overhead per recorded sample")
+    c = Counter("bench_counter_total", "")
+    h = Histogram("bench_latency_seconds", "")
+
+    # Per-thread cells must add up exactly with no lock
+    def hammer():
+        for _ in range(50_000):
+            c.inc()
+            h.observe(0.003)
+    threads = [threading.Thread(target=hammer) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert c.value() == 200_000, c.value()
+    lines = h.render()
+    assert lines[-1] == "bench_latency_seconds_count 200000" and '{le="0.005"} 200000' in lines[3]
+
+    n = 500_000
+    results = {}
+    start = time.perf_counter()
+    for _ in range(n):
+        c.inc()
+    results["counter"] = (time.perf_counter() - start) / n * 1e9
+    start = time.perf_counter()
+    for i in range(n):
+        h.observe(0.0001 * (i & 63))
+    results["histogram"] = (time.perf_counter() - start) / n * 1e9
+    for kind, ns in results.items():
+        budget = METRIC_BUDGET_NS[kind]
+        print(f"{kind:<10} {ns:7.0f} ns/sample (budget {budget} ns)")
+        assert ns < budget, f"{kind} overhead {ns:.0f} ns exceeds {budget} ns budget"
+    REGISTRY["bench_counter_total"] = c
+    assert "bench_counter_total 700000" in render()
+    del REGISTRY["bench_counter_total"]
+
+    # A second daemon on the same port: logged, no crash at startup
+    import contextlib
+    import io
+    from metrics import start_exporter
+    first = start_exporter(path=None, http_addr=("127.0.0.1", 0))
+    with contextlib.redirect_stdout(io.StringIO()) as log:
+        second = start_exporter(path=None, http_addr=first.server_address)
+    assert second is None and "unavailable" in log.getvalue()
+    first.shutdown()
+    print(f"port {first.server_address[1]} taken: second exporter logged it and carried on")
+
+
+# ─── STARTUP ──────────────────────────────────────────────────────────────────
+STARTUP_SCALE = 0.1   # run the modeled Pi import costs 10x faster
+
+
+@bench("startup")
+def bench_startup():
+    import threading
+    from fake_hw import install_fake_backends, remove_fake_backends, unload_fake_backends
+    from startup import StartupProfiler
+
+    header("Startup: time to input-ready (fake backends, Pi costs x0.1)")
+    finder = install_fake_backends(scale=STARTUP_SCALE)
+    try:
+        import volume_backlight_control as vbc
+        vbc.volume.apply_alsa = lambda pct: None   # no amixer here
+
+        # Old order: every import and pygame/display/font before the first button
+        unload_fake_backends(finder)
+        vbc.startup = eager = StartupProfiler()
+        vbc.init_input()
+        vbc.ensure_osd()
+        vbc.init_evdev()
+        vbc.volume.apply()
+        vbc.update_amp_shutdown()
+        eager.mark("input ready")
+
+        # Staged: input first, OSD and evdev on background threads
+        unload_fake_backends(finder)
+        vbc.screen = None
+        vbc.startup = staged = StartupProfiler()
+        vbc.start_input_stage()
+        background = [threading.Thread(target=fn) for fn in (vbc.ensure_osd, vbc.init_evdev)]
+        for t in background:
+            t.start()
+        for t in background:
+            t.join()
+        staged.mark("all ready")
+    finally:
+        # Leave the real pygame importable for the benches after this one
+        remove_fake_backends(finder)
+
+    before, after = eager.elapsed("input ready"), staged.elapsed("input ready")
+    print(f"eager : input ready at {before * 1000:7.1f} ms")
+    print(f"staged: input ready at {after * 1000:7.1f} ms, "
+          f"everything at {staged.elapsed('all ready') * 1000:7.1f} ms")
+    staged.report()
+    assert after < before / 3, "input stage should not wait on pygame/evdev"
+
+
+# ─── REAL-TIME INPUT JITTER ───────────────────────────────────────────────────
+JITTER_PERIOD = 0.005   # s, button poll period being measured
+JITTER_SAMPLES = 400
+
+
+def _spin(stop):
+    while not stop.is_set():
+        pass
+
+
+def _gil_hog(stop):
+    # Stands in for OSD rendering: pure-Python work that holds the GIL
+    while not stop.is_set():
+        sum(i * i for i in range(2000))
+
+
+def _measure_jitter(realtime, cpu):
+    import threading
+    import time
+    from rt_sched import make_realtime
+
+    late = []
+    def loop():
+        if realtime:
+            late.append(make_realtime(cpu=cpu, lock_memory=False))
+        for _ in range(JITTER_SAMPLES):
+            deadline = time.perf_counter() + JITTER_PERIOD
+            time.sleep(JITTER_PERIOD)
+            late.append(time.perf_counter() - deadline)
+    t = threading.Thread(target=loop)
+    t.start()
+    t.join()
+    applied = late.pop(0) if realtime else []
+    late.sort()
+    return applied, late[len(late) // 2], late[int(len(late) * 0.99)], late[-1]
+
+
+@bench("rt-jitter")
+def bench_rt_jitter():
+    import multiprocessing
+    import os
+    import sys
+    import threading
+
+    header("Real-time input: poll jitter under CPU load (Linux)")
+    if not hasattr(os, "sched_setaffinity"):
+        print("skipped: needs Linux scheduling APIs")
+        return
+    cpus = sorted(os.sched_getaffinity(0))
+    cpu = cpus[-1]
+    stop_procs = multiprocessing.Event()
+    procs = [multiprocessing.Process(target=_spin, args=(stop_procs,), daemon=True)
+             for _ in range(len(cpus) * 2)]
+    stop_hog = threading.Event()
+    hog = threading.Thread(target=_gil_hog, args=(stop_hog,), daemon=True)
+    for p in procs:
+        p.start()
+    hog.start()
+    switch_interval = sys.getswitchinterval()
+    try:
+        print(f"load: {len(procs)} spinning processes + 1 GIL-holding thread, {len(cpus)} cpu(s)")
+        for realtime in (False, True):
+            applied, p50, p99, worst = _measure_jitter(realtime, cpu)
+            mode = "realtime" if realtime else "normal  "
+            print(f"{mode}: wakeup late p50 {p50 * 1000:6.2f} ms  p99 {p99 * 1000:6.2f} ms  "
+                  f"max {worst * 1000:6.2f} ms"
+                  + (f"  [{', '.join(applied) or 'not permitted'}]" if realtime else ""))
+    finally:
+        stop_hog.set()
+        stop_procs.set()
+        for p in procs:
+            p.join()
+        hog.join()
+        sys.setswitchinterval(switch_interval)
+
+
+# ─── TOUCH GESTURES ───────────────────────────────────────────────────────────
+@bench("touch")
+def bench_touch():
+    import time
+    from fake_hw import TouchTrace
+    from touch_gestures import EDGE_MARGIN, LONG_PRESS, STEP_PX, TouchGestures
+
+    header("Touch gestures: recorded traces, throughput and latency")
+    fired = []
+    current = {"t": 0.0}
+    actions = {
+        "volume":    lambda n: fired.append(("volume", n, current["t"])),
+        "backlight": lambda n: fired.append(("backlight", n, current["t"])),
+        "mute":      lambda: fired.append(("mute", None, current["t"])),
+    }
+
+    # One session: a swipe up each edge, a swipe down, a hold on the top
+    # edge, a pinch, a tap and a long hold mid-screen (the last three are
+    # the game's/ES's and must not fire anything)
+    trace = TouchTrace(report_hz=60)
+    starts = []
+    for kind, args in (("swipe", (10, 400, 240, 0.25)), ("swipe", (790, 400, 160, 0.3)),
+                       ("swipe", (795, 100, 260, 0.2)), ("hold", (400, 15, 1.0)),
+                       ("pinch", (400, 240, 150, 0.3)), ("hold", (300, 200, 0.1)),
+                       ("hold", (400, 240, 1.0))):
+        starts.append(trace.t)
+        getattr(trace, kind)(*args)
+        trace.idle(0.5)
+    events = trace.events
+
+    g = TouchGestures(actions)
+    # Feed one report at a time, like dev.read() would deliver them
+    reports, batch = [], []
+    for e in events:
+        batch.append(e)
+        if e.type == 0:
+            reports.append(batch)
+            batch = []
+    per_report = []
+    for batch in reports:
+        current["t"] = batch[-1].sec + batch[-1].usec * 1e-6
+        t = time.perf_counter()
+        g.handle(batch)
+        per_report.append(time.perf_counter() - t)
+
+    by_gesture = [(n, a, sum(1 for f in fired if f[0] == n and f[1] == a)) for n, a in
+                  (("backlight", 16), ("volume", 1), ("volume", -1), ("mute", None))]
+    expect = {("backlight", 16): 160 // STEP_PX, ("volume", 1): 240 // STEP_PX,
+              ("volume", -1): 160 // STEP_PX, ("mute", None): 1}
+    for name, arg, n in by_gesture:
+        print(f"{name:<9} {str(arg):>4}: {n} step(s)")
+        assert n == expect[(name, arg)], (name, arg, n)
+    assert len(fired) == sum(expect.values()), "pinch/tap/mid-screen hold must not fire"
+
+    # Recognition latency in trace time: touch-down to the first action
+    firsts = []
+    for start in starts[:4]:
+        first = min(f[2] for f in fired if f[2] >= start)
+        firsts.append(first - start)
+    print(f"first step after touch-down: swipe {min(firsts[:3]) * 1000:.0f}-{max(firsts[:3]) * 1000:.0f} ms, "
+          f"long-press {firsts[3] * 1000:.0f} ms (LONG_PRESS {LONG_PRESS * 1000:.0f} ms, "
+          f"edge {EDGE_MARGIN}px, step {STEP_PX}px)")
+    per_report.sort()
+    print(f"processing per report: p50 {per_report[len(per_report) // 2] * 1e6:.1f} us, "
+          f"p99 {per_report[int(len(per_report) * 0.99)] * 1e6:.1f} us")
+
+    # Throughput: the whole trace, many times over
+    g = TouchGestures({"volume": lambda n: None, "backlight": lambda n: None, "mute": lambda: None})
+    rounds = 200
+    t = time.perf_counter()
+    for _ in range(rounds):
+        g.handle(events)
+    elapsed = time.perf_counter() - t
+    print(f"throughput: {len(events) * rounds / elapsed / 1e6:.2f}M events/s "
+          f"({len(events)} events, {len(reports)} reports per session)")
+
+
+# ─── STICK CALIBRATION ────────────────────────────────────────────────────────
+@bench("calibrate")
+def bench_calibrate():
+    import time
+    from fake_hw import stick_capture
+
+    header("Stick calibration: synthetic hour-long capture")
+    try:
+        from calibrate_sticks import calibrate, validate
+    except ImportError as e:
+        print(f"skipped: {e}")
+        return
+    centers = {"LX": 131, "LY": 124, "RX": 128, "RY": 135}
+    config = {"invert": {"LX": False, "LY": True, "RX": False, "RY": True, "LT": False, "RT": False},
+              "deadzone": {k: 12 for k in centers}, "smoothing": {}, "triggers": {}}
+    data = stick_capture(3600, centers=centers, noise=1.2)
+    t = time.perf_counter()
+    stats, new = calibrate(data, config)
+    elapsed = time.perf_counter() - t
+    validate(new)
+    print(f"{len(data) / 1e6:.1f} MB, {stats['LX']['samples']} samples: {elapsed:.2f} s")
+    for name, c in centers.items():
+        want = 255 - c if config["invert"][name] else c
+        assert abs(new["center"][name] - want) <= 1, (name, new["center"][name], want)
+    print(f"center   {new['center']}")
+    print(f"deadzone {new['deadzone']} (was 12)")
+    print(f"triggers {new['triggers']} (was 24/240)")
+    print(f"smoothing {new['smoothing']}")
+    assert all(3 <= dz <= 8 for dz in new["deadzone"].values())
+    assert 20 < new["triggers"]["LT_min"] < 30 and 225 < new["triggers"]["LT_max"] < 235
+    assert elapsed < 5.0, "an hour of capture should calibrate in seconds"
+
+
+# ─── CONTROLLER IDLE MODE ─────────────────────────────────────────────────────
+@bench("firmware-idle")
+def bench_firmware_idle():
+    from fake_hw import FirmwareShim
+
+    header("Controller firmware: active vs idle (host shim, 10 virtual min)")
+    shim = FirmwareShim(config={"idle": {"after_s": 60, "sample_hz": 4, "wake_threshold": 6}})
+    # Play for 2 minutes, leave it alone, press A at 7:00, nudge the stick at 9:30
+    for t in range(0, 120):
+        shim.at(t + 0.5, shim.set_axis, "LX", 32768 + (t % 5) * 4000)
+    shim.at(120.5, shim.set_axis, "LX", 32768)
+    shim.at(420.0, shim.press, "A")
+    shim.at(420.1, shim.release, "A")
+    shim.at(570.0, shim.set_axis, "RY", 50000)
+    shim.run(600.0)
+
+    windows = (("active (playing)", 0, 120), ("idle (untouched)", 200, 400))
+    rates = {}
+    for label, start, end in windows:
+        rates[label] = (shim.rate([t for t, _ in shim.reports], start, end),
+                        shim.rate(shim.adc_reads, start, end))
+        print(f"{label:<17}: {rates[label][0]:7.0f} reports/min  {rates[label][1]:7.0f} ADC reads/min")
+    wake_press = min(t for t, _ in shim.reports if t >= 420.0) - 420.0
+    wake_stick = min(t for t, _ in shim.reports if t >= 570.0) - 570.0
+    print(f"wake latency: button {wake_press * 1000:.0f} ms, stick {wake_stick * 1000:.0f} ms")
+    for t, line in shim.console:
+        print(f"  {t:6.1f}s  {line}")
+    active, idle = rates["active (playing)"], rates["idle (untouched)"]
+    assert idle[0] == 0 and idle[1] <= active[1] / 20
+    assert wake_press <= 0.05 and wake_stick <= 0.3
+
+
+# ─── MIXER EVENTS ─────────────────────────────────────────────────────────────
+@bench("mixer")
+def bench_mixer():
+    import threading
+    import time
+    from fake_hw import FakeMixer
+    from mixer_watch import MixerWatcher
+
+    header("Mixer watcher: external changes and steady-state queries")
+    seen = threading.Event()
+    mixer = FakeMixer(percent=60)
+    watcher = MixerWatcher(mixer, on_change=lambda s: seen.set())
+    threading.Thread(target=watcher.run, daemon=True).start()
+    while watcher.state.percent is None:
+        time.sleep(0.001)
+
+    # Steady state: nothing changes, nothing is read
+    reads = mixer.reads
+    time.sleep(0.5)
+    print(f"idle 0.5 s          : {mixer.reads - reads} mixer reads")
+    assert mixer.reads == reads
+
+    # Our own writes update the state without an on_change callback
+    for pct in (62, 64, 66):
+        watcher.expect(pct)
+        mixer.set(pct)
+        time.sleep(0.01)
+    assert watcher.state.percent == 66 and watcher.external == 0 and not seen.is_set()
+
+    # A held button: several writes in flight, ALSA reports only some of them
+    for pct in (68, 70, 72, 74):
+        watcher.expect(pct)
+    for pct in (70, 74):
+        mixer.set(pct)
+        time.sleep(0.01)
+    assert watcher.state.percent == 74 and watcher.external == 0 and not seen.is_set()
+    print(f"own writes          : 7 writes, 5 events, 0 reported as external")
+
+    # A write of the value already there doesn't hide the next external change,
+    # whether ALSA sends an event for it or not
+    for event in (True, False):
+        seen.clear()
+        watcher.expect(watcher.state.percent)
+        if event:
+            mixer.set(watcher.state.percent)
+            time.sleep(0.01)
+        mixer.set(watcher.state.percent + 1)
+        assert seen.wait(1.0), event
+    print(f"no-op own writes    : next external change still reported")
+    external = watcher.external
+
+    # External changes: one event each, latency from write to callback
+    latencies = []
+    for pct, muted in ((40, False), (40, True), (80, False)) * 20:
+        seen.clear()
+        t = time.perf_counter()
+        mixer.set(pct, muted)
+        assert seen.wait(1.0)
+        latencies.append(time.perf_counter() - t)
+        assert (watcher.state.percent, watcher.state.muted) == (pct, muted)
+    latencies.sort()
+    print(f"external changes    : {len(latencies)}, {mixer.reads - reads} mixer reads, "
+          f"p50 {latencies[len(latencies) // 2] * 1e6:.0f} us, max {latencies[-1] * 1e6:.0f} us to on_change")
+    assert watcher.external - external == len(latencies)
+
+
+# ─── EMULATOR PROFILES ────────────────────────────────────────────────────────
+class _Setting:
+    def __init__(self, value):
+        self.value = value
+
+    def read(self):
+        return self.value
+
+    def write(self, value):
+        self.value = value
+
+
+def _poll_loop_cpu(profiles, seconds=1.0):
+    """CPU seconds per second spent by a button_loop-shaped thread."""
+    import threading
+    import time
+    from hotkeys import HOTKEYS_FILE, HotkeyEngine
+
+    engine = HotkeyEngine({"volume": lambda n=1: None, "mute": lambda: None})
+    engine.load(HOTKEYS_FILE, {"gpio": {"VOL_UP": 17, "VOL_DOWN": 27}.__getitem__})
+    pins = [True, True, True]
+    used = []
+
+    def loop():
+        start, cpu0 = time.monotonic(), time.thread_time()
+        last = list(pins)
+        while time.monotonic() - start < seconds:
+            u, d, hp = pins[0], pins[1], pins[2]
+            if u != last[0]:
+                engine.feed("gpio", 17, not u)
+            if d != last[1]:
+                engine.feed("gpio", 27, not d)
+            engine.tick()
+            last = [u, d, hp]
+            time.sleep(profiles.current.poll_interval)
+        used.append((time.thread_time() - cpu0) / seconds)
+    t = threading.Thread(target=loop)
+    t.start()
+    t.join()
+    return used[0]
+
+
+@bench("emulator-profiles")
+def bench_emulator_profiles():
+    import contextlib
+    import io
+    import os
+    import subprocess
+    import sys
+    import tempfile
+    import threading
+    import time
+    from emulator_profiles import ControlFifo, EmulatorProfiles, load_table
+    from fake_hw import FakePowerSource
+    from idle import IdleManager
+    from power_profiles import PowerProfileManager
+
+    header("Emulator profiles: runcommand hook cost and background CPU")
+    here = os.path.dirname(os.path.abspath(__file__))
+    backlight, governor = _Setting(200), _Setting("ondemand")
+    power = PowerProfileManager(FakePowerSource(plugged=True))
+    power.refresh()
+    now = [0.0]
+    idle = IdleManager(backlight.read, backlight.write, clock=lambda: now[0])
+    emus = EmulatorProfiles(load_table(), power, idle.level, idle.set, governor)
+
+    got = threading.Event()
+    def handler(line):
+        emus.command(line)
+        got.set()
+
+    with tempfile.TemporaryDirectory() as d, contextlib.redirect_stdout(io.StringIO()) as log:
+        fifo = ControlFifo(os.path.join(d, "control"), handler).open()
+        threading.Thread(target=fifo.run, daemon=True).start()
+        env = dict(os.environ, PISWITCH_FIFO=fifo.path)
+
+        def timed(cmd, n):
+            times = []
+            for _ in range(n):
+                got.clear()
+                t = time.perf_counter()
+                subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL)
+                got.wait(2.0)
+                times.append(time.perf_counter() - t)
+                got.clear()
+                subprocess.run(["sh", os.path.join(here, "runcommand-onend.sh")], env=env)
+                got.wait(2.0)
+            return sorted(times)[n // 2]
+
+        hook = timed(["sh", os.path.join(here, "runcommand-onstart.sh"), "n64", "lr-mupen64plus-next", "rom", "cmd"], 20)
+        cold = timed([sys.executable, "-c",
+                      "import os, sys; f = open(os.environ['PISWITCH_FIFO'], 'w'); f.write('start n64 lr-mupen64plus-next\\n')"], 10)
+
+        # Apply and restore
+        menu = power.current
+        emus.command("start n64 lr-mupen64plus-next")
+        heavy = power.current
+        assert (heavy.poll_interval, heavy.osd_fps, heavy.amp_compression) == (0.1, 0, 2)
+        assert backlight.value == 180 and governor.value == "performance"
+        heavy_cpu = _poll_loop_cpu(power)
+        emus.command("end")
+        assert power.current == menu and backlight.value == 200 and governor.value == "ondemand"
+        menu_cpu = _poll_loop_cpu(power)
+
+    assert log.getvalue().count("profile heavy") == 31
+
+    # A profile that changes nothing on top of the power profile (light =
+    # balanced's 50 ms poll) doesn't re-run the listeners
+    balanced = PowerProfileManager(FakePowerSource(plugged=False))
+    applied = []
+    balanced.add_listener(applied.append)
+    light = EmulatorProfiles(load_table(), balanced, backlight.read, backlight.write, governor)
+    with contextlib.redirect_stdout(io.StringIO()):
+        light.command("start nes lr-fceumm")
+        light.command("end")
+    assert len(applied) == 1, applied
+
+    # Launched and quit while the idle manager has the panel dimmed: the
+    # user's 200 is saved and restored, the panel stays dim until a wake
+    now[0] = idle.advance()
+    idle.advance()
+    dim = backlight.value
+    with contextlib.redirect_stdout(io.StringIO()):
+        emus.command("start n64 lr-mupen64plus-next")
+    assert backlight.value == dim and idle.saved == 180
+    emus.command("end")
+    assert backlight.value == dim and idle.saved == 200
+    idle.activity()
+    assert backlight.value == 200
+    print(f"no-op overlay: listeners not re-run; launch while dimmed: panel stays at {dim}, "
+          f"200 restored on wake")
+    print(f"onstart hook (sh + printf to FIFO): {hook * 1000:6.1f} ms")
+    print(f"python3 cold start per launch     : {cold * 1000:6.1f} ms")
+
+    print(f"button loop CPU, menu ({menu.poll_interval * 1000:.0f} ms poll, OSD {menu.osd_fps} fps): "
+          f"{menu_cpu * 100:.3f}%")
+    print(f"button loop CPU, n64  ({heavy.poll_interval * 1000:.0f} ms poll, OSD off)   : "
+          f"{heavy_cpu * 100:.3f}%  ({menu_cpu / max(heavy_cpu, 1e-9):.1f}x less)")
+
+
+# ─── STATUS LEDS ──────────────────────────────────────────────────────────────
+def _naive_toggles(frames, seconds):
+    """GPIO.output + sleep per edge: how often a software blinker wakes."""
+    cycle = sum(hold or seconds for hold, _ in frames)
+    edges = 0
+    for hold, levels in frames:
+        for period, duty in levels:
+            if 0 < duty < period and period > 10_000_000:   # a visible blink
+                edges += 2 * (hold or seconds) * 1e9 / period
+            elif 0 < duty < period:
+                edges += 2 * (hold or seconds) * 100   # dimming: 100 Hz software PWM
+    return edges * seconds / cycle
+
+
+@bench("leds")
+def bench_leds():
+    import tempfile
+    from fake_hw import FakePwmTree
+    from led_status import PATTERNS, LedStatus, SysfsPwm
+
+    header("Status LEDs: wakeups and sysfs writes per minute")
+    print(f"{'pattern':<22} {'wakeups':>8} {'writes':>8}   {'naive GPIO loop':>15}")
+    with tempfile.TemporaryDirectory() as root:
+        tree = FakePwmTree(root)
+        for label, statuses, flash in (("mute", ["mute"], False), ("headphones", ["headphones"], False),
+                                       ("charging", ["charging"], False), ("low battery", ["low"], False),
+                                       ("profile over charging", ["charging"], True)):
+            channels = [SysfsPwm(0, ch, root).open() for ch in range(2)]
+            opened = sum(pwm.writes for pwm in channels)
+            leds = LedStatus(channels, clock=lambda: 0.0)
+            for st in statuses:
+                leds.set(st)
+            if flash:
+                leds.flash()
+            wakeups = 0
+            deadline = leds.advance(0.0)
+            while deadline is not None and deadline < 60.0:
+                deadline = leds.advance(deadline)
+                wakeups += 1
+            writes = leds.writes() - opened
+            for ch, pwm in enumerate(channels):
+                period, duty, enable = tree.read(ch)
+                assert (period, duty, enable) == (pwm.period, pwm.duty, 1) and duty <= period
+            naive = _naive_toggles(PATTERNS[statuses[0]][1], 60)
+            print(f"{label:<22} {wakeups:8d} {writes:8d}   {naive:15.0f}")
+            if label in ("mute", "headphones"):
+                assert wakeups == 0 and writes <= 2
+
+
+# ─── HID REPORT CAPTURE ───────────────────────────────────────────────────────
+@bench("hid")
+def bench_hid():
+    import os
+    import tempfile
+    import threading
+    import time
+    from fake_hw import FirmwareShim, host_arrivals
+
+    header("Gamepad reports: firmware -> host timing -> log -> analysis")
+    try:
+        import hid_capture as hc
+    except ImportError as e:
+        print(f"skipped: {e}")
+        return
+    # 90 virtual seconds of firmware: sticks and A in use for 20 s, then
+    # untouched until idle mode stops the reports at about 85 s
+    shim = FirmwareShim(config={"idle": {"after_s": 60}})
+    for i in range(200):
+        shim.at(5.0 + i * 0.1, shim.set_axis, "LX", 32768 + (i % 20) * 1500)
+    for t in (8.0, 12.0, 16.0):
+        shim.at(t, shim.press, "A")
+        shim.at(t + 0.2, shim.release, "A")
+    shim.run(90.0)
+    records = hc.records_from(host_arrivals(shim.reports))
+
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "pad.bin")
+        hc.save(path, records)
+        size = os.path.getsize(path)
+        a = hc.analyze(hc.load(path))
+    print(f"log: {size} bytes for {a['reports']} reports ({hc.RECORD.itemsize} B/report)")
+    iv = a["interval_ms"]
+    print(f"rate {a['rate_hz']:.1f} Hz  median {iv['median']:.2f} ms  jitter sd {a['jitter_ms']:.2f} ms  "
+          f"p99 {iv['p99']:.2f} ms  gaps {a['gaps']}")
+    print(f"duplicates {a['duplicate_ratio'] * 100:.1f}%  "
+          f"changes/s LX {a['change_rate_hz']['LX']:.2f}  buttons {a['change_rate_hz']['buttons']:.2f}")
+    assert a["reports"] == len(shim.reports)
+    assert 9.5 < iv["median"] < 10.5
+    assert a["changes"]["buttons"] == 6 and a["changes"]["LY"] == 0
+    assert a["gaps"] == 16               # one per host stall
+    assert a["duplicate_ratio"] > 0.9    # untouched pad still sends every 10 ms
+
+    # pty replay -> capture: same reports, same timing
+    sample = records[records["t_ns"] < records["t_ns"][0] + 3_000_000_000]
+    master, slave, pty_path = hc.open_pty()
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "again.bin")
+        with open(path, "wb") as out:
+            cap = hc.Capture(pty_path, out).open()
+            player = threading.Thread(target=hc.replay, args=(sample, master))
+            player.start()
+            cap.run(3.3)
+            player.join()
+            cap.close()
+        again = hc.load(path)
+    os.close(master)
+    os.close(slave)
+    b = hc.analyze(again)
+    print(f"pty replay: {len(sample)} sent, {b['reports']} captured in {cap.wakeups} wakeups, "
+          f"median {b['interval_ms']['median']:.2f} ms (source {hc.analyze(sample)['interval_ms']['median']:.2f})")
+    assert (again["report"] == sample["report"]).all()
+    assert abs(b["interval_ms"]["median"] - 10.0) < 1.0
+
+    # The end of a replay (master closed) ends a capture without a time limit
+    master, slave, pty_path = hc.open_pty()
+    with open(os.devnull, "wb") as out:
+        cap = hc.Capture(pty_path, out).open()
+        player = threading.Thread(target=lambda: (hc.replay(sample[:50], master), time.sleep(0.1),
+                                                  os.close(master)))
+        player.start()
+        cap.run()
+        player.join()
+        cap.close()
+    os.close(slave)
+    print(f"pty hangup: capture ended after {cap.count} reports")
+    assert cap.ended and cap.count == 50, cap.count
+
+    # An hour at 100 Hz
+    hour = hc.np.resize(records, 360_000)
+    hour["t_ns"] = hc.np.arange(len(hour), dtype=hc.np.int64) * 10_000_000
+    t = time.perf_counter()
+    hc.analyze(hour)
+    elapsed = time.perf_counter() - t
+    print(f"analyze 1 h ({len(hour)} reports): {elapsed * 1000:.0f} ms")
+    assert elapsed < 2.0
+
+
+# ─── I2C FAULTS ───────────────────────────────────────────────────────────────
+def _press_loop(write, bus, seconds=2.5, period=0.01):
+    """A 100 Hz button loop doing one gain write per pass while faults hit
+    the bus: 5 NACKs at 0.5 s, a brown-out at 1.0 s. Returns handling
+    times in ms."""
+    import time
+    from amp_power import GAIN_REGISTER
+
+    times = []
+    start = time.perf_counter()
+    faults = [(0.5, bus.nack, 5), (1.0, bus.brownout)]
+    i = 0
+    while time.perf_counter() - start < seconds:
+        now = time.perf_counter() - start
+        while faults and faults[0][0] <= now:
+            fn, *args = faults.pop(0)[1:]
+            fn(*args)
+        t = time.perf_counter()
+        write(GAIN_REGISTER, 20 + i % 16)
+        times.append((time.perf_counter() - t) * 1000)
+        i += 1
+        time.sleep(max(0.0, start + i * period - time.perf_counter()))
+    return times
+
+
+@bench("i2c-faults")
+def bench_i2c_faults():
+    import time
+    from types import SimpleNamespace
+    from amp_power import AmpPower
+    from fake_hw import FaultyI2C
+    from i2c_worker import I2CWorker
+
+    header("Amp I2C faults: button-loop handling time (NACKs, brown-out)")
+    print(f"{'path':<16}{'p50 ms':>8}{'p99 ms':>8}{'max ms':>8}{'errors':>8}  amp == shadow")
+    clock = SimpleNamespace(now=time.monotonic)
+    results = {}
+    for label in ("direct", "i2c worker"):
+        bus = FaultyI2C(FakeTPA2016(clock))
+        amp = AmpPower(bus, bus.set_shdn)
+        errors = 0
+        if label == "direct":
+            def write(reg, value):
+                nonlocal errors
+                try:
+                    amp.write_register(reg, value)
+                except OSError:
+                    errors += 1   # before: raised out of button_loop
+            times = _press_loop(write, bus)
+        else:
+            def reset_amp():
+                amp.set_shdn(False)
+                time.sleep(0.001)
+                amp.wake()
+            i2c = I2CWorker(recovery=(bus.close, reset_amp), resync=amp.restore).start()
+
+            def write(reg, value):
+                amp.shadow[reg] = value
+                i2c.submit(("reg", reg), lambda r=reg: amp.write_register(r, amp.shadow[r]))
+            times = _press_loop(write, bus)
+            i2c.drain(5.0)
+            errors = i2c.errors
+        times.sort()
+        match = all(bus.amp.regs[r] == amp.shadow[r] for r in amp.shadow)
+        results[label] = (times[len(times) // 2], times[int(len(times) * 0.99)], times[-1], match)
+        print(f"{label:<16}{results[label][0]:>8.3f}{results[label][1]:>8.3f}{results[label][2]:>8.1f}"
+              f"{errors:>8}  {'yes' if match else 'no'}")
+    print(f"worker: {i2c.recoveries} recovery steps, {i2c.resyncs} resyncs, "
+          f"{i2c.coalesced} writes coalesced, {i2c.dropped} dropped")
+    direct, worker = results["direct"], results["i2c worker"]
+    assert worker[2] < 5.0 and worker[3], "input must not wait on the bus, amp must be restored"
+    assert direct[2] >= 40.0 and not direct[3]
+
+    # Recovery and resync failing with something other than OSError (the
+    # Adafruit driver's probe raises ValueError at a silent amp) is just
+    # another failure: the worker stays up and still recovers
+    import contextlib
+    import errno
+    import io
+    nacks, resync_fails, done = [4], [1], []
+    def write():
+        if nacks[0]:
+            nacks[0] -= 1
+            raise OSError(errno.EREMOTEIO, "NACK")
+        done.append(1)
+    def probe():
+        raise ValueError("No I2C device at address: 0x58")
+    def resync():
+        if resync_fails[0]:
+            resync_fails[0] -= 1
+            raise ValueError("No I2C device at address: 0x58")
+    w = I2CWorker(recovery=(probe,), resync=resync, sleep=lambda s: None).start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        w.submit("gain", write)
+        w.drain(1.0)
+        w.submit("gain", write)
+        w.drain(1.0)
+    assert w.thread.is_alive() and not w.faulted and w.resyncs == 1 and len(done) == 2
+    print(f"ValueError from recovery/resync: worker alive, {w.recoveries} recovery steps, recovered")
+
+
+# ─── OSD FONT ATLAS ───────────────────────────────────────────────────────────
+_OSD_FONT_PROBE = """
+import os, sys, time
+os.environ["SDL_VIDEODRIVER"] = os.environ["SDL_AUDIODRIVER"] = "dummy"
+os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+import pygame as pg
+from font_atlas import FontAtlas   # the daemon has it imported already
+mode, path = sys.argv[1], sys.argv[2]
+t = time.perf_counter()
+if mode == "atlas":
+    font = FontAtlas(pg, 24, path)
+    pg.display.init()
+else:
+    pg.init()
+screen = pg.display.set_mode((800, 480))
+if mode != "atlas":
+    font = pg.font.Font(path, 24)
+for title in ("VOLUME", "MUTED", "HEADPHONES", "BALANCED", "BATTERY 15%"):
+    screen.fill((0, 0, 0))
+    screen.blit(font.render(title, True, (255, 255, 255)), (20, 20))
+elapsed = time.perf_counter() - t
+rss = [l for l in open("/proc/self/status") if l.startswith("VmRSS")][0].split()[1]
+print(elapsed, rss, int("pygame.font" in sys.modules and pg.font.get_init()))
+"""
+
+
+@bench("osd-font")
+def bench_osd_font():
+    import os
+    import statistics
+    import subprocess
+    import tempfile
+
+    header("OSD font: TTF via pygame.font vs mmap'd atlas (fresh process)")
+    os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+    try:
+        import font_atlas
+        import pygame  # noqa: F401  (build_atlas needs it)
+    except ImportError as e:
+        print(f"skipped: {e}")
+        return
+    here = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as d:
+        atlas = os.path.join(d, "osd_font.atlas")
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        with open(atlas, "wb") as f:
+            f.write(font_atlas.build_atlas())
+        print(f"atlas: {os.path.getsize(atlas)} bytes")
+        results = {}
+        for mode, path in (("ttf", font_atlas.TTF_PATH), ("atlas", atlas)):
+            runs = []
+            for _ in range(9):
+                out = subprocess.run([sys.executable, "-c", _OSD_FONT_PROBE, mode, path], cwd=here,
+                                     capture_output=True, text=True, check=True).stdout.split()
+                runs.append((float(out[0]), int(out[1]), int(out[2])))
+            results[mode] = (statistics.median(r[0] for r in runs), statistics.median(r[1] for r in runs),
+                             runs[0][2])
+            t, rss, font_on = results[mode]
+            print(f"{mode:<6}: init + first frames {t * 1000:6.1f} ms, RSS {rss / 1024:5.1f} MB, "
+                  f"font engine {'loaded' if font_on else 'not loaded'}")
+    ttf, atl = results["ttf"], results["atlas"]
+    print(f"saved {(ttf[0] - atl[0]) * 1000:.1f} ms and {(ttf[1] - atl[1]) / 1024:.1f} MB")
+    assert not atl[2] and atl[0] < ttf[0] and atl[1] < ttf[1]
+
+
+# ─── AMP CONSOLE ──────────────────────────────────────────────────────────────
+KEYBOARD_MODE_PERIOD = 0.05   # the old keyboard_mode: one key per 50 ms loop
+
+
+@bench("amp-console")
+def bench_amp_console():
+    from fake_hw import fake_volumecombo
+
+    header("Amp console: scripted bursts on the fake SMBus + mixer")
+    vc, bus = fake_volumecombo()
+    vc.init_console_hw()
+    lines = []
+    for label, script, sync, verify in (
+            ("volume burst, per-op sync", "repeat 500 up; repeat 500 down", True, False),
+            ("volume burst, async", "repeat 500 up; repeat 500 down", False, False),
+            ("mixed + faults, verify", "repeat 50 up; repeat 4 sws; fault nack 3; repeat 50 down; "
+             "fault brownout; repeat 20 up; shdn on; repeat 5 down; shdn off; repeat 2 comp", True, True)):
+        console = vc.make_console(sync=sync, verify=verify)
+        console.ops["fault"] = lambda kind, n=1: bus.nack(int(n)) if kind == "nack" else bus.brownout()
+        console.out = lines.append
+        console.run([script])
+        console.report()
+        n = sum(len(v) for v in console.latency.values())
+        rate = n / (console.clock() - console.started)
+        print(f"{label:<28}: {n:5d} ops, {rate:8.0f} ops/s, "
+              f"{console.failures} failed, {console.mismatches} mismatches")
+        if verify:
+            assert console.mismatches == 0 and vc.i2c.resyncs >= 1
+        else:
+            assert rate > 20 * (1 / KEYBOARD_MODE_PERIOD)
+    print(f"old keyboard_mode: at most {1 / KEYBOARD_MODE_PERIOD:.0f} ops/s, no timing, no readback")
+    print("\n".join("  " + l for l in lines[-10:]))
+    regs = bus.amp.regs
+    assert all(regs[r] == vc.get_amp().shadow[r] for r in regs)
+
+    # amixer rounds: one percent off is not a mismatch, two is
+    exact = vc.get_current_volume
+    for off, want in ((1, 0), (-1, 0), (2, 1)):
+        vc.get_current_volume = lambda: f"{vc.volume.alsa_percent + off}%"
+        assert vc.verify_mixer() == want, (off, vc.verify_mixer())
+    vc.get_current_volume = exact
+
+    # Interactive mode keeps keyboard_mode's headphone auto-mute
+    console = vc.make_console()
+    console.out = lines.append
+    jack, gpio_input = [1], vc.GPIO.input
+    vc.GPIO.input = lambda pin: jack[0] if pin == vc.JACK_SWITCH_GPIO else 1
+    check = vc.auto_mute_on_jack(console)
+    seen = []
+    for level in (0, 0, 1):
+        jack[0] = level
+        check(vc.JACK_SWITCH_GPIO)
+        vc.i2c.drain()
+        seen.append(bus.amp.shdn_high)
+    vc.GPIO.input = gpio_input
+    print(f"jack auto-mute (plug, bounce, unplug): amp on = {seen}")
+    assert seen == [False, False, True]
+
+    # A console gain change moves the curve; the next step starts from it
+    console.run(["gain 6; up; down"])
+    amp_gain = bus.amp.regs[vc.GAIN_REGISTER]
+    print(f"gain 6, up, down: model amp {vc.volume.amp_db} dB, register {amp_gain - 28} dB")
+    assert vc.volume.table == vc.build_table(6) and amp_gain == vc.db_to_regval(vc.volume.amp_db)
+    console.run(["gain 0"])
+
+    # Gain/compression changes in SHDN aren't read back (the amp can't ACK),
+    # and a readback no longer holds up the worker
+    errors = vc.i2c.errors
+    console.reset()
+    console.run(["shdn on; gain 3; comp; comp; shdn off; gain 0; comp; comp"])
+    slowest = max(max(console.latency["gain"]), max(console.latency["comp"]))
+    print(f"gain/comp with readback: {vc.i2c.errors - errors} I2C errors in SHDN, "
+          f"slowest {slowest * 1000:.2f} ms")
+    assert vc.i2c.errors == errors and slowest < 0.01
+
+
+# ─── IDLE DISPLAY SLEEP ───────────────────────────────────────────────────────
+IDLE_WINDOW = 2.0   # s of wall time per loop-wakeup measurement
+
+
+def _voluntary_switches(tids):
+    """Times each thread went to sleep so far (= wakeups), from /proc (Linux)."""
+    counts = {}
+    for name, tid in tids.items():
+        with open(f"/proc/self/task/{tid}/status") as f:
+            for line in f:
+                if line.startswith("voluntary_ctxt_switches"):
+                    counts[name] = int(line.split()[1])
+    return counts
+
+
+@bench("idle")
+def bench_idle():
+    import os
+    import tempfile
+    import threading
+    import time
+    from types import SimpleNamespace
+    from fake_hw import FakeBacklightTree, FakeEvdevDevice, FakeInputEvent as Ev, TouchTrace
+    from fake_hw import install_fake_backends, remove_fake_backends
+    from idle import BLANK, DIM_LEVEL, IdleManager
+    from input_router import EV_KEY, EV_SYN
+    from touch_gestures import ABS_MT_POSITION_X, ABS_MT_POSITION_Y
+
+    header("Idle display sleep: wakeups while idle, wake latency")
+
+    # The timer alone, on a fake clock: an hour without input, then a press
+    now = [0.0]
+    levels = []
+    mgr = IdleManager(lambda: 200, levels.append, clock=lambda: now[0])
+    deadline = mgr.advance()
+    while deadline is not None and deadline < 3600:
+        now[0] = deadline
+        deadline = mgr.advance()
+    print(f"timer, 1 h without input: {mgr.wakeups} wakeups, backlight writes {levels}")
+    now[0] = 3600.0
+    mgr.activity()
+    assert mgr.wakeups == 3 and levels == [DIM_LEVEL, 0, 200] and mgr.state == "active"
+
+    # The daemon's own input loops, on fake GPIO / evdev devices and a fake
+    # sysfs backlight: first awake, then blanked
+    finder = install_fake_backends(scale=0)
+    try:
+        import volume_backlight_control as vbc
+        vbc.init_input()
+        vbc.hotkeys.devices.pop("joycon", None)  # bench_startup loaded them already
+        vbc.init_evdev()
+    finally:
+        remove_fake_backends(finder)
+    vbc.volume.apply_alsa = lambda pct: None
+    root = tempfile.TemporaryDirectory()
+    tree = FakeBacklightTree(root.name)
+    vbc.BACKLIGHT_PATH, vbc.BL_FILE = root.name, None
+    vbc.idle.dim_after = IDLE_WINDOW + 0.5
+    vbc.idle.blank_after = IDLE_WINDOW + 1.0
+    touch = FakeEvdevDevice("FT5406 memory based driver", path="touch",
+                            axes={ABS_MT_POSITION_X: 799, ABS_MT_POSITION_Y: 479})
+    joy = FakeEvdevDevice("Nintendo Switch Combined Joy-Cons", path="joycon")
+    pad = FakeEvdevDevice("ItsyBitsy M0 Express", vendor=0x239A, path="gamepad")
+    devices = {d.path: d for d in (touch, joy, pad)}
+    vbc.evdev.list_devices = lambda: list(devices)
+    vbc.evdev.InputDevice = devices.__getitem__
+    sink = os.open(os.devnull, os.O_WRONLY)
+    vbc.create_virtual_gamepad = lambda: SimpleNamespace(fd=sink)
+
+    tids, started = {}, threading.Barrier(6)
+    def spawn(name, fn):
+        def run():
+            tids[name] = threading.get_native_id()
+            started.wait()
+            fn()
+        threading.Thread(target=run, name=name, daemon=True).start()
+    vbc.idle.last_input = time.monotonic()
+    for name, fn in (("button_loop", vbc.button_loop), ("touch_watcher", vbc.touch_watcher),
+                     ("joycon_watcher", vbc.joycon_watcher), ("gamepad_watcher", vbc.gamepad_watcher),
+                     ("idle timer", vbc.idle_stage)):
+        spawn(name, fn)
+    started.wait()
+    time.sleep(0.2)
+
+    def per_minute():
+        before = _voluntary_switches(tids)
+        time.sleep(IDLE_WINDOW)
+        after = _voluntary_switches(tids)
+        return {name: (after[name] - before[name]) * 60 / IDLE_WINDOW for name in tids}
+    awake = per_minute()
+    while vbc.idle.state is not BLANK:
+        time.sleep(0.05)
+    assert tree.read() == 0
+    time.sleep(0.2)
+    asleep = per_minute()
+    print(f"{'loop':<16}{'awake /min':>12}{'blank /min':>12}")
+    for name in tids:
+        print(f"{name:<16}{awake[name]:12.0f}{asleep[name]:12.0f}")
+    print(f"{'total':<16}{sum(awake.values()):12.0f}{sum(asleep.values()):12.0f}"
+          f"   (awake, button_loop ticks hotkeys every {vbc.profiles.current.poll_interval * 1000:.0f} ms)")
+    assert all(n <= 30 for n in asleep.values()), asleep
+
+    # Wake: input arrives -> brightness written back, for every source
+    writes = []
+    write = vbc.backlight.write
+    vbc.backlight.write = lambda v: (write(v), writes.append((time.perf_counter(), v)))
+    vbc.idle.dim_after, vbc.idle.blank_after = 0.05, 0.1
+    press = [Ev(EV_KEY, 0x130, 1), Ev(EV_SYN, 0, 0)]
+    release = [Ev(EV_KEY, 0x130, 0), Ev(EV_SYN, 0, 0)]
+    tap = TouchTrace()
+    tap.down(0, 400, 240)
+    tap.up(0)
+    def gpio(pressed):
+        vbc.btn_up.value = not pressed
+        vbc.GPIO.edge_callbacks[vbc.VOL_UP_PIN](vbc.VOL_UP_PIN)
+    frame = 1 / 60
+    print(f"{'input':<16}{'to backlight on':>16}")
+    for name, inject, undo in (("touch", lambda: touch.push(tap.events), None),
+                               ("joycon", lambda: joy.push(press), lambda: joy.push(release)),
+                               ("gamepad", lambda: pad.push(press), lambda: pad.push(release)),
+                               ("gpio button", lambda: gpio(True), lambda: gpio(False))):
+        latencies = []
+        for _ in range(5):
+            while vbc.idle.state is not BLANK:
+                time.sleep(0.02)
+            del writes[:]
+            t0 = time.perf_counter()
+            inject()
+            assert vbc.idle.awake.wait(1.0)
+            t, value = writes[-1]
+            latencies.append(t - t0)
+            assert value == 200 and tree.read() == 200
+            if undo:
+                undo()
+        worst = max(latencies)
+        print(f"{name:<16}{worst * 1000:13.2f} ms (worst of 5)")
+        assert worst < frame, (name, worst)
+    print(f"one frame at 60 Hz: {frame * 1000:.1f} ms; every write one pwrite on the held fd")
+
+    # A Joy-Con long press (Home + TR held 1 s) right after a blank: the wake
+    # restarts button_loop, which ticks long presses for every device
+    while vbc.idle.state is not BLANK:
+        time.sleep(0.02)
+    vbc.idle.dim_after, vbc.idle.blank_after = 60, 120
+    fired, compression = [], vbc.hotkeys.actions["compression"]
+    vbc.hotkeys.actions["compression"] = lambda: fired.append(time.perf_counter())
+    t0 = time.perf_counter()
+    joy.push([Ev(EV_KEY, 102, 1), Ev(EV_KEY, 0x137, 1), Ev(EV_SYN, 0, 0)])
+    time.sleep(1.3)
+    joy.push([Ev(EV_KEY, 0x137, 0), Ev(EV_KEY, 102, 0), Ev(EV_SYN, 0, 0)])
+    vbc.hotkeys.actions["compression"] = compression
+    print(f"Joy-Con long press after a blank: fired after {(fired or [t0])[0] - t0:.2f} s")
+    assert len(fired) == 1 and fired[0] - t0 < 1.1, fired
+
+    # A bouncing volume button: 5 edges within 2 ms on press and on release
+    steps, volume = [], vbc.hotkeys.actions["volume"]
+    vbc.hotkeys.actions["volume"] = steps.append
+    edge = vbc.GPIO.edge_callbacks[vbc.VOL_UP_PIN]
+    for pressed in (True, False):
+        for level in (pressed, not pressed, pressed, not pressed, pressed):
+            vbc.btn_up.value = not level
+            edge(vbc.VOL_UP_PIN)
+            time.sleep(0.0004)
+        time.sleep(0.1)
+    vbc.hotkeys.actions["volume"] = volume
+    print(f"bouncing press + release: {len(steps)} volume step(s)")
+    assert steps == [1], steps
+    root.cleanup()
+
+
+# ─── MAIN ─────────────────────────────────────────────────────────────────────
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHES)
+    for name in names:
+        if name not in BENCHES:
+            sys.exit(f"Unknown benchmark {name!r}; choose from: {', '.join(BENCHES)}")
+        BENCHES[name]()
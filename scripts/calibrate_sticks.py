@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Stick and trigger calibration for the ItsyBitsy controller: measures a raw
+ADC capture and writes GPT-Output/config.json.
+
+Capture with RAW_CAPTURE = True in diagnostic-mode-main.py, either live
+over the USB serial console or from a saved log:
+
+  python3 calibrate_sticks.py --serial /dev/ttyACM0 --seconds 120 --save cap.txt
+  python3 calibrate_sticks.py cap.txt
+
+Leave the sticks alone for a few seconds, then roll each stick around its
+full travel and pull both triggers all the way, a few times. Anything else
+on the serial log is ignored; only "RAW,<ms>,LX,LY,RX,RY,LT,RT" lines count.
+
+Per axis it reports the rest center, the rest noise, and the travel
+extents. From those it recommends a deadzone just wider than the noise,
+trigger min/max just inside the measured range, and an EMA smoothing
+factor that keeps the residual noise under half a count. Statistics are
+computed with vectorized NumPy over the whole capture. An hour at 100 Hz
+takes about a second.
+
+Needs numpy (pip3 install numpy); --serial also needs pyserial.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+AXES = ("LX", "LY", "RX", "RY", "LT", "RT")
+STICKS = AXES[:4]
+TRIGGERS = AXES[4:]
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "GPT-Output", "config.json")
+
+REST_WINDOW = 50        # samples (0.5 s at 100 Hz) judged together as "untouched"
+REST_SPREAD = 6.0       # counts (0-255); a window moving less than this is at rest
+STICK_REST_RANGE = 48   # a resting stick sits within this of 128
+MIN_REST_WINDOWS = 10
+DEADZONE_MARGIN = 1     # counts beyond the 99.9th percentile rest deviation
+DEADZONE_LIMITS = (1, 40)
+TRIGGER_MARGIN = 2
+TARGET_NOISE = 0.5      # counts of noise left after smoothing
+
+
+# ─── CAPTURE ───────────────────────────────────────────────────────────────────
+def parse_capture(data):
+    """RAW lines (bytes) -> (ms array, {axis: 16-bit int array}); unwired axes omitted."""
+    rows = [line[4:].strip() for line in data.split(b"\n")
+            if line.startswith(b"RAW,") and line.count(b",") == len(AXES) + 1]
+    if not rows:
+        raise ValueError("no RAW capture lines found")
+    flat = np.array(b",".join(rows).decode().split(","), dtype=np.int64)
+    table = flat.reshape(-1, len(AXES) + 1)
+    axes = {name: table[:, i + 1] for i, name in enumerate(AXES) if (table[:, i + 1] >= 0).all()}
+    return table[:, 0], axes
+
+
+def read_serial(port, seconds, baud=115200):
+    import serial  # pyserial, only needed for live captures
+    lines = []
+    with serial.Serial(port, baud, timeout=1) as s:
+        end = time.monotonic() + seconds
+        while time.monotonic() < end:
+            lines.append(s.readline())
+    return b"".join(lines)
+
+
+# ─── STATISTICS ────────────────────────────────────────────────────────────────
+def axis_stats(raw, name, invert=False):
+    """Measure one axis; values are in firmware units (0-255, after invert)."""
+    v = raw / 256.0
+    if invert:
+        v = 255.0 - v
+    lo, hi = np.percentile(v, [0.1, 99.9])
+    n = len(v) - len(v) % REST_WINDOW
+    windows = v[:n].reshape(-1, REST_WINDOW)
+    means = windows.mean(axis=1)
+    still = (windows.max(axis=1) - windows.min(axis=1)) <= REST_SPREAD
+    if name in STICKS:
+        rest = still & (np.abs(means - 128.0) <= STICK_REST_RANGE)
+    else:
+        rest = still & (means <= lo + 24.0)  # a released trigger sits at its low end
+    stats = {"samples": len(v), "lo": float(lo), "hi": float(hi), "rest_windows": int(rest.sum())}
+    if stats["rest_windows"] < MIN_REST_WINDOWS:
+        return stats
+    at_rest = windows[rest]
+    center = float(np.median(at_rest))
+    # Noise around each window's own mean, so slow drift doesn't count as noise
+    noise = at_rest - at_rest.mean(axis=1, keepdims=True)
+    stats.update(
+        center=center,
+        noise_std=float(noise.std()),
+        noise_p999=float(np.percentile(np.abs(at_rest - center), 99.9)),
+    )
+    return stats
+
+
+def smoothing_for(noise_std):
+    # EMA with factor a leaves noise * sqrt(a / (2 - a)); pick a for TARGET_NOISE
+    if noise_std <= TARGET_NOISE:
+        return 1.0
+    r = (TARGET_NOISE / noise_std) ** 2
+    return round(max(0.05, 2 * r / (1 + r)), 2)
+
+
+def recommend(stats, config):
+    """Return a new config dict with measured values for every calibrated axis."""
+    out = json.loads(json.dumps(config))
+    for section in ("invert", "deadzone", "smoothing", "triggers", "center"):
+        out.setdefault(section, {})
+    for name, s in stats.items():
+        if "center" not in s:
+            continue
+        out["smoothing"][name] = smoothing_for(s["noise_std"])
+        if name in STICKS:
+            dz = math.ceil(s["noise_p999"]) + DEADZONE_MARGIN
+            out["deadzone"][name] = max(DEADZONE_LIMITS[0], min(DEADZONE_LIMITS[1], dz))
+            out["center"][name] = int(round(s["center"]))
+        else:
+            out["triggers"][name + "_min"] = min(254, math.ceil(s["center"] + s["noise_p999"]) + TRIGGER_MARGIN)
+            out["triggers"][name + "_max"] = max(1, math.floor(s["hi"]) - TRIGGER_MARGIN)
+    return out
+
+
+def validate(config):
+    """Raise ValueError if config.json would be rejected or misbehave on the firmware."""
+    for section in ("invert", "deadzone", "smoothing", "triggers"):
+        if not isinstance(config.get(section), dict):
+            raise ValueError(f"missing section {section!r}")
+    for name, flag in config["invert"].items():
+        if name not in AXES or not isinstance(flag, bool):
+            raise ValueError(f"invert.{name} must be a bool for a known axis")
+    for name, dz in config["deadzone"].items():
+        if name not in STICKS or not isinstance(dz, int) or not 0 <= dz < 128:
+            raise ValueError(f"deadzone.{name} must be 0-127 for a stick")
+    for name, c in config.get("center", {}).items():
+        if name not in STICKS or not isinstance(c, int) or not 0 <= c <= 255:
+            raise ValueError(f"center.{name} must be 0-255 for a stick")
+    for name, a in config["smoothing"].items():
+        if name not in AXES or not 0 < a <= 1:
+            raise ValueError(f"smoothing.{name} must be in (0, 1]")
+    t = config["triggers"]
+    for name in TRIGGERS:
+        lo, hi = t.get(name + "_min", 0), t.get(name + "_max", 255)
+        if not (isinstance(lo, int) and isinstance(hi, int) and 0 <= lo < hi <= 255):
+            raise ValueError(f"triggers.{name}_min/_max must satisfy 0 <= min < max <= 255")
+        if hi - lo < 32:
+            raise ValueError(f"{name} travel {lo}-{hi} is too short; was the trigger pulled?")
+
+
+def load_config(path):
+    # The hand-written file starts with a // comment, which json (and the
+    # firmware's json.load) rejects; skip such lines
+    try:
+        with open(path) as f:
+            text = "".join(l for l in f if not l.lstrip().startswith("//"))
+    except FileNotFoundError:
+        return {}
+    return json.loads(text)
+
+
+def write_config(config, path):
+    validate(config)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(config, f, indent=2)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def calibrate(data, config):
+    """Parse a capture and return (stats per axis, recommended config)."""
+    _, axes = parse_capture(data)
+    inv = config.get("invert", {})
+    stats = {name: axis_stats(raw, name, inv.get(name, False)) for name, raw in axes.items()}
+    return stats, recommend(stats, config)
+
+
+def print_report(stats, old, new):
+    for name, s in stats.items():
+        if "center" not in s:
+            print(f"{name}: {s['rest_windows']} rest windows, not enough to calibrate; unchanged")
+            continue
+        print(f"{name}: center {s['center']:6.1f}  noise sd {s['noise_std']:.2f} "
+              f"p99.9 {s['noise_p999']:.1f}  travel {s['lo']:5.1f}-{s['hi']:5.1f}")
+    for section in ("center", "deadzone", "triggers", "smoothing"):
+        for key, value in new.get(section, {}).items():
+            before = old.get(section, {}).get(key)
+            if before != value:
+                print(f"  {section}.{key}: {before} -> {value}")
+
+
+# ─── MAIN ──────────────────────────────────────────────────────────────────────
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("capture", nargs="?", help="capture file (diagnostic-mode serial log)")
+    ap.add_argument("--serial", help="capture live from this serial port instead")
+    ap.add_argument("--seconds", type=float, default=120.0)
+    ap.add_argument("--save", help="also save the live capture here")
+    ap.add_argument("--config", default=CONFIG_PATH, help="config.json to update")
+    ap.add_argument("--dry-run", action="store_true", help="report only, don't write")
+    args = ap.parse_args()
+
+    if args.serial:
+        data = read_serial(args.serial, args.seconds)
+        if args.save:
+            with open(args.save, "wb") as f:
+                f.write(data)
+    elif args.capture:
+        with open(args.capture, "rb") as f:
+            data = f.read()
+    else:
+        ap.error("give a capture file or --serial PORT")
+
+    old = load_config(args.config)
+    t = time.perf_counter()
+    try:
+        stats, new = calibrate(data, old)
+        validate(new)
+    except ValueError as e:
+        sys.exit(f"calibration failed: {e}")
+    n = max(s["samples"] for s in stats.values())
+    print(f"{n} samples, {len(stats)} axes in {time.perf_counter() - t:.2f} s")
+    print_report(stats, old, new)
+    if not args.dry_run:
+        write_config(new, args.config)
+        print(f"wrote {args.config}")
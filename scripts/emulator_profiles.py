@@ -0,0 +1,142 @@
+"""
+Per-emulator settings, switched by RetroPie's runcommand hooks.
+
+runcommand-onstart.sh / runcommand-onend.sh write one line to the control
+FIFO ("start <system> <emulator>" / "end"), which the daemon already has
+open, so a launch costs a printf instead of a Python cold start.
+
+A profile (emulator_profiles.json; the emulator name wins over the system)
+can set:
+
+  governor         CPU frequency governor
+  poll_interval    GPIO button poll period, s
+  osd              false turns the OSD off
+  amp_compression  TPA2016 AGC compression bits
+  backlight        0-255
+
+poll_interval / osd / amp_compression go on top of the power profile as an
+overlay; governor and backlight are saved on start and put back on end.
+"""
+import json
+import os
+import select
+import subprocess
+
+EMULATOR_PROFILES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "emulator_profiles.json")
+CONTROL_FIFO = "/run/piswitch/control"   # RuntimeDirectory=piswitch in the service
+GOVERNOR_FILE = "/sys/devices/system/cpu/cpufreq/policy0/scaling_governor"
+
+OVERLAY_FIELDS = ("poll_interval", "amp_compression")
+
+
+class CpuGovernor:
+    def __init__(self, path=GOVERNOR_FILE):
+        self.path = path
+
+    def read(self):
+        with open(self.path) as f:
+            return f.read().strip()
+
+    def write(self, name):
+        subprocess.run(["sudo", "tee", self.path], input=name.encode(),
+                       stdout=subprocess.DEVNULL)
+
+
+def load_table(path=EMULATOR_PROFILES_FILE):
+    with open(path) as f:
+        return json.load(f)
+
+
+class EmulatorProfiles:
+    def __init__(self, table, power, get_backlight, set_backlight, governor=None):
+        self.table = table
+        self.power = power          # power_profiles.PowerProfileManager
+        self.get_backlight = get_backlight
+        self.set_backlight = set_backlight
+        self.governor = governor
+        self.active = None          # (system, emulator, profile name or None)
+        self.saved = None           # state to restore on end
+
+    def lookup(self, system, emulator):
+        name = self.table.get("emulators", {}).get(emulator) or self.table.get("systems", {}).get(system)
+        return name, self.table.get("profiles", {}).get(name) if name else None
+
+    def start(self, system, emulator):
+        if self.active:
+            self.end()  # missed an onend (emulator crashed, hook failed)
+        name, prof = self.lookup(system, emulator)
+        self.active = (system, emulator, name)
+        if prof is None:
+            return None
+        self.saved = {}
+        overlay = {k: prof[k] for k in OVERLAY_FIELDS if k in prof}
+        if prof.get("osd") is False:
+            overlay["osd_fps"] = 0
+        self.power.set_overlay(overlay)
+        if prof.get("backlight") is not None:
+            self.saved["backlight"] = self.get_backlight()
+            self.set_backlight(prof["backlight"])
+        if prof.get("governor") and self.governor:
+            self.saved["governor"] = self.governor.read()
+            self.governor.write(prof["governor"])
+        return name
+
+    def end(self):
+        self.active = None
+        if self.saved is None:
+            return
+        saved, self.saved = self.saved, None
+        self.power.set_overlay(None)
+        if "backlight" in saved:
+            self.set_backlight(saved["backlight"])
+        if "governor" in saved:
+            self.governor.write(saved["governor"])
+
+    def command(self, line):
+        """Handle one control line; unknown commands are ignored."""
+        parts = line.split()
+        if not parts:
+            return
+        if parts[0] == "start" and len(parts) >= 3:
+            name = self.start(parts[1], parts[2])
+            print(f"Emulator {parts[2]} ({parts[1]}): profile {name or 'none'}")
+        elif parts[0] == "end":
+            self.end()
+
+
+class ControlFifo:
+    """Line-oriented command FIFO. The daemon holds a write end open itself,
+    so the reader never sees EOF between hook runs and writers never block."""
+    def __init__(self, path=CONTROL_FIFO, handler=None):
+        self.path = path
+        self.handler = handler
+        self.fd = self._keepalive = None
+        self._buf = b""
+        self.commands = 0
+
+    def open(self):
+        if not os.path.exists(self.path):
+            os.mkfifo(self.path, 0o660)
+        self.fd = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+        self._keepalive = os.open(self.path, os.O_WRONLY)
+        return self
+
+    def handle(self):
+        self._buf += os.read(self.fd, 4096)
+        *lines, self._buf = self._buf.split(b"\n")
+        for line in lines:
+            self.commands += 1
+            self.handler(line.decode(errors="replace"))
+
+    def run(self):
+        if self.fd is None:
+            self.open()
+        poller = select.poll()
+        poller.register(self.fd, select.POLLIN)
+        while True:
+            poller.poll()
+            self.handle()
+
+    def close(self):
+        os.close(self.fd)
+        os.close(self._keepalive)
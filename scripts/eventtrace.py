@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+In-memory event trace for the control scripts, instead of print() to syslog.
+
+Each event is one fixed-size binary record (timestamp, type, level, two int
+values, duration) packed into a preallocated ring buffer; nothing is
+formatted or written at record time. Events below the trace level return
+before doing any work. Records at or above echo_level (warnings by default)
+are also printed, so they still reach the journal.
+
+The buffer is dumped to a file on SIGUSR1 (or dump()) and decoded offline:
+
+  kill -USR1 $(pidof -x volumecombo.py)
+  python3 eventtrace.py /tmp/piswitch-trace.bin
+"""
+import json
+import signal
+import struct
+import sys
+import threading
+import time
+
+DEBUG, INFO, WARN = 10, 20, 30
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARN: "WARN"}
+
+DUMP_PATH = "/tmp/piswitch-trace.bin"
+DEFAULT_CAPACITY = 4096
+
+# timestamp ns, event type, level, value a, value b, duration us
+RECORD = struct.Struct("<qHHiiI")
+HEADER = struct.Struct("<4sHHII")   # magic, version, record size, capacity, total written
+MAGIC = b"PSTR"
+VERSION = 1
+
+# Event type registry: id -> (name, format string using {a} {b} {dur})
+EVENT_TYPES = {}
+
+
+def define(name, fmt):
+    """Register an event type and return its id. Call at import time."""
+    for etype, (existing, _) in EVENT_TYPES.items():
+        if existing == name:
+            return etype
+    etype = len(EVENT_TYPES) + 1
+    EVENT_TYPES[etype] = (name, fmt)
+    return etype
+
+
+class TraceBuffer:
+    def __init__(self, capacity=DEFAULT_CAPACITY, level=INFO, echo_level=WARN):
+        self.capacity = capacity
+        self.level = level
+        self.echo_level = echo_level
+        self.buf = bytearray(capacity * RECORD.size)
+        self.written = 0
+        # Input threads and the i2c worker record concurrently; the lock
+        # keeps slot claim + pack atomic so records aren't lost or torn
+        self._lock = threading.Lock()
+
+    def record(self, etype, level=INFO, a=0, b=0, duration_us=0):
+        if level < self.level:
+            return
+        ts = time.monotonic_ns()
+        with self._lock:
+            RECORD.pack_into(self.buf, (self.written % self.capacity) * RECORD.size,
+                             ts, etype, level, a, b, duration_us)
+            self.written += 1
+        if level >= self.echo_level:
+            print(format_record(ts, etype, level, a, b, duration_us))
+
+    def records(self):
+        """Records oldest-first as tuples (ts_ns, etype, level, a, b, dur_us)."""
+        with self._lock:
+            written, buf = self.written, bytes(self.buf)
+        n = min(written, self.capacity)
+        start = written - n
+        return [RECORD.unpack_from(buf, ((start + i) % self.capacity) * RECORD.size)
+                for i in range(n)]
+
+    def dump(self, path=DUMP_PATH):
+        types = json.dumps({str(k): v for k, v in EVENT_TYPES.items()}).encode()
+        with self._lock:
+            written, buf = self.written, bytes(self.buf)
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, self.capacity, written))
+            f.write(struct.pack("<I", len(types)))
+            f.write(types)
+            f.write(buf)
+        return path
+
+    def install_signal_dump(self, path=DUMP_PATH, signum=signal.SIGUSR1):
+        # The handler runs on the main thread, possibly inside record()'s
+        # lock: dump from another thread instead of deadlocking on it
+        signal.signal(signum, lambda *_: threading.Thread(target=self.dump, args=(path,)).start())
+
+
+def format_record(ts_ns, etype, level, a, b, duration_us, types=None):
+    name, fmt = (types or EVENT_TYPES).get(etype, (f"event{etype}", "a={a} b={b}"))
+    text = fmt.format(a=a, b=b, dur=duration_us)
+    return f"{ts_ns / 1e9:12.6f} {LEVEL_NAMES.get(level, level):<5} {name}: {text}"
+
+
+def load(path):
+    """Read a dump; returns (records oldest-first, event type table)."""
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, size, capacity, written = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION or size != RECORD.size:
+        raise ValueError(f"{path}: not a v{VERSION} trace dump")
+    offset = HEADER.size
+    (types_len,) = struct.unpack_from("<I", data, offset)
+    offset += 4
+    types = {int(k): tuple(v) for k, v in json.loads(data[offset:offset + types_len]).items()}
+    offset += types_len
+    n = min(written, capacity)
+    start = written - n
+    records = [RECORD.unpack_from(data, offset + ((start + i) % capacity) * size) for i in range(n)]
+    return records, types
+
+
+# Shared buffer for the whole process
+trace = TraceBuffer()
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit(f"usage: {sys.argv[0]} TRACE_DUMP")
+    records, types = load(sys.argv[1])
+    for r in records:
+        print(format_record(*r, types=types))
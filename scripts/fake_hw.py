@@ -0,0 +1,785 @@
+"""
+Simulated hardware for running the Pi Switch control code off-device.
+
+Everything here runs on a virtual clock (FakeClock) so benchmarks are
+deterministic and don't actually sleep. bench.py is the main user.
+"""
+import errno
+import importlib.util
+import json
+import os
+import runpy
+import select
+import sys
+import tempfile
+import time
+import types
+from types import SimpleNamespace
+
+import input_router
+from amp_power import POWER_ON_DEFAULTS, TPA2016_I2C_ADDR
+from battery import (REG_BUTTON, REG_PERCENT, REG_STATUS, REG_VOLTAGE_H, REG_VOLTAGE_L,
+                     STATUS_CHARGING_ENABLED, STATUS_POWER_PLUGGED)
+
+
+class FakeClock:
+    def __init__(self):
+        self.t = 0.0
+        self.sleeps = 0
+
+    def now(self):
+        return self.t
+
+    def sleep(self, seconds):
+        self.sleeps += 1
+        self.t += seconds
+
+
+# ─── TPA2016 ON A FAKE SMBUS ──────────────────────────────────────────────────
+class FakeTPA2016:
+    """smbus2-shaped bus with one TPA2016 on it.
+
+    Registers reset to their defaults while SHDN is low, and the part NACKs
+    (OSError EREMOTEIO) until startup_time has passed after SHDN goes high.
+    """
+    def __init__(self, clock, startup_time=0.005, addr=TPA2016_I2C_ADDR):
+        self.clock = clock
+        self.startup_time = startup_time
+        self.addr = addr
+        self.regs = dict(POWER_ON_DEFAULTS)
+        self.shdn_high = True
+        self.ready_at = 0.0
+        self.transactions = 0
+        self.bytes_moved = 0
+
+    def set_shdn(self, high):
+        if high and not self.shdn_high:
+            self.ready_at = self.clock.now() + self.startup_time
+        if not high:
+            self.regs = dict(POWER_ON_DEFAULTS)
+        self.shdn_high = high
+
+    def _access(self, addr, nbytes):
+        self.transactions += 1
+        if addr != self.addr or not self.shdn_high or self.clock.now() < self.ready_at:
+            raise OSError(errno.EREMOTEIO, "NACK")
+        self.bytes_moved += nbytes
+
+    def read_byte_data(self, addr, reg):
+        self._access(addr, 2)
+        return self.regs[reg]
+
+    def write_byte_data(self, addr, reg, value):
+        self._access(addr, 2)
+        self.regs[reg] = value & 0xFF
+
+    def read_i2c_block_data(self, addr, reg, length):
+        self._access(addr, 1 + length)
+        return [self.regs.get(reg + i, 0) for i in range(length)]
+
+    def write_i2c_block_data(self, addr, reg, values):
+        self._access(addr, 1 + len(values))
+        for i, v in enumerate(values):
+            self.regs[reg + i] = v & 0xFF
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FaultyI2C:
+    """Fault injection in front of a FakeTPA2016, in real time.
+
+      nack(n)      the next n transactions NACK (EREMOTEIO)
+      brownout()   the amp resets to its defaults and holds SDA low: every
+                   transaction blocks for timeout s and fails (ETIMEDOUT)
+                   until SHDN is pulsed
+    """
+    def __init__(self, amp, timeout=0.05):
+        self.amp = amp
+        self.timeout = timeout
+        self.nacks = 0
+        self.stuck = False
+        self.closes = 0
+        self.failures = 0
+
+    def nack(self, n):
+        self.nacks = n
+
+    def brownout(self):
+        self.amp.regs = dict(POWER_ON_DEFAULTS)
+        self.stuck = True
+
+    def set_shdn(self, high):
+        if not high:
+            self.stuck = False
+        self.amp.set_shdn(high)
+
+    def _fault(self):
+        if self.stuck:
+            self.failures += 1
+            time.sleep(self.timeout)
+            raise OSError(errno.ETIMEDOUT, "bus held low")
+        if self.nacks:
+            self.nacks -= 1
+            self.failures += 1
+            raise OSError(errno.EREMOTEIO, "NACK")
+
+    def read_byte_data(self, addr, reg):
+        self._fault()
+        return self.amp.read_byte_data(addr, reg)
+
+    def write_byte_data(self, addr, reg, value):
+        self._fault()
+        self.amp.write_byte_data(addr, reg, value)
+
+    def read_i2c_block_data(self, addr, reg, length):
+        self._fault()
+        return self.amp.read_i2c_block_data(addr, reg, length)
+
+    def write_i2c_block_data(self, addr, reg, values):
+        self._fault()
+        self.amp.write_i2c_block_data(addr, reg, values)
+
+    def close(self):
+        self.closes += 1
+
+
+FAKE_SMBUSES = {}
+def fake_smbus(bus_num):
+    """smbus2.SMBus stand-in: one FaultyI2C + FakeTPA2016 per bus number, so
+    reopening the bus gets the same amp back."""
+    if bus_num not in FAKE_SMBUSES:
+        FAKE_SMBUSES[bus_num] = FaultyI2C(FakeTPA2016(SimpleNamespace(now=time.monotonic)))
+    return FAKE_SMBUSES[bus_num]
+
+
+def fake_volumecombo():
+    """Import volumecombo.py on fake GPIO/SMBus with a fake mixer.
+    Returns (module, bus); SHDN goes straight to the fake amp."""
+    from amp_power import AmpPower
+    finder = install_fake_backends(VOLUMECOMBO_BACKENDS)
+    try:
+        import volumecombo
+    finally:
+        remove_fake_backends(finder)
+    bus = fake_smbus(volumecombo.I2C_BUS)
+    volumecombo.amp_power = AmpPower(bus, bus.set_shdn, volumecombo.TPA2016_I2C_ADDR)
+    mixer = SimpleNamespace(percent=None)
+    volumecombo.volume.apply_alsa = lambda pct: setattr(mixer, "percent", pct)
+    volumecombo.get_current_volume = lambda: f"{mixer.percent}%"
+    return volumecombo, bus
+
+
+# ─── EVDEV ────────────────────────────────────────────────────────────────────
+class FakeInputEvent:
+    __slots__ = ("sec", "usec", "type", "code", "value")
+
+    def __init__(self, etype, code, value, sec=0, usec=0):
+        self.type = etype
+        self.code = code
+        self.value = value
+        self.sec = sec
+        self.usec = usec
+
+
+class FakeEvdevDevice:
+    """Stands in for evdev.InputDevice: a real pipe fd for poll(), queued events."""
+    def __init__(self, name, vendor=0, path="/dev/input/fake", axes=None):
+        self.name = name
+        self.path = path
+        self.info = SimpleNamespace(vendor=vendor, product=0, bustype=3, version=0)
+        self.axes = axes or {}   # EV_ABS code -> max, e.g. a touchscreen's MT axes
+        self._r, self._w = os.pipe()
+        self.fd = self._r
+        self.queue = []
+        self.grabbed = False
+        self.closed = False
+
+    def push(self, events):
+        self.queue.extend(events)
+        os.write(self._w, b"!")
+
+    def read(self):
+        os.read(self._r, 4096)
+        events, self.queue = self.queue, []
+        return events
+
+    def read_loop(self):
+        while True:  # blocks like evdev's, until the fd is closed
+            select.select([self._r], [], [])
+            yield from self.read()
+
+    def capabilities(self, absinfo=True):
+        return {input_router.EV_ABS: [(code, self.absinfo(code)) for code in self.axes]}
+
+    def absinfo(self, code):
+        return SimpleNamespace(value=0, min=0, max=self.axes[code], fuzz=0, flat=0, resolution=0)
+
+    def grab(self):
+        self.grabbed = True
+
+    def ungrab(self):
+        self.grabbed = False
+
+    def close(self):
+        if not self.closed:
+            os.close(self._r)
+            os.close(self._w)
+        self.closed = True
+
+
+# ─── PISUGAR 3 ────────────────────────────────────────────────────────────────
+class FakePiSugar:
+    """PiSugar 3 register map behind the battery.py reader interface.
+
+    The battery drains (or charges, when plugged) drain_per_hour percent per
+    hour of virtual time; the level is recomputed on every read.
+    """
+    def __init__(self, clock, percent=80.0, drain_per_hour=10.0, charge_per_hour=40.0):
+        self.clock = clock
+        self.regs = bytearray(256)
+        self.level = float(percent)
+        self.drain_per_hour = drain_per_hour
+        self.charge_per_hour = charge_per_hour
+        self.plugged = False
+        self.last_update = clock.now()
+        self.transactions = 0
+        self.bytes_moved = 0
+
+    def plug(self, plugged=True):
+        self._advance()
+        self.plugged = plugged
+
+    def tap_button(self):
+        self.regs[REG_BUTTON] |= 1
+
+    def _advance(self):
+        hours = (self.clock.now() - self.last_update) / 3600
+        self.last_update = self.clock.now()
+        rate = self.charge_per_hour if self.plugged else -self.drain_per_hour
+        self.level = max(0.0, min(100.0, self.level + rate * hours))
+        mv = int(3000 + 12 * self.level)
+        self.regs[REG_STATUS] = (STATUS_POWER_PLUGGED | STATUS_CHARGING_ENABLED) if self.plugged else 0
+        self.regs[REG_VOLTAGE_H], self.regs[REG_VOLTAGE_L] = mv >> 8, mv & 0xFF
+        self.regs[REG_PERCENT] = int(self.level)
+
+    def read_block(self, start, length):
+        self._advance()
+        self.transactions += 1
+        self.bytes_moved += 1 + length
+        return bytes(self.regs[start:start + length])
+
+    def read_byte_data(self, addr, reg):
+        return self.read_block(reg, 1)[0]
+
+    def write_byte(self, reg, value):
+        self.transactions += 1
+        self.bytes_moved += 2
+        self.regs[reg] = value & 0xFF
+
+
+# ─── POWER SOURCE ─────────────────────────────────────────────────────────────
+class FakePowerSource:
+    """power_profiles power source with settable plugged / percent."""
+    def __init__(self, plugged=False, percent=80):
+        self.plugged = plugged
+        self.percent = percent
+
+    def read(self):
+        return self.plugged, self.percent
+
+
+# ─── BACKEND MODULES (board, busio, digitalio, TPA2016, pygame, evdev) ────────
+# Rough import costs on a Pi 3A+, seconds; bench.py scales them down
+BACKEND_IMPORT_COSTS = {
+    "board": 0.25,
+    "busio": 0.10,
+    "digitalio": 0.05,
+    "adafruit_tpa2016": 0.05,
+    "pygame": 1.20,
+    "evdev": 0.15,
+    "RPi": 0.0,        # already loaded by board on a Pi
+    "RPi.GPIO": 0.0,
+}
+# volumecombo.py's hardware modules; free to import
+VOLUMECOMBO_BACKENDS = {"RPi": 0.0, "RPi.GPIO": 0.0, "smbus2": 0.0}
+PYGAME_INIT_COST = 0.60   # pygame.init() + fbcon set_mode + font load
+
+
+class _FakePin:
+    def __init__(self, name):
+        self.name = name
+
+
+class _FakeDigitalInOut:
+    def __init__(self, pin):
+        self.pin = pin
+        self.direction = None
+        self.pull = None
+        self.value = True   # pulled up, not pressed
+
+
+class _FakeAmp:
+    def __init__(self, i2c):
+        self.i2c = i2c
+        self.fixed_gain = 0
+        self.shutdown = False
+        self.compression_ratio = 0
+
+
+class _FakeSurface:
+    def fill(self, color):
+        pass
+
+    def blit(self, surface, pos):
+        pass
+
+    def set_palette(self, palette):
+        pass
+
+
+def _build_backend(name, scale):
+    m = SimpleNamespace()
+    if name == "board":
+        m.SCL, m.SDA = _FakePin("SCL"), _FakePin("SDA")
+        for n in range(28):
+            setattr(m, f"GPIO{n}", _FakePin(f"GPIO{n}"))
+    elif name == "busio":
+        m.I2C = lambda scl, sda: SimpleNamespace(scl=scl, sda=sda, deinit=lambda: None)
+    elif name == "digitalio":
+        m.DigitalInOut = _FakeDigitalInOut
+        m.Direction = SimpleNamespace(INPUT="input", OUTPUT="output")
+        m.Pull = SimpleNamespace(UP="up", DOWN="down")
+    elif name == "adafruit_tpa2016":
+        m.TPA2016 = _FakeAmp
+    elif name == "pygame":
+        m.FULLSCREEN = 0x80000000
+        m.init = lambda: time.sleep(PYGAME_INIT_COST * scale)
+        m.quit = lambda: None
+        m.Rect = lambda *a: a
+        m.display = SimpleNamespace(init=lambda: time.sleep(PYGAME_INIT_COST * scale),
+                                    set_mode=lambda size, flags=0: _FakeSurface(),
+                                    update=lambda: None)
+        m.image = SimpleNamespace(frombuffer=lambda buf, size, fmt: _FakeSurface())
+        m.font = SimpleNamespace(Font=lambda path, size: SimpleNamespace(
+            render=lambda text, aa, color: _FakeSurface()))
+        m.draw = SimpleNamespace(rect=lambda *a: None)
+    elif name == "RPi.GPIO":
+        m.BCM, m.IN, m.OUT, m.HIGH, m.LOW, m.PUD_UP = "BCM", "in", "out", 1, 0, "up"
+        m.BOTH = "both"
+        m.setmode = m.setup = m.output = m.cleanup = lambda *a, **k: None
+        m.edge_callbacks = {}  # pin -> callback; call it to fake an edge
+        m.add_event_detect = lambda pin, edge, callback=None, bouncetime=None: \
+            m.edge_callbacks.__setitem__(pin, callback)
+        m.input = lambda pin: 1   # pulled up: not pressed, no headphones
+    elif name == "smbus2":
+        m.SMBus = fake_smbus
+    elif name == "evdev":
+        m.list_devices = lambda: []
+        m.InputDevice = FakeEvdevDevice
+        codes = {k: v for k, v in vars(input_router).items()
+                 if k.startswith(("EV_", "BTN_", "ABS_"))}
+        codes["KEY_HOME"] = 102
+        m.ecodes = SimpleNamespace(ecodes=codes, **codes)
+    return m
+
+
+class _FakeBackendFinder:
+    """sys.meta_path hook that 'imports' the fake backends, sleeping for
+    each module's modeled import cost the first time it is loaded."""
+    def __init__(self, costs, scale):
+        self.costs = costs
+        self.scale = scale
+
+    def find_spec(self, name, path=None, target=None):
+        if name not in self.costs:
+            return None
+        package = any(other.startswith(name + ".") for other in self.costs)
+        return importlib.util.spec_from_loader(name, self, is_package=package)
+
+    def create_module(self, spec):
+        return None
+
+    def exec_module(self, module):
+        time.sleep(self.costs[module.__name__] * self.scale)
+        module.__dict__.update(vars(_build_backend(module.__name__, self.scale)))
+
+
+def install_fake_backends(costs=BACKEND_IMPORT_COSTS, scale=1.0):
+    """Make the Pi-only modules importable; returns the finder."""
+    finder = _FakeBackendFinder(costs, scale)
+    sys.meta_path.insert(0, finder)
+    return finder
+
+
+def unload_fake_backends(finder):
+    """Forget already-imported fakes so the next import pays the cost again."""
+    for name in finder.costs:
+        sys.modules.pop(name, None)
+
+
+def remove_fake_backends(finder):
+    """Undo install_fake_backends: later imports get the real modules (or
+    ImportError) again. Modules already holding a fake keep it."""
+    if finder in sys.meta_path:
+        sys.meta_path.remove(finder)
+    unload_fake_backends(finder)
+
+
+# ─── TOUCHSCREEN ──────────────────────────────────────────────────────────────
+class TouchTrace:
+    """Builds multitouch protocol B event streams, as evtest would record them
+    from the FT5406 at report_hz."""
+    def __init__(self, report_hz=60, t=0.0):
+        self.dt = 1.0 / report_hz
+        self.t = t
+        self.events = []
+        self._next_id = 1
+
+    def _ev(self, code, value):
+        sec = int(self.t)
+        self.events.append(FakeInputEvent(3, code, value, sec, int((self.t - sec) * 1e6)))
+
+    def syn(self):
+        sec = int(self.t)
+        self.events.append(FakeInputEvent(0, 0, 0, sec, int((self.t - sec) * 1e6)))
+        self.t += self.dt
+
+    def down(self, slot, x, y):
+        self._ev(0x2F, slot)
+        self._ev(0x39, self._next_id)
+        self._next_id += 1
+        self.move(slot, x, y)
+
+    def move(self, slot, x, y):
+        self._ev(0x2F, slot)
+        self._ev(0x35, x)
+        self._ev(0x36, y)
+
+    def up(self, slot):
+        self._ev(0x2F, slot)
+        self._ev(0x39, -1)
+
+    def swipe(self, x, y0, y1, duration, slot=0):
+        steps = max(1, int(duration / self.dt))
+        self.down(slot, x, y0)
+        self.syn()
+        for i in range(1, steps + 1):
+            self.move(slot, x, y0 + (y1 - y0) * i // steps)
+            self.syn()
+        self.up(slot)
+        self.syn()
+
+    def hold(self, x, y, duration, slot=0, jitter=2):
+        steps = max(1, int(duration / self.dt))
+        self.down(slot, x, y)
+        self.syn()
+        for i in range(steps):
+            self.move(slot, x + (i % 2) * jitter, y)
+            self.syn()
+        self.up(slot)
+        self.syn()
+
+    def pinch(self, x, y, spread, duration):
+        steps = max(1, int(duration / self.dt))
+        self.down(0, x, y)
+        self.down(1, x + 10, y)
+        self.syn()
+        for i in range(1, steps + 1):
+            d = spread * i // steps
+            self.move(0, x - d, y)
+            self.move(1, x + 10 + d, y)
+            self.syn()
+        self.up(0)
+        self.up(1)
+        self.syn()
+
+    def idle(self, seconds):
+        self.t += seconds
+
+
+# ─── CONTROLLER ADC CAPTURE ───────────────────────────────────────────────────
+def stick_capture(seconds, hz=100, centers=None, noise=1.2, trigger_rest=20, trigger_full=235, seed=1):
+    """A diagnostic-mode RAW capture (bytes) of a session: mostly untouched,
+    with stick circles and trigger pulls. centers/noise are in 0-255 counts."""
+    import math
+    import random
+    rng = random.Random(seed)
+    centers = centers or {"LX": 131, "LY": 124, "RX": 128, "RY": 135}
+    lines = []
+    for i in range(int(seconds * hz)):
+        t = i / hz
+        phase = t % 20.0
+        vals = {}
+        for name, c in centers.items():
+            v = c
+            if 12.0 <= phase < 16.0:   # roll both sticks around the rim
+                a = 2 * math.pi * phase + (0 if name[0] == "L" else 1.0)
+                v = c + 118 * (math.cos(a) if name[1] == "X" else math.sin(a))
+            vals[name] = v + rng.gauss(0, noise)
+        pull = max(0.0, math.sin(math.pi * (phase - 16.0) / 3.0)) if 16.0 <= phase < 19.0 else 0.0
+        for name in ("LT", "RT"):
+            vals[name] = trigger_rest + (trigger_full - trigger_rest) * pull + rng.gauss(0, noise)
+        raw = [str(max(0, min(65535, int(vals[k] * 256)))) for k in ("LX", "LY", "RX", "RY", "LT", "RT")]
+        lines.append(f"RAW,{int(t * 1000)},{','.join(raw)}")
+    return ("\n".join(lines) + "\n").encode()
+
+
+# ─── USB HOST TIMING ──────────────────────────────────────────────────────────
+def host_arrivals(reports, frame_ms=1.0, wake_ms=0.15, stall_every=5.0, stall_ms=25.0, seed=1):
+    """Turn FirmwareShim send times into the times a reader on the Pi sees
+    them: the interrupt endpoint is polled once per USB frame, the reader
+    wakes up a little later, and every stall_every seconds the reader is
+    held off for stall_ms (busy CPU), after which the queued reports come
+    in back to back. Returns [(t, report)]."""
+    import math
+    import random
+    rng = random.Random(seed)
+    out = []
+    stall_end = -1.0
+    next_stall = stall_every
+    last = 0.0
+    for t, report in reports:
+        if stall_every and t >= next_stall:
+            stall_end = next_stall + stall_ms / 1000
+            next_stall += stall_every
+        frame = math.ceil(t * 1000 / frame_ms) * frame_ms / 1000
+        arrive = max(frame, stall_end) + rng.expovariate(1000 / wake_ms)
+        last = max(arrive, last + 5e-6)
+        out.append((last, report))
+    return out
+
+
+# ─── CIRCUITPYTHON FIRMWARE SHIM ──────────────────────────────────────────────
+FIRMWARE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "GPT-Output")
+
+
+class _FirmwareStop(Exception):
+    pass
+
+
+class _KeyEvent:
+    def __init__(self, key_number=0, pressed=True):
+        self.key_number = key_number
+        self.pressed = pressed
+
+
+class _EventQueue:
+    def __init__(self):
+        self.queue = []
+
+    def get_into(self, event):
+        if not self.queue:
+            return False
+        event.key_number, event.pressed = self.queue.pop(0)
+        return True
+
+    def get(self):
+        if not self.queue:
+            return None
+        return _KeyEvent(*self.queue.pop(0))
+
+
+class FirmwareShim:
+    """Runs a CircuitPython main.py on the host: fake board/analogio/keypad/
+    usb_hid modules, a virtual clock, and a schedule of stimuli.
+
+      shim = FirmwareShim()
+      shim.at(120.0, shim.press, "A")
+      shim.run(600.0)
+      shim.reports, shim.adc_reads   # lists of virtual timestamps
+    """
+    def __init__(self, main_path=None, pinout=None, config=None):
+        self.main_path = main_path or os.path.join(FIRMWARE_DIR, "main.py")
+        self.pinout = pinout or _load_commented_json(os.path.join(FIRMWARE_DIR, "button-assignment.json"))
+        self.config = config if config is not None else {}
+        self.clock = FakeClock()
+        self.adc = {}            # pin name -> 16-bit value
+        self.reports = []        # (t, report bytes)
+        self.adc_reads = []      # t of every AnalogIn.value
+        self.console = []        # (t, printed line)
+        self.schedule = []       # (t, fn, args)
+        self.keys = None
+        self.end = 0.0
+
+    # Stimuli
+    def at(self, t, fn, *args):
+        self.schedule.append((t, fn, args))
+        self.schedule.sort(key=lambda e: e[0])
+
+    def set_axis(self, axis, value):
+        self.adc[self.pinout["axes"][axis]] = value
+
+    def press(self, name, pressed=True):
+        self.keys.events.queue.append((self.key_names.index(name), pressed))
+
+    def release(self, name):
+        self.press(name, False)
+
+    # Fake CircuitPython modules
+    def _modules(self):
+        shim = self
+        clock = self.clock
+
+        def sleep(seconds):
+            clock.sleep(seconds)
+            while shim.schedule and shim.schedule[0][0] <= clock.t:
+                _, fn, args = shim.schedule.pop(0)
+                fn(*args)
+            if clock.t >= shim.end:
+                raise _FirmwareStop()
+
+        class AnalogIn:
+            def __init__(self, pin):
+                self.pin = pin
+
+            @property
+            def value(self):
+                shim.adc_reads.append(clock.t)
+                return shim.adc.get(self.pin.name, 32768)
+
+        class Keys:
+            def __init__(self, pins, value_when_pressed=False, pull=True):
+                self.pins = pins
+                self.events = _EventQueue()
+                shim.keys = self
+
+        class HIDDevice:
+            usage_page, usage = 0x01, 0x05
+
+            def send_report(self, report):
+                shim.reports.append((clock.t, bytes(report)))
+
+        board = types.ModuleType("board")
+        for name in [f"D{n}" for n in range(14)] + [f"A{n}" for n in range(6)] + ["MOSI", "MISO", "SCK"]:
+            setattr(board, name, _FakePin(name))
+        return {
+            "time": types.SimpleNamespace(monotonic=clock.now, sleep=sleep,
+                                          monotonic_ns=lambda: int(clock.t * 1e9)),
+            "board": board,
+            "analogio": types.SimpleNamespace(AnalogIn=AnalogIn),
+            "keypad": types.SimpleNamespace(Keys=Keys, Event=_KeyEvent),
+            "usb_hid": types.SimpleNamespace(devices=[HIDDevice()]),
+        }
+
+    def run(self, seconds):
+        self.end = seconds
+        modules = self._modules()
+        saved = {name: sys.modules.get(name) for name in modules}
+        cwd = os.getcwd()
+        # main.py orders keys alphabetically by button name, then the d-pad
+        self.key_names = sorted(self.pinout["buttons"]) + [
+            k for k in ("Up", "Down", "Left", "Right") if k in self.pinout.get("dpad", {})]
+        with tempfile.TemporaryDirectory() as d:
+            for name, data in (("button-pinout.json", self.pinout), ("config.json", self.config)):
+                with open(os.path.join(d, name), "w") as f:
+                    json.dump(data, f)
+            os.chdir(d)
+            sys.modules.update(modules)
+            try:
+                runpy.run_path(self.main_path, init_globals={"print": self._print}, run_name="__main__")
+            except _FirmwareStop:
+                pass
+            finally:
+                os.chdir(cwd)
+                for name, mod in saved.items():
+                    if mod is None:
+                        sys.modules.pop(name, None)
+                    else:
+                        sys.modules[name] = mod
+        return self
+
+    def _print(self, *args):
+        self.console.append((self.clock.t, " ".join(str(a) for a in args)))
+
+    def rate(self, stamps, start, end):
+        """Events per minute in [start, end)."""
+        n = sum(1 for t in stamps if start <= t < end)
+        return n * 60.0 / (end - start)
+
+
+def _load_commented_json(path):
+    with open(path) as f:
+        return json.loads("".join(l for l in f if not l.lstrip().startswith("//")))
+
+
+# ─── ALSA MIXER ───────────────────────────────────────────────────────────────
+class FakeMixer:
+    """mixer_watch source: a pipe stands in for the ALSA control fd and
+    becomes readable whenever anyone changes the volume or mute."""
+    def __init__(self, percent=50, muted=False):
+        self.percent = percent
+        self.muted = muted
+        self.reads = 0
+        self._r, self._w = os.pipe()
+        os.set_blocking(self._r, False)
+
+    def set(self, percent=None, muted=None):
+        if percent is not None:
+            self.percent = percent
+        if muted is not None:
+            self.muted = muted
+        os.write(self._w, b"!")
+
+    def fds(self):
+        return [self._r]
+
+    def read(self):
+        try:
+            os.read(self._r, 4096)  # handleevents()
+        except BlockingIOError:
+            pass
+        self.reads += 1
+        return self.percent, self.muted
+
+
+# ─── SYSFS PWM ────────────────────────────────────────────────────────────────
+class FakePwmTree:
+    """A /sys/class/pwm look-alike in a temp dir, with pwmchip0 channels
+    already exported (plain files can't create them on export)."""
+    def __init__(self, root, channels=2):
+        self.root = root
+        chip = os.path.join(root, "pwmchip0")
+        os.makedirs(chip, exist_ok=True)
+        for name, value in (("export", ""), ("npwm", channels)):
+            with open(os.path.join(chip, name), "w") as f:
+                f.write(str(value))
+        for ch in range(channels):
+            d = os.path.join(chip, f"pwm{ch}")
+            os.makedirs(d, exist_ok=True)
+            for name in ("period", "duty_cycle", "enable"):
+                with open(os.path.join(d, name), "w") as f:
+                    f.write("0")
+
+    def read(self, channel):
+        d = os.path.join(self.root, "pwmchip0", f"pwm{channel}")
+        values = []
+        for name in ("period", "duty_cycle", "enable"):
+            with open(os.path.join(d, name)) as f:
+                values.append(int(f.read()))
+        return tuple(values)
+
+
+# ─── SYSFS BACKLIGHT ──────────────────────────────────────────────────────────
+class FakeBacklightTree:
+    """A /sys/class/backlight look-alike in a temp dir (rpi_backlight)."""
+    def __init__(self, root, brightness=200, max_brightness=255):
+        self.path = os.path.join(root, "rpi_backlight", "brightness")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(os.path.join(root, "rpi_backlight", "max_brightness"), "w") as f:
+            f.write(f"{max_brightness}\n")
+        self.set(brightness)
+
+    def set(self, value):
+        with open(self.path, "w") as f:
+            f.write(f"{value}\n")
+
+    def read(self):
+        with open(self.path) as f:
+            return int(f.read())
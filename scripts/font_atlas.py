@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Pre-rasterized OSD font: an offline build step and an mmap'd runtime.
+
+Building renders the OSD's fixed strings (titles, profile names) and a
+glyph set for everything else (battery percentages) from the TTF with
+FreeType, once, into a single 8-bit coverage bitmap plus a small index:
+
+  python3 font_atlas.py                      # resources/Jersey10-Regular.ttf
+  python3 font_atlas.py --sizes 24 32 --ttf other.ttf -o osd_font.atlas
+
+At runtime FontAtlas maps the file read-only and wraps the bitmap in one
+palettized pygame Surface without copying it, so the font subsystem is
+never initialized and the pages nobody draws from are never read in. Its
+render() has pygame.font.Font's signature, so draw_osd() takes either.
+
+Text comes out as white-on-black coverage (the OSD always clears to
+black); other colors get a scaled palette.
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+
+from power_profiles import PROFILES
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TTF_PATH = os.path.join(HERE, "..", "resources", "Jersey10-Regular.ttf")
+ATLAS_PATH = os.path.join(HERE, "osd_font.atlas")
+
+SIZES = (24,)           # OSD_FONT_SIZE in volume_backlight_control.py
+CHARSET = " %-./:0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+STRINGS = ("VOLUME", "MUTED", "HEADPHONES") + tuple(n.upper() for n in PROFILES)
+
+HEADER = struct.Struct("<4sHHHI")   # magic, version, width, height, index length
+MAGIC = b"PSFA"
+VERSION = 1
+ATLAS_WIDTH = 512
+WHITE = (255, 255, 255)
+
+
+# ─── BUILD (needs pygame.font) ─────────────────────────────────────────────────
+def _coverage(surface):
+    """Alpha channel of a rendered text surface, as rows of bytes."""
+    import pygame
+    return pygame.image.tobytes(surface, "RGBA")[3::4]
+
+
+def _pack(items, width):
+    """Shelf-pack (key, w, h) items; returns ({key: (x, y)}, total height)."""
+    placed, x, y, shelf = {}, 0, 0, 0
+    for key, w, h in sorted(items, key=lambda i: -i[2]):
+        if x + w > width:
+            x, y, shelf = 0, y + shelf, 0
+        placed[key] = (x, y)
+        x += w
+        shelf = max(shelf, h)
+    return placed, y + shelf
+
+
+def build_atlas(ttf=TTF_PATH, sizes=SIZES, charset=CHARSET, strings=STRINGS, width=ATLAS_WIDTH):
+    """Rasterize everything and return the atlas file contents."""
+    import pygame
+    pygame.font.init()
+    bitmaps, items = {}, []
+    index = {"sizes": {}}
+    for size in sizes:
+        font = pygame.font.Font(ttf, size)
+        entry = {"height": font.get_height(), "glyphs": {}, "strings": {}}
+        index["sizes"][str(size)] = entry
+        for kind, texts in (("glyphs", charset), ("strings", strings)):
+            for text in texts:
+                surface = font.render(text, True, WHITE)
+                key = (size, kind, text)
+                bitmaps[key] = (surface.get_size(), _coverage(surface))
+                items.append((key, *surface.get_size()))
+    placed, height = _pack(items, width)
+    page = bytearray(width * height)
+    for key, ((w, h), data) in bitmaps.items():
+        x, y = placed[key]
+        for row in range(h):
+            page[(y + row) * width + x:(y + row) * width + x + w] = data[row * w:(row + 1) * w]
+        size, kind, text = key
+        index["sizes"][str(size)][kind][text] = [x, y, w, h]
+    blob = json.dumps(index, separators=(",", ":")).encode()
+    return HEADER.pack(MAGIC, VERSION, width, height, len(blob)) + blob + bytes(page)
+
+
+# ─── RUNTIME (pygame display only) ─────────────────────────────────────────────
+class FontAtlas:
+    def __init__(self, pygame, size, path=ATLAS_PATH):
+        self.pygame = pygame
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, width, height, index_len = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: not a v{VERSION} font atlas")
+        start = HEADER.size + index_len
+        index = json.loads(self.map[HEADER.size:start])
+        if str(size) not in index["sizes"]:
+            raise ValueError(f"{path}: no {size} px glyphs (has {', '.join(index['sizes'])})")
+        entry = index["sizes"][str(size)]
+        self.height = entry["height"]
+        self.glyphs = entry["glyphs"]
+        self.strings = entry["strings"]
+        self.page = pygame.image.frombuffer(memoryview(self.map)[start:start + width * height],
+                                            (width, height), "P")
+        self.page.set_palette([(i, i, i) for i in range(256)])
+
+    def size(self, text):
+        if text in self.strings:
+            return tuple(self.strings[text][2:])
+        return sum(self._glyph(c)[2] for c in text), self.height
+
+    def _glyph(self, char):
+        return self.glyphs.get(char) or self.glyphs.get(char.upper()) or self.glyphs[" "]
+
+    def render(self, text, antialias=True, color=WHITE):
+        """A Surface with text on black; prebuilt strings are views into the page."""
+        pg = self.pygame
+        if text in self.strings:
+            surface = self.page.subsurface(pg.Rect(self.strings[text]))
+        else:
+            surface = pg.Surface(self.size(text), depth=8)
+            surface.set_palette(self.page.get_palette())
+            x = 0
+            for char in text:
+                gx, gy, w, h = self._glyph(char)
+                surface.blit(self.page, (x, 0), pg.Rect(gx, gy, w, h))
+                x += w
+        if tuple(color[:3]) != WHITE:
+            surface = surface.copy()
+            surface.set_palette([tuple(c * i // 255 for c in color[:3]) for i in range(256)])
+        return surface
+
+
+# ─── MAIN ──────────────────────────────────────────────────────────────────────
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--ttf", default=TTF_PATH)
+    ap.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    ap.add_argument("-o", "--output", default=ATLAS_PATH)
+    args = ap.parse_args()
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    data = build_atlas(args.ttf, args.sizes)
+    with open(args.output, "wb") as f:
+        f.write(data)
+    width, height = HEADER.unpack_from(data)[2:4]
+    print(f"wrote {args.output}: {len(data)} bytes, {width}x{height} px, sizes {args.sizes}")
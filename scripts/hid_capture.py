@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Capture and timing analysis of the ItsyBitsy gamepad's HID reports, seen
+from the Pi.
+
+  python3 hid_capture.py capture -o pad.bin --seconds 60   # /dev/hidraw* of the pad
+  python3 hid_capture.py analyze pad.bin
+  python3 hid_capture.py replay pad.bin                    # serve a log on a pty
+  python3 hid_capture.py capture --device /dev/pts/5 -o again.bin
+
+capture drains every report the kernel has queued on each wakeup and
+appends it to a binary log: a short header, then fixed 17-byte records
+(monotonic ns timestamp + the raw 9-byte report). Nothing is decoded until
+analysis, which loads the log as one NumPy array and reports the interval
+histogram, gaps, jitter, the share of reports identical to the previous
+one, and how often each button/hat/axis field actually changes.
+
+The report layout is the one boot.py declares: 16 button bits, the hat in
+the low nibble of byte 2, then LX LY RX RY LT RT as bytes. replay plays a
+log back through a pseudo-terminal with its original timing, so capture
+and analysis can be checked without the controller.
+"""
+import argparse
+import errno
+import glob
+import os
+import pty
+import select
+import struct
+import sys
+import time
+import tty
+
+import numpy as np
+
+REPORT_SIZE = 9
+AXES = ("LX", "LY", "RX", "RY", "LT", "RT")
+ADAFRUIT_VID = 0x239A
+
+HEADER = struct.Struct("<4sHH")     # magic, version, report size
+MAGIC = b"PSHC"
+VERSION = 1
+RECORD = np.dtype([("t_ns", "<i8"), ("report", "u1", (REPORT_SIZE,))])
+
+FLUSH_RECORDS = 1024
+HIST_BIN_MS = 1.0
+HIST_MAX_MS = 20.0
+GAP_FACTOR = 1.5        # an interval this many times the median is a gap
+
+
+# ─── CAPTURE ───────────────────────────────────────────────────────────────────
+def find_device(vid=ADAFRUIT_VID):
+    """First /dev/hidraw* whose USB vendor is vid, or None."""
+    for uevent in sorted(glob.glob("/sys/class/hidraw/hidraw*/device/uevent")):
+        with open(uevent) as f:
+            for line in f:
+                # HID_ID=0003:0000239A:000080F4
+                if line.startswith("HID_ID=") and int(line.split(":")[1], 16) == vid:
+                    return "/dev/" + uevent.split("/")[4]
+    return None
+
+
+class Capture:
+    """Reads reports from a hidraw node (one report per read) or a pty
+    (reports may arrive split or joined) and appends records to a log."""
+    def __init__(self, device, out, clock=time.monotonic_ns):
+        self.device = device
+        self.out = out
+        self.clock = clock
+        self.fd = None
+        self.is_tty = False
+        self.count = 0
+        self.wakeups = 0
+        self.ended = False              # the device went away (pty closed, pad unplugged)
+        self._pending = bytearray()     # undecided bytes from a pty
+        self._records = bytearray()
+
+    def open(self):
+        self.fd = os.open(self.device, os.O_RDONLY | os.O_NONBLOCK)
+        self.is_tty = os.isatty(self.fd)
+        if self.is_tty:
+            tty.setraw(self.fd)
+        self.out.write(HEADER.pack(MAGIC, VERSION, REPORT_SIZE))
+        return self
+
+    def _add(self, t, report):
+        self._records += t.to_bytes(8, "little", signed=True)
+        self._records += report
+        self.count += 1
+
+    def drain(self):
+        """Read everything queued right now; returns the number of reports."""
+        before = self.count
+        self.wakeups += 1
+        while True:
+            try:
+                data = os.read(self.fd, 4096)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                if e.errno not in (errno.EIO, errno.ENODEV):
+                    raise
+                data = b""  # replay finished (pty hung up) or the pad was unplugged
+            if not data:
+                self.ended = True
+                break
+            t = self.clock()
+            if len(data) == REPORT_SIZE + 1 and not self.is_tty:
+                data = data[1:]  # numbered report: drop the report ID
+            if len(data) == REPORT_SIZE and not self._pending:
+                self._add(t, data)
+                continue
+            self._pending += data
+            while len(self._pending) >= REPORT_SIZE:
+                self._add(t, bytes(self._pending[:REPORT_SIZE]))
+                del self._pending[:REPORT_SIZE]
+        if len(self._records) >= FLUSH_RECORDS * RECORD.itemsize:
+            self.flush()
+        return self.count - before
+
+    def flush(self):
+        self.out.write(self._records)
+        self._records.clear()
+        self.out.flush()
+
+    def run(self, seconds=None):
+        poller = select.poll()
+        poller.register(self.fd, select.POLLIN)
+        end = None if seconds is None else time.monotonic() + seconds
+        try:
+            while not self.ended and (end is None or time.monotonic() < end):
+                timeout = None if end is None else max(0, int((end - time.monotonic()) * 1000))
+                if poller.poll(timeout):
+                    self.drain()
+        finally:
+            self.flush()
+
+    def close(self):
+        os.close(self.fd)
+
+
+# ─── LOG FILES ─────────────────────────────────────────────────────────────────
+def load(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, size = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or size != REPORT_SIZE:
+        raise ValueError(f"{path}: not a v{VERSION} gamepad capture")
+    body = memoryview(data)[HEADER.size:]
+    body = body[:len(body) - len(body) % RECORD.itemsize]   # cut a torn last record
+    return np.frombuffer(body, dtype=RECORD)
+
+
+def save(path, records):
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, REPORT_SIZE))
+        f.write(np.asarray(records, dtype=RECORD).tobytes())
+
+
+def records_from(reports):
+    """[(t seconds, report bytes)] -> record array, e.g. from fake_hw.FirmwareShim."""
+    rec = np.zeros(len(reports), dtype=RECORD)
+    rec["t_ns"] = [int(t * 1e9) for t, _ in reports]
+    rec["report"] = np.frombuffer(b"".join(r for _, r in reports), dtype=np.uint8).reshape(-1, REPORT_SIZE)
+    return rec
+
+
+# ─── REPLAY ────────────────────────────────────────────────────────────────────
+def open_pty():
+    """(master fd, slave fd, slave path); the slave is raw so reports pass
+    through untouched. Keep the slave fd open while replaying."""
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    path = os.ttyname(slave)
+    return master, slave, path
+
+
+def replay(records, master, speed=1.0):
+    """Write each report to the pty master at its original relative time."""
+    if not len(records):
+        return
+    t0 = records["t_ns"][0]
+    start = time.monotonic_ns()
+    for t, report in zip(records["t_ns"].tolist(), records["report"]):
+        delay = (start + (t - t0) / speed - time.monotonic_ns()) / 1e9
+        if delay > 0:
+            time.sleep(delay)
+        os.write(master, report.tobytes())
+
+
+# ─── ANALYSIS ──────────────────────────────────────────────────────────────────
+def decode(records):
+    """Record array -> (buttons uint16, hat 0-8, axes (n, 6) uint8)."""
+    r = records["report"]
+    buttons = r[:, 0].astype(np.uint16) | (r[:, 1].astype(np.uint16) << 8)
+    return buttons, r[:, 2] & 0x0F, r[:, 3:]
+
+
+def analyze(records):
+    n = len(records)
+    if n < 2:
+        raise ValueError("need at least two reports")
+    t = records["t_ns"]
+    seconds = (t[-1] - t[0]) / 1e9
+    iv = np.diff(t) / 1e6                                   # ms
+    median = float(np.median(iv))
+    edges = np.arange(0.0, HIST_MAX_MS + HIST_BIN_MS, HIST_BIN_MS)
+    hist, _ = np.histogram(np.minimum(iv, HIST_MAX_MS - HIST_BIN_MS / 2), bins=edges)
+    p1, p50, p99 = np.percentile(iv, [1, 50, 99])
+
+    # A duplicate is byte-for-byte the same as the report before it
+    rows = np.ascontiguousarray(records["report"]).view(np.dtype((np.void, REPORT_SIZE))).ravel()
+    dup = rows[1:] == rows[:-1]
+
+    buttons, hat, axes = decode(records)
+    changes = {"buttons": int(np.count_nonzero(np.diff(buttons))),
+               "hat": int(np.count_nonzero(np.diff(hat)))}
+    moved = np.count_nonzero(np.diff(axes.astype(np.int16), axis=0), axis=0)
+    changes.update({name: int(c) for name, c in zip(AXES, moved)})
+    return {
+        "reports": n,
+        "seconds": seconds,
+        "rate_hz": (n - 1) / seconds if seconds else 0.0,
+        "interval_ms": {"median": median, "mean": float(iv.mean()), "min": float(iv.min()),
+                        "max": float(iv.max()), "p1": float(p1), "p99": float(p99)},
+        "jitter_ms": float(iv.std()),
+        "p99_minus_p50_ms": float(p99 - p50),
+        "gaps": int(np.count_nonzero(iv > median * GAP_FACTOR)),
+        "histogram": list(zip(edges[:-1].tolist(), hist.tolist())),
+        "duplicates": int(dup.sum()),
+        "duplicate_ratio": float(dup.mean()),
+        "changes": changes,
+        "change_rate_hz": {k: c / seconds if seconds else 0.0 for k, c in changes.items()},
+    }
+
+
+def print_report(a):
+    iv = a["interval_ms"]
+    print(f"{a['reports']} reports over {a['seconds']:.1f} s ({a['rate_hz']:.1f} Hz)")
+    print(f"interval ms: median {iv['median']:.2f}  mean {iv['mean']:.2f}  "
+          f"p1 {iv['p1']:.2f}  p99 {iv['p99']:.2f}  max {iv['max']:.2f}")
+    print(f"jitter: sd {a['jitter_ms']:.2f} ms, p99-p50 {a['p99_minus_p50_ms']:.2f} ms; "
+          f"{a['gaps']} gaps > {GAP_FACTOR:g}x median")
+    print(f"duplicates: {a['duplicates']} ({a['duplicate_ratio'] * 100:.1f}%)")
+    peak = max(c for _, c in a["histogram"]) or 1
+    for lo, count in a["histogram"]:
+        if count:
+            label = f">={lo:4.0f}" if lo + HIST_BIN_MS >= HIST_MAX_MS else f"{lo:4.0f}-{lo + HIST_BIN_MS:<3.0f}"
+            print(f"  {label} ms {count:8d} {'#' * max(1, round(40 * count / peak))}")
+    print("changes/s: " + "  ".join(f"{k} {v:.2f}" for k, v in a["change_rate_hz"].items()))
+
+
+# ─── MAIN ──────────────────────────────────────────────────────────────────────
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("capture", help="record reports to a log")
+    c.add_argument("--device", help="hidraw node or pty (default: find the ItsyBitsy)")
+    c.add_argument("--seconds", type=float, help="stop after this long (default: Ctrl+C)")
+    c.add_argument("-o", "--output", required=True)
+    a = sub.add_parser("analyze", help="timing statistics for a log")
+    a.add_argument("log")
+    r = sub.add_parser("replay", help="play a log back on a pty")
+    r.add_argument("log")
+    r.add_argument("--speed", type=float, default=1.0)
+    args = ap.parse_args()
+
+    if args.cmd == "capture":
+        device = args.device or find_device()
+        if not device:
+            sys.exit("no ItsyBitsy hidraw device found; pass --device")
+        with open(args.output, "wb") as out:
+            cap = Capture(device, out).open()
+            print(f"capturing {device} -> {args.output}")
+            try:
+                cap.run(args.seconds)
+            except KeyboardInterrupt:
+                pass
+            cap.close()
+        print(f"{cap.count} reports in {cap.wakeups} wakeups")
+        if cap.count >= 2:
+            print_report(analyze(load(args.output)))
+    elif args.cmd == "analyze":
+        try:
+            print_report(analyze(load(args.log)))
+        except ValueError as e:
+            sys.exit(str(e))
+    else:
+        records = load(args.log)
+        master, slave, path = open_pty()
+        print(f"replaying {len(records)} reports on {path}; capture with --device {path}")
+        input("press Enter to start")
+        replay(records, master, args.speed)
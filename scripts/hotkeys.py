@@ -0,0 +1,199 @@
+"""
+Table-driven hotkey engine for the GPIO buttons and the Joy-Cons.
+
+Bindings (hotkeys.json) say which keys on which device make up a chord,
+what kind of press it is (chord / long / double) and which action to call:
+
+  {"device": "joycon", "keys": ["KEY_HOME", "ABS_HAT0Y-"],
+   "trigger": "ABS_HAT0Y-", "action": "backlight", "arg": 16}
+
+Each device keeps a bitmask of the bound keys currently held. Bindings are
+indexed by their trigger key when loaded, so an event only looks at the
+handful of bindings it can possibly complete, however many there are.
+A chord matches when the held keys are exactly the binding's keys.
+
+Key ids are ints: evdev key codes as-is, hat directions folded in with
+hat_key(), and BCM pin numbers for the GPIO buttons.
+"""
+import json
+import os
+import time
+
+HOTKEYS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hotkeys.json")
+
+DEFAULT_HOLD_MS = 800
+DEFAULT_DOUBLE_MS = 350
+
+HAT_BASE = 0x10000
+
+
+def hat_key(code, value):
+    """Key id for one direction of an EV_ABS hat axis (value -1 or +1)."""
+    return HAT_BASE | (code << 1) | (1 if value > 0 else 0)
+
+
+class Binding:
+    __slots__ = ("device", "mask", "kind", "hold", "window", "action", "arg", "last_tap")
+
+    def __init__(self, device, mask, kind, hold, window, action, arg):
+        self.device = device
+        self.mask = mask
+        self.kind = kind
+        self.hold = hold
+        self.window = window
+        self.action = action
+        self.arg = arg
+        self.last_tap = float("-inf")
+
+
+class _Device:
+    __slots__ = ("bits", "mask", "index")
+
+    def __init__(self):
+        self.bits = {}    # key id -> bit
+        self.mask = 0     # bound keys currently held
+        self.index = {}   # trigger key id -> [Binding]
+
+
+class HotkeyEngine:
+    def __init__(self, actions, clock=time.monotonic):
+        self.actions = actions
+        self.clock = clock
+        self.devices = {}
+        self.pending = []  # (deadline, Binding) for long presses in progress
+        self.fired = 0
+
+    # ── setup ──────────────────────────────────────────────────────────────
+    def add(self, device, keys, action, arg=None, kind="chord", trigger=None,
+            hold_ms=DEFAULT_HOLD_MS, window_ms=DEFAULT_DOUBLE_MS):
+        if kind not in ("chord", "long", "double"):
+            raise ValueError(f"Unknown hotkey kind {kind!r}")
+        dev = self.devices.setdefault(device, _Device())
+        mask = 0
+        for key in keys:
+            bit = dev.bits.setdefault(key, 1 << len(dev.bits))
+            mask |= bit
+        binding = Binding(device, mask, kind, hold_ms / 1000, window_ms / 1000, action, arg)
+        # No explicit trigger: completing the chord with any of its keys fires it
+        for key in ([trigger] if trigger is not None else keys):
+            dev.index.setdefault(key, []).append(binding)
+        return binding
+
+    def load(self, path, resolvers):
+        """Load bindings from JSON. resolvers maps device -> fn(name) -> key id."""
+        with open(path) as f:
+            config = json.load(f)
+        count = 0
+        for b in config.get("bindings", []):
+            device = b["device"]
+            resolve = resolvers.get(device)
+            if resolve is None:
+                continue  # device not handled by this script
+            if b["action"] not in self.actions:
+                print(f"hotkeys: skipping binding with unknown action {b['action']!r}")
+                continue
+            trigger = b.get("trigger")
+            self.add(device, [resolve(k) for k in b["keys"]], b["action"], b.get("arg"),
+                     b.get("type", "chord"),
+                     resolve(trigger) if trigger is not None else None,
+                     b.get("hold_ms", DEFAULT_HOLD_MS), b.get("window_ms", DEFAULT_DOUBLE_MS))
+            count += 1
+        return count
+
+    # ── events ─────────────────────────────────────────────────────────────
+    def feed(self, device, key, pressed, now=None):
+        """Process one key transition. True if it fired or armed a binding."""
+        dev = self.devices.get(device)
+        if dev is None:
+            return False
+        bit = dev.bits.get(key)
+        if bit is None:
+            return False  # not part of any binding
+        if not pressed:
+            dev.mask &= ~bit
+            if self.pending:
+                self.pending = [p for p in self.pending
+                                if not (p[1].device == device and p[1].mask & bit)]
+            return False
+        if dev.mask & bit:
+            return False  # autorepeat
+        dev.mask |= bit
+        candidates = dev.index.get(key)
+        if not candidates:
+            return False
+        if now is None:
+            now = self.clock()
+        used = False
+        for b in candidates:
+            if dev.mask != b.mask:
+                continue
+            if b.kind == "chord":
+                self.fire(b)
+                used = True
+            elif b.kind == "long":
+                self.pending.append((now + b.hold, b))
+                used = True
+            elif now - b.last_tap <= b.window:
+                b.last_tap = float("-inf")
+                self.fire(b)
+                used = True
+            else:
+                b.last_tap = now
+        return used
+
+    def tick(self, now=None):
+        """Fire long presses whose hold time has elapsed. Call from the poll loop."""
+        if not self.pending:
+            return
+        if now is None:
+            now = self.clock()
+        still = []
+        for deadline, b in self.pending:
+            if deadline > now:
+                still.append((deadline, b))
+            elif self.devices[b.device].mask == b.mask:
+                self.fire(b)
+        self.pending = still
+
+    def next_deadline(self):
+        """Earliest pending long-press deadline, for select() timeouts."""
+        return min(d for d, _ in self.pending) if self.pending else None
+
+    def fire(self, binding):
+        self.fired += 1
+        action = self.actions[binding.action]
+        if binding.arg is None:
+            action()
+        else:
+            action(binding.arg)
+
+
+# ─── EVDEV ADAPTER ───────────────────────────────────────────────────────────
+def evdev_resolver(ecodes):
+    """Resolve 'KEY_HOME' / 'BTN_TR' / 'ABS_HAT0Y-' style names to key ids."""
+    def resolve(name):
+        if name[-1] in "+-":
+            return hat_key(ecodes.ecodes[name[:-1]], -1 if name[-1] == "-" else 1)
+        return ecodes.ecodes[name]
+    return resolve
+
+
+def is_hat(event, ev_abs):
+    return event.type == ev_abs and 0x10 <= event.code <= 0x17  # ABS_HAT0X..ABS_HAT3Y
+
+
+def feed_evdev(engine, device, event, ev_key, ev_abs):
+    """Translate one evdev event into engine.feed() calls; True if consumed."""
+    if event.type == ev_key:
+        return event.value != 2 and engine.feed(device, event.code, event.value == 1)
+    if is_hat(event, ev_abs):
+        up, down = hat_key(event.code, -1), hat_key(event.code, 1)
+        if event.value < 0:
+            engine.feed(device, down, False)
+            return engine.feed(device, up, True)
+        if event.value > 0:
+            engine.feed(device, up, False)
+            return engine.feed(device, down, True)
+        engine.feed(device, up, False)
+        engine.feed(device, down, False)
+    return False
@@ -0,0 +1,162 @@
+"""
+One thread that owns the amp's I2C bus, so a NACK or a bus held low after
+an amp brown-out never blocks or kills the button loops.
+
+Callers submit(key, fn, *args) and return at once. A call still waiting
+with the same key is replaced (ten gain steps during a fault become one
+write of the last value). A failing call is retried with exponential
+backoff (2 ms doubling to 250 ms, six attempts); every second failure in
+a row runs the next bus-recovery step, e.g. reopen the adapter, then pulse
+the amp's SHDN to make it let go of SDA.
+
+Every keyed call is also kept as the bus's shadow state. After a fault,
+the first call that goes through again triggers a resync: by default the
+shadow calls are replayed in order, or a resync function given by the
+owner runs instead (volumecombo.py rewrites the whole TPA2016 register
+file from AmpPower's shadow). While faulted and idle, a resync is tried
+every second, so a brown-out with nobody touching the buttons still ends
+with the amp set up correctly.
+
+Recovery steps and resyncs may fail with anything, not just OSError (the
+Adafruit driver's probe raises ValueError when the amp doesn't ACK): that
+counts as another failure and the worker carries on, it never dies.
+"""
+import queue
+import threading
+import time
+
+from rt_sched import make_background
+
+BACKOFF_START = 0.002
+BACKOFF_MAX = 0.25
+MAX_ATTEMPTS = 6        # then the call is dropped; its state is still in the shadow
+RECOVER_EVERY = 2       # consecutive failures between recovery steps
+PROBE_INTERVAL = 1.0    # s between resync attempts while faulted
+
+
+class I2CWorker:
+    def __init__(self, recovery=(), resync=None, on_error=None, avoid_cpu=None,
+                 sleep=time.sleep, name="i2c"):
+        self.recovery = list(recovery)   # escalating steps; the last one repeats
+        self.resync_fn = resync
+        self.on_error = on_error
+        self.avoid_cpu = avoid_cpu
+        self.sleep = sleep
+        self.shadow = {}                 # key -> (fn, args), in first-set order
+        self.faulted = False
+        self._level = 0
+        self._streak = 0                 # failures since the bus last worked
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._queue = queue.SimpleQueue()
+        self.done = self.coalesced = self.errors = self.dropped = 0
+        self.recoveries = self.resyncs = 0
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def submit(self, key, fn, *args, shadow=True):
+        """Queue fn(*args); shadow=False for one-off calls such as readbacks."""
+        with self._lock:
+            if shadow:
+                self.shadow[key] = (fn, args)
+            if key in self._pending:
+                self.coalesced += 1
+                self._pending[key] = (fn, args)
+                return
+            self._pending[key] = (fn, args)
+        self._queue.put(key)
+
+    def drain(self, timeout=None):
+        """Block until everything queued so far has run (tests, shutdown)."""
+        done = threading.Event()
+        self.submit(object(), done.set, shadow=False)
+        return done.wait(timeout)
+
+    def stop(self):
+        self._queue.put(None)
+        self.thread.join()
+
+    # ── worker thread ──────────────────────────────────────────────────────
+    def _run(self):
+        if self.avoid_cpu is not None:
+            make_background(self.avoid_cpu, nice=0)
+        while True:
+            try:
+                key = self._queue.get(timeout=PROBE_INTERVAL if self.faulted else None)
+            except queue.Empty:
+                self._resync()
+                continue
+            if key is None:
+                return
+            with self._lock:
+                call = self._pending.pop(key, None)
+            if call is None:
+                continue  # taken over by a retry of the same key
+            if self._attempt(key, *call) and self.faulted:
+                self._resync()
+            self.done += 1
+
+    def _attempt(self, key, fn, args):
+        delay = BACKOFF_START
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                fn(*args)
+                return True
+            except OSError as e:
+                self._failed(e)
+            except Exception as e:
+                print(f"I2C {key}: {e}")
+                return False
+            if attempt == MAX_ATTEMPTS:
+                break
+            self.sleep(delay)
+            delay = min(delay * 2, BACKOFF_MAX)
+            with self._lock:
+                # A newer value for this key arrived meanwhile: retry with that
+                if key in self._pending:
+                    fn, args = self._pending.pop(key)
+                    self.coalesced += 1
+        self.dropped += 1
+        print(f"I2C {key}: giving up after {MAX_ATTEMPTS} attempts")
+        return False
+
+    def _failed(self, error):
+        self.errors += 1
+        self._streak += 1
+        self.faulted = True
+        if self.on_error:
+            self.on_error(error)
+        if self.recovery and self._streak % RECOVER_EVERY == 0:
+            step = self.recovery[min(self._level, len(self.recovery) - 1)]
+            self._level += 1
+            self.recoveries += 1
+            try:
+                step()
+            except Exception as e:
+                self.errors += 1
+                print(f"I2C recovery {getattr(step, '__name__', step)}: {e!r}")
+                if self.on_error:
+                    self.on_error(e)
+
+    def _resync(self):
+        try:
+            if self.resync_fn:
+                self.resync_fn()
+            else:
+                with self._lock:
+                    calls = list(self.shadow.values())
+                for fn, args in calls:
+                    fn(*args)
+        except Exception as e:
+            if not isinstance(e, OSError):
+                print(f"I2C resync: {e!r}")
+            self._failed(e)
+            return False
+        self.faulted = False
+        self._level = self._streak = 0
+        self.resyncs += 1
+        print("I2C recovered; amp state restored")
+        return True
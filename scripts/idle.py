@@ -0,0 +1,140 @@
+"""
+Idle display sleep: dim the 7" panel, then switch its backlight off, when
+nobody has touched the handheld for a while; light it again on any input.
+
+  active --DIM_AFTER s--> dim (DIM_LEVEL) --BLANK_AFTER s--> blank (0)
+     ^______________________ any input ___________________________|
+
+Every input thread (GPIO buttons, Joy-Con, touchscreen, gamepad) calls
+activity(). While the screen is on that only stores a timestamp; the timer
+thread sleeps until the next deadline instead of polling, so it wakes twice
+per idle period and never while the panel is blank. A wake is done by the
+thread that saw the input, before activity() returns: the saved brightness
+is written straight back, well inside one frame. Loops that only tick for
+the user's benefit (touch long-press, GPIO and router hotkey ticks) check
+awake and block on their input instead while the screen sleeps. A wake
+can come from another device than the one such a loop waits on, so
+on_wake is called after every wake for the loop to resume ticking.
+
+Writes go through whatever set_level the daemon uses. SysfsBacklight keeps
+the brightness file open so a write is a syscall, not a sudo process; that
+needs the file writable by the service user, e.g. a udev rule:
+
+  SUBSYSTEM=="backlight", RUN+="/bin/chgrp video /sys%p/brightness",
+                          RUN+="/bin/chmod g+w /sys%p/brightness"
+"""
+import os
+import threading
+import time
+
+DIM_AFTER = 60.0      # s without input before dimming
+BLANK_AFTER = 180.0   # s without input before the backlight goes off
+DIM_LEVEL = 12        # 0-255
+
+ACTIVE, DIM, BLANK = "active", "dim", "blank"
+
+
+class SysfsBacklight:
+    """A backlight brightness file held open for writing."""
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+        self.writes = 0
+
+    def open(self):
+        self.fd = os.open(self.path, os.O_WRONLY)
+        return self
+
+    def write(self, value):
+        os.ftruncate(self.fd, 0)   # a no-op on sysfs; keeps plain files (fake_hw) clean
+        os.pwrite(self.fd, b"%d\n" % value, 0)
+        self.writes += 1
+
+    def close(self):
+        os.close(self.fd)
+
+
+class IdleManager:
+    def __init__(self, get_level, set_level, dim_after=DIM_AFTER, blank_after=BLANK_AFTER,
+                 dim_level=DIM_LEVEL, clock=time.monotonic, on_wake=None):
+        self.get_level = get_level
+        self.set_level = set_level
+        self.on_wake = on_wake      # e.g. sets the Event a sleeping tick loop waits on
+        self.dim_after = dim_after
+        self.blank_after = blank_after
+        self.dim_level = dim_level
+        self.clock = clock
+        self.state = ACTIVE
+        self.saved = None           # brightness to restore on wake
+        self.last_input = clock()
+        self.awake = threading.Event()
+        self.awake.set()
+        self.wakeups = 0            # timer thread wakeups
+        self.wakes = 0
+        self._changed = threading.Event()
+        self._lock = threading.Lock()
+
+    # ── input side (any thread) ────────────────────────────────────────────
+    def activity(self):
+        self.last_input = self.clock()
+        if self.state is not ACTIVE:
+            self.wake()
+
+    # ── the user's brightness (what the panel shows once awake) ───────────
+    def level(self):
+        """The brightness to come back to: the saved one while asleep."""
+        with self._lock:
+            return self.saved if self.state is not ACTIVE else self.get_level()
+
+    def set(self, value):
+        """Set the user's brightness; while asleep only the wake target changes."""
+        with self._lock:
+            if self.state is not ACTIVE:
+                self.saved = value
+                return value
+            return self.set_level(value)
+
+    def wake(self):
+        with self._lock:
+            if self.state is ACTIVE:
+                return
+            self.set_level(self.saved)
+            self.state, self.saved = ACTIVE, None
+            self.wakes += 1
+        self.awake.set()
+        self._changed.set()  # the timer restarts from this input
+        if self.on_wake:
+            self.on_wake()
+
+    # ── timer ──────────────────────────────────────────────────────────────
+    def advance(self, now=None):
+        """Dim or blank if due; returns the next deadline (None = blanked)."""
+        now = self.clock() if now is None else now
+        self.wakeups += 1
+        with self._lock:
+            seen = self.last_input
+            idle_for = now - seen
+            if self.state is ACTIVE and idle_for >= self.dim_after:
+                self.saved = self.get_level()
+                if self.saved > self.dim_level:
+                    self.set_level(self.dim_level)
+                self.state = DIM
+                self.awake.clear()
+            if self.state is DIM and idle_for >= self.blank_after:
+                self.set_level(0)
+                self.state = BLANK
+            state = self.state
+        if state is not ACTIVE and self.last_input != seen:
+            self.wake()  # input arrived while we were dimming
+            return self.last_input + self.dim_after
+        if state is ACTIVE:
+            return seen + self.dim_after
+        return seen + self.blank_after if state is DIM else None
+
+    def run(self):
+        """Sleep until the next dim/blank deadline or a wake, forever."""
+        while True:
+            self._changed.clear()
+            deadline = self.advance()
+            timeout = None if deadline is None else max(0.0, deadline - self.clock())
+            self._changed.wait(timeout)
@@ -0,0 +1,249 @@
+"""
+Merge the Joy-Cons and the ItsyBitsy HID gamepad into one virtual gamepad.
+
+The router grabs each physical evdev device, remaps its events through a
+precomputed table (source code -> virtual code, plus a lookup table for
+8-bit axes) and writes them to a single uinput device. Translated events
+are buffered until SYN_REPORT and then written with one os.write(), so a
+whole report costs one syscall. Events that complete a hotkey chord are
+handed to the HotkeyEngine and dropped from the stream, so RetroArch never
+sees them.
+
+Codes are the numeric values from linux/input-event-codes.h so the tables
+can be built (and benchmarked) without python-evdev installed.
+"""
+import collections
+import os
+import select
+import struct
+import threading
+
+from hotkeys import feed_evdev, is_hat
+
+EV_SYN, EV_KEY, EV_ABS = 0x00, 0x01, 0x03
+SYN_REPORT = 0
+
+BTN_SOUTH, BTN_EAST, BTN_C, BTN_NORTH, BTN_WEST, BTN_Z = 0x130, 0x131, 0x132, 0x133, 0x134, 0x135
+BTN_TL, BTN_TR, BTN_TL2, BTN_TR2 = 0x136, 0x137, 0x138, 0x139
+BTN_SELECT, BTN_START, BTN_MODE, BTN_THUMBL, BTN_THUMBR = 0x13A, 0x13B, 0x13C, 0x13D, 0x13E
+BTN_DPAD_UP, BTN_DPAD_DOWN, BTN_DPAD_LEFT, BTN_DPAD_RIGHT = 0x220, 0x221, 0x222, 0x223
+
+ABS_X, ABS_Y, ABS_Z, ABS_RX, ABS_RY, ABS_RZ = 0x00, 0x01, 0x02, 0x03, 0x04, 0x05
+ABS_HAT0X, ABS_HAT0Y = 0x10, 0x11
+
+STICK_MAX = 32767
+TRIGGER_MAX = 255
+
+JOYCON_COMBINED = "Combined Joy-Cons"  # "Nintendo Switch Combined Joy-Cons" (joycond)
+ADAFRUIT_VENDOR = 0x239A               # ItsyBitsy M0 Express pad
+
+VIRTUAL_NAME = "Pi Switch Gamepad"
+VIRTUAL_VENDOR, VIRTUAL_PRODUCT = 0x1209, 0x5357
+
+# struct input_event; the kernel stamps uinput events itself, so time is 0
+INPUT_EVENT = struct.Struct("llHHi")
+
+# A d-pad button as the hat event it becomes, for the hotkey engine
+_HatEvent = collections.namedtuple("_HatEvent", "type code value")
+
+
+def _key(etype, code):
+    return (etype << 16) | code
+
+
+# ─── REMAP TABLES ──────────────────────────────────────────────────────────────
+# Each entry: packed (type, code) -> (out_type, out_code, lut)
+# lut is None to pass the value through, or a list indexed by the raw value.
+def _stick_lut():
+    # 0..255 centred on 128 -> -32767..32767
+    return [max(-STICK_MAX, min(STICK_MAX, (v - 128) * STICK_MAX // 127)) for v in range(256)]
+
+
+def itsybitsy_table():
+    """ItsyBitsy gamepad as enumerated by hid-input from boot.py's descriptor.
+
+    hid-input maps gamepad buttons 1-16 to 0x130.., and main.py orders them
+    alphabetically by name: A, B, L3, LB, R3, RB, Select, Start, X, Y.
+    """
+    order = (BTN_SOUTH, BTN_EAST, BTN_THUMBL, BTN_TL, BTN_THUMBR, BTN_TR,
+             BTN_SELECT, BTN_START, BTN_WEST, BTN_NORTH)
+    table = {_key(EV_KEY, 0x130 + i): (EV_KEY, out, None) for i, out in enumerate(order)}
+    stick = _stick_lut()
+    for code in (ABS_X, ABS_Y, ABS_RX, ABS_RY):
+        table[_key(EV_ABS, code)] = (EV_ABS, code, stick)
+    table[_key(EV_ABS, ABS_Z)] = (EV_ABS, ABS_Z, None)    # LT, already 0..255
+    table[_key(EV_ABS, ABS_RZ)] = (EV_ABS, ABS_RZ, None)  # RT
+    table[_key(EV_ABS, ABS_HAT0X)] = (EV_ABS, ABS_HAT0X, None)
+    table[_key(EV_ABS, ABS_HAT0Y)] = (EV_ABS, ABS_HAT0Y, None)
+    return table
+
+
+def joycon_table():
+    """Combined Joy-Con pair from hid-nintendo / joycond."""
+    table = {_key(EV_KEY, code): (EV_KEY, code, None) for code in (
+        BTN_SOUTH, BTN_EAST, BTN_NORTH, BTN_WEST, BTN_TL, BTN_TR, BTN_TL2, BTN_TR2,
+        BTN_SELECT, BTN_START, BTN_MODE, BTN_THUMBL, BTN_THUMBR)}
+    for code in (ABS_X, ABS_Y, ABS_RX, ABS_RY):
+        table[_key(EV_ABS, code)] = (EV_ABS, code, None)  # already +-32767
+    # D-pad buttons become the hat: value 1/0 -> -1/0 or +1/0 (repeats, 2,
+    # never get here: handle() drops them)
+    table[_key(EV_KEY, BTN_DPAD_UP)] = (EV_ABS, ABS_HAT0Y, [0, -1])
+    table[_key(EV_KEY, BTN_DPAD_DOWN)] = (EV_ABS, ABS_HAT0Y, [0, 1])
+    table[_key(EV_KEY, BTN_DPAD_LEFT)] = (EV_ABS, ABS_HAT0X, [0, -1])
+    table[_key(EV_KEY, BTN_DPAD_RIGHT)] = (EV_ABS, ABS_HAT0X, [0, 1])
+    table[_key(EV_ABS, ABS_HAT0X)] = (EV_ABS, ABS_HAT0X, None)
+    table[_key(EV_ABS, ABS_HAT0Y)] = (EV_ABS, ABS_HAT0Y, None)
+    return table
+
+
+def virtual_capabilities():
+    """Capabilities for evdev.UInput, as {type: [codes or (code, AbsInfo args)]}."""
+    keys = [BTN_SOUTH, BTN_EAST, BTN_NORTH, BTN_WEST, BTN_TL, BTN_TR, BTN_TL2, BTN_TR2,
+            BTN_SELECT, BTN_START, BTN_MODE, BTN_THUMBL, BTN_THUMBR]
+    # AbsInfo fields: value, min, max, fuzz, flat, resolution
+    stick = (0, -STICK_MAX, STICK_MAX, 16, 128, 0)
+    trigger = (0, 0, TRIGGER_MAX, 0, 0, 0)
+    hat = (0, -1, 1, 0, 0, 0)
+    absaxes = [(ABS_X, stick), (ABS_Y, stick), (ABS_RX, stick), (ABS_RY, stick),
+               (ABS_Z, trigger), (ABS_RZ, trigger), (ABS_HAT0X, hat), (ABS_HAT0Y, hat)]
+    return {EV_KEY: keys, EV_ABS: absaxes}
+
+
+def create_virtual_gamepad():
+    """Open the uinput device; returns the evdev.UInput (write to its .fd)."""
+    from evdev import AbsInfo, UInput
+    caps = virtual_capabilities()
+    caps[EV_ABS] = [(code, AbsInfo(*info)) for code, info in caps[EV_ABS]]
+    return UInput(caps, name=VIRTUAL_NAME, vendor=VIRTUAL_VENDOR, product=VIRTUAL_PRODUCT)
+
+
+# ─── ROUTER ────────────────────────────────────────────────────────────────────
+class _Source:
+    __slots__ = ("dev", "name", "table", "pending", "swallowed")
+
+    def __init__(self, dev, name, table):
+        self.dev = dev
+        self.name = name
+        self.table = table
+        self.pending = []       # packed events waiting for SYN_REPORT
+        self.swallowed = set()  # packed codes whose release must be dropped too
+
+
+class InputRouter:
+    def __init__(self, sink_fd, hotkeys=None, hotkey_lock=None, on_input=None):
+        self.sink_fd = sink_fd
+        self.hotkeys = hotkeys
+        self.hotkey_lock = hotkey_lock or threading.Lock()
+        self.on_input = on_input  # called before each chunk is handled (idle wake)
+        self.sources = {}  # fd -> _Source
+        self.events_in = 0
+        self.batches_out = 0
+
+    def add_source(self, dev, name, table, grab=True):
+        if grab:
+            dev.grab()  # RetroArch only sees the virtual pad from now on
+        self.sources[dev.fd] = _Source(dev, name, table)
+
+    def handle(self, src, events):
+        """Translate a chunk of events from one source; flush on SYN_REPORT."""
+        table, pending, pack = src.table, src.pending, INPUT_EVENT.pack
+        hotkeys = self.hotkeys
+        for e in events:
+            self.events_in += 1
+            etype, code, value = e.type, e.code, e.value
+            if etype == EV_KEY and value == 2:
+                continue  # autorepeat; a gamepad has no use for it
+            if etype == EV_SYN:
+                if code == SYN_REPORT and pending:
+                    pending.append(pack(0, 0, EV_SYN, SYN_REPORT, 0))
+                    os.write(self.sink_fd, b"".join(pending))
+                    pending.clear()
+                    self.batches_out += 1
+                continue
+            entry = table.get((etype << 16) | code)
+            if hotkeys is not None and (etype == EV_KEY or is_hat(e, EV_ABS)):
+                # Hotkeys see what RetroArch would: the Joy-Con d-pad as ABS_HAT0*
+                if etype == EV_KEY and entry is not None and entry[0] == EV_ABS:
+                    e = _HatEvent(EV_ABS, entry[1], entry[2][value])
+                if self._hotkey(src, e):
+                    continue
+            if entry is None:
+                continue
+            out_type, out_code, lut = entry
+            pending.append(pack(0, 0, out_type, out_code, value if lut is None else lut[value]))
+
+    def _hotkey(self, src, e):
+        """Feed a key/hat event to the hotkey engine; True if it should be dropped."""
+        ident = (e.type << 16) | e.code
+        with self.hotkey_lock:
+            consumed = feed_evdev(self.hotkeys, src.name, e, EV_KEY, EV_ABS)
+        if consumed:
+            src.swallowed.add(ident)
+            return True
+        if e.value == 0 and ident in src.swallowed:
+            src.swallowed.discard(ident)  # release of a chord key we kept back
+            return True
+        return False
+
+    def close(self):
+        """Release and close every source (before a rescan after a disconnect)."""
+        for src in self.sources.values():
+            try:
+                src.dev.ungrab()
+            except OSError:
+                pass  # already gone
+            src.dev.close()
+        self.sources.clear()
+
+    def paths(self):
+        return {src.dev.path for src in self.sources.values()}
+
+    def run(self, timeout=None, until=None):
+        """Read every source in bulk as it becomes readable, until until()
+        (asked after every poll) is true, or forever without it.
+
+        timeout (ms) may be a callable, asked before every poll; returning
+        None blocks until input (no hotkey ticks while the display sleeps).
+        A source going away (OSError other than EAGAIN) is raised to the caller.
+        """
+        poller = select.poll()
+        for fd in self.sources:
+            poller.register(fd, select.POLLIN)
+        while until is None or not until():
+            ready = poller.poll(timeout() if callable(timeout) else timeout)
+            if ready and self.on_input:
+                self.on_input()
+            for fd, _ in ready:
+                src = self.sources[fd]
+                try:
+                    self.handle(src, src.dev.read())
+                except BlockingIOError:
+                    pass
+            if self.hotkeys is not None:
+                with self.hotkey_lock:
+                    self.hotkeys.tick()
+
+
+def is_combined_joycon(name):
+    """The merged pair only: hid-nintendo's single Joy-Cons and their IMU
+    devices (whose ABS_X/Y/RX/RY are accelerometer/gyro data) are left alone."""
+    return (JOYCON_COMBINED in name or "joycond" in name) and "IMU" not in name
+
+
+def find_sources(list_devices, InputDevice, skip=()):
+    """Locate the Joy-Con pair and the ItsyBitsy pad; returns [(dev, name, table)].
+
+    Paths in skip (already routed) aren't opened; other devices are closed again.
+    """
+    found = []
+    for path in list_devices():
+        if path in skip:
+            continue
+        dev = InputDevice(path)
+        if is_combined_joycon(dev.name):
+            found.append((dev, "joycon", joycon_table()))
+        elif dev.info.vendor == ADAFRUIT_VENDOR:
+            found.append((dev, "gamepad", itsybitsy_table()))
+        else:
+            dev.close()
+    return found
@@ -0,0 +1,185 @@
+"""
+Status LEDs on the Pi's two hardware PWM channels.
+
+Every pattern is a precomputed table of keyframes (how long to hold, then
+the PWM period/duty for each LED). Blinks are done by the PWM itself with
+a period of a second or so, so a blinking LED costs nothing; Python only
+wakes up when a pattern moves to its next keyframe or a status changes.
+
+  mute           red, slow blink
+  headphones     green, dim solid
+  charging       green, breathing (8 keyframes per breath)
+  low battery    red, fast blink
+  profile        three quick green flashes, then back to the status
+
+Statuses are shown by priority; "profile" is a one-shot flash on top.
+Needs the PWM channels routed to GPIO12 (pwm0, green) and GPIO13 (pwm1, red):
+
+  dtoverlay=pwm-2chan,pin=12,func=4,pin2=13,func2=4
+
+pwm-2chan's default pins, GPIO18/19, are the I2S clock and frame sync the
+PCM5102A DAC (dtoverlay=hifiberry-dac) runs on, so they must not be used.
+The PWM block itself is free as long as the Pi's analog audio stays off
+(#dtparam=audio=on), which the DAC setup already requires.
+"""
+import os
+import threading
+import time
+
+PWM_ROOT = "/sys/class/pwm"
+LEDS = ("green", "red")
+
+FAST = 1_000_000   # 1 kHz carrier for steady brightness, ns
+
+
+def _steady(brightness):
+    return (FAST, int(FAST * brightness))
+
+
+def _blink(hz, on_fraction, brightness=1.0):
+    period = int(1e9 / hz)
+    return (period, int(period * on_fraction * brightness))
+
+
+OFF = (FAST, 0)
+
+
+def _frames(*frames):
+    """[(hold_s, {led: (period, duty)})] -> ((hold_s, ((period, duty) per LED)), ...)"""
+    return tuple((hold, tuple(leds.get(name, OFF) for name in LEDS)) for hold, leds in frames)
+
+
+def _breathe(led, steps=4, seconds=2.0, peak=0.6):
+    levels = [peak * (i + 1) / steps for i in range(steps)]
+    ramp = levels + levels[::-1]
+    return _frames(*[(seconds / len(ramp), {led: _steady(b * b)}) for b in ramp])  # b^2 ~ perceived
+
+
+# name -> (repeat, keyframes); hold None means "until something changes"
+PATTERNS = {
+    "off":        (False, _frames((None, {}))),
+    "mute":       (False, _frames((None, {"red": _blink(1, 0.1)}))),
+    "headphones": (False, _frames((None, {"green": _steady(0.05)}))),
+    "charging":   (True,  _breathe("green")),
+    "low":        (False, _frames((None, {"red": _blink(2, 0.5)}))),
+    "profile":    (False, _frames((0.375, {"green": _blink(8, 0.5)}))),
+}
+PRIORITY = ("low", "mute", "headphones", "charging")  # highest first
+
+
+class SysfsPwm:
+    def __init__(self, chip, channel, root=PWM_ROOT):
+        self.chip_path = os.path.join(root, f"pwmchip{chip}")
+        self.channel = channel
+        self.path = os.path.join(self.chip_path, f"pwm{channel}")
+        self.period = self.duty = None
+        self.writes = 0
+
+    def _write(self, name, value):
+        with open(os.path.join(self.path, name), "w") as f:
+            f.write(str(value))
+        self.writes += 1
+
+    def open(self):
+        if not os.path.isdir(self.path):
+            with open(os.path.join(self.chip_path, "export"), "w") as f:
+                f.write(str(self.channel))
+        self._write("period", FAST)
+        self._write("duty_cycle", 0)
+        self._write("enable", 1)
+        self.period, self.duty = FAST, 0
+        return self
+
+    def set(self, period, duty):
+        if (period, duty) == (self.period, self.duty):
+            return
+        # The kernel rejects duty > period at every step, so order the writes
+        if period < self.period:
+            self._write("duty_cycle", min(duty, self.duty))
+            self._write("period", period)
+            if duty != min(duty, self.duty):
+                self._write("duty_cycle", duty)
+        else:
+            if period != self.period:
+                self._write("period", period)
+            if duty != self.duty:
+                self._write("duty_cycle", duty)
+        self.period, self.duty = period, duty
+
+
+class LedStatus:
+    def __init__(self, channels, patterns=PATTERNS, priority=PRIORITY, clock=time.monotonic):
+        self.channels = channels    # one SysfsPwm per name in LEDS
+        self.patterns = patterns
+        self.priority = priority
+        self.clock = clock
+        self.active = set()
+        self.flash_name = None
+        self.pattern = None
+        self.frame = 0
+        self.deadline = None
+        self.wakeups = 0
+        self._changed = threading.Event()
+        self._lock = threading.Lock()
+
+    # ── status inputs (any thread) ─────────────────────────────────────────
+    def set(self, status, on=True):
+        with self._lock:
+            if (status in self.active) == bool(on):
+                return
+            (self.active.add if on else self.active.discard)(status)
+        self._changed.set()
+
+    def flash(self, name="profile"):
+        with self._lock:
+            self.flash_name = name
+            self.pattern = None  # restart even if it is already showing
+        self._changed.set()
+
+    # ── rendering ──────────────────────────────────────────────────────────
+    def wanted(self):
+        if self.flash_name:
+            return self.flash_name
+        for name in self.priority:
+            if name in self.active:
+                return name
+        return "off"
+
+    def advance(self, now=None):
+        """Apply whatever is due; returns the next deadline (None = idle)."""
+        now = self.clock() if now is None else now
+        self.wakeups += 1
+        with self._lock:
+            name = self.wanted()
+            if name != self.pattern:
+                self.pattern, self.frame = name, 0
+                self._show(now)
+            while self.deadline is not None and now >= self.deadline:
+                repeat, frames = self.patterns[self.pattern]
+                if self.frame + 1 < len(frames):
+                    self.frame += 1
+                elif repeat:
+                    self.frame = 0
+                else:
+                    # one-shot done: drop back to the current status
+                    self.flash_name = None
+                    self.pattern, self.frame = self.wanted(), 0
+                self._show(self.deadline)
+            return self.deadline
+
+    def _show(self, start):
+        hold, levels = self.patterns[self.pattern][1][self.frame]
+        for pwm, (period, duty) in zip(self.channels, levels):
+            pwm.set(period, duty)
+        self.deadline = None if hold is None else start + hold
+
+    def writes(self):
+        return sum(pwm.writes for pwm in self.channels)
+
+    def run(self):
+        """Sleep until the next keyframe or a status change, forever."""
+        while True:
+            deadline = self.advance()
+            timeout = None if deadline is None else max(0.0, deadline - self.clock())
+            self._changed.wait(timeout)
+            self._changed.clear()
@@ -0,0 +1,210 @@
+"""
+Counters, gauges and latency histograms for the control daemons.
+
+Hot paths update metrics without taking a lock: every thread gets its own
+cell (a plain list) the first time it touches a metric, so increments never
+contend, and the exporter sums the cells when it renders. Gauges are a
+single attribute store.
+
+Exported in Prometheus text format, periodically to a node-exporter
+textfile-collector file and on demand from a localhost HTTP endpoint:
+
+  curl -s http://127.0.0.1:9105/metrics     # volume_backlight_control.py
+  curl -s http://127.0.0.1:9106/metrics     # volumecombo.py
+
+Each daemon has its own port and textfile. If the port is taken anyway,
+the exporter logs it and carries on with the textfile alone.
+"""
+import bisect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TEXTFILE_DIR = "/var/lib/node_exporter/textfile_collector"
+TEXTFILE_PATH = os.path.join(TEXTFILE_DIR, "piswitch.prom")
+EXPORT_INTERVAL = 15.0
+HTTP_ADDR = ("127.0.0.1", 9105)
+
+# Default latency buckets, seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+REGISTRY = {}
+
+
+class _PerThread:
+    """A fixed-width list of numbers per thread, summed on read."""
+    def __init__(self, width):
+        self._width = width
+        self._local = threading.local()
+        self._cells = []
+
+    def cell(self):
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = self._local.cell = [0] * self._width
+            self._cells.append(cell)  # list.append is atomic
+            return cell
+
+    def totals(self):
+        out = [0] * self._width
+        for cell in list(self._cells):
+            for i, v in enumerate(cell):
+                out[i] += v
+        return out
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._cells = _PerThread(1)
+
+    def inc(self, n=1):
+        self._cells.cell()[0] += n
+
+    def value(self):
+        return self._cells.totals()[0]
+
+    def render(self):
+        return [f"{self.name} {self.value()}"]
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.current = 0
+
+    def set(self, v):
+        self.current = v
+
+    def value(self):
+        return self.current
+
+    def render(self):
+        return [f"{self.name} {self.current}"]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.bounds = tuple(buckets)
+        # one slot per bucket, +Inf, then the running sum
+        self._cells = _PerThread(len(self.bounds) + 2)
+
+    def observe(self, v):
+        cell = self._cells.cell()
+        cell[bisect.bisect_left(self.bounds, v)] += 1
+        cell[-1] += v
+
+    def time(self):
+        """Context manager: with hist.time(): ..."""
+        return _Timer(self)
+
+    def render(self):
+        totals = self._cells.totals()
+        lines, running = [], 0
+        for bound, n in zip(self.bounds + (float("inf"),), totals[:-1]):
+            running += n
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{self.name}_bucket{{le="{le}"}} {running}')
+        lines.append(f"{self.name}_sum {totals[-1]:.6f}")
+        lines.append(f"{self.name}_count {running}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("hist", "t0")
+
+    def __init__(self, hist):
+        self.hist = hist
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.t0)
+        return False
+
+
+def _get(cls, name, help, *args):
+    metric = REGISTRY.get(name)
+    if metric is None:
+        metric = REGISTRY[name] = cls(name, help, *args)
+    return metric
+
+
+def counter(name, help=""):
+    return _get(Counter, name, help)
+
+
+def gauge(name, help=""):
+    return _get(Gauge, name, help)
+
+
+def histogram(name, help="", buckets=LATENCY_BUCKETS):
+    return _get(Histogram, name, help, buckets)
+
+
+# ─── EXPORT ────────────────────────────────────────────────────────────────────
+def render():
+    lines = []
+    for metric in REGISTRY.values():
+        if metric.help:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path=TEXTFILE_PATH):
+    # Write then rename so node-exporter never reads a half-written file
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(render())
+    os.replace(tmp, path)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # keep requests out of syslog
+
+
+def start_exporter(path=TEXTFILE_PATH, interval=EXPORT_INTERVAL, http_addr=HTTP_ADDR):
+    """Start the textfile writer and the HTTP endpoint on daemon threads."""
+    def textfile_loop():
+        while True:
+            try:
+                write_textfile(path)
+            except OSError as e:
+                print(f"Metrics textfile error: {e}")
+                return  # no collector dir on this system; HTTP still works
+            time.sleep(interval)
+
+    if path:
+        threading.Thread(target=textfile_loop, daemon=True).start()
+    if http_addr:
+        try:
+            server = ThreadingHTTPServer(http_addr, _Handler)
+        except OSError as e:  # EADDRINUSE: another daemon (or instance) has it
+            print(f"Metrics HTTP on {http_addr[0]}:{http_addr[1]} unavailable ({e}); textfile only")
+            return None
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
@@ -0,0 +1,115 @@
+"""
+In-memory ALSA mixer state, kept current by control-change events.
+
+MixerWatcher reads the mixer once at startup, then only when ALSA says the
+control changed (its poll descriptors become readable), so consumers such
+as the OSD read MixerWatcher.state instead of forking amixer, and changes
+made by RetroArch or EmulationStation show up after a single event.
+
+Writes the daemon makes itself are announced with expect(percent); the
+event they cause updates the state without calling on_change, so the OSD
+isn't redrawn twice for one press. Several writes can be in flight at
+once (a held button), and ALSA may report any of them or only the last,
+so every pending value is kept until a read reaches it. A write that
+doesn't change the value may cause no event at all, so pending values
+also expire after PENDING_TTL, and a read that finds the mixer already at
+a pending value retires it.
+"""
+import collections
+import select
+import threading
+import time
+
+ROUNDING = 1          # percent; amixer's value and the mixer's readback can differ by this
+MAX_PENDING = 8       # own writes remembered while their events are outstanding
+PENDING_TTL = 0.5     # s; an own write's event arrives within milliseconds
+
+
+class MixerState:
+    __slots__ = ("percent", "muted", "updated")
+
+    def __init__(self):
+        self.percent = None
+        self.muted = False
+        self.updated = None
+
+
+class AlsaMixerSource:
+    """pyalsaaudio-backed source: poll descriptors + ioctl reads, no forks."""
+    def __init__(self, control="Master", cardindex=0):
+        import alsaaudio  # pip3 install pyalsaaudio
+        self.mixer = alsaaudio.Mixer(control, cardindex=cardindex)
+        self._error = alsaaudio.ALSAAudioError
+
+    def fds(self):
+        return [fd for fd, _ in self.mixer.polldescriptors()]
+
+    def read(self):
+        self.mixer.handleevents()  # acknowledge the events so poll blocks again
+        percent = self.mixer.getvolume()[0]
+        try:
+            muted = bool(self.mixer.getmute()[0])
+        except self._error:
+            muted = False  # control has no playback switch
+        return percent, muted
+
+
+class MixerWatcher:
+    def __init__(self, source, on_change=None, clock=time.monotonic):
+        self.source = source
+        self.on_change = on_change
+        self.clock = clock
+        self.state = MixerState()
+        self._pending = collections.deque(maxlen=MAX_PENDING)   # (percent, expires), oldest first
+        self._lock = threading.Lock()
+        self.reads = 0
+        self.external = 0
+
+    def expect(self, percent):
+        """Our own write of percent is in flight; don't report it as external."""
+        with self._lock:
+            if not self._pending and percent == self.state.percent:
+                return  # already there: ALSA won't send an event for it
+            self._pending.append((percent, self.clock() + PENDING_TTL))
+
+    def _own(self, percent):
+        """True if percent is one of our pending writes; forgets it and the
+        ones before it (ALSA reports the latest value, never an older one)."""
+        now = self.clock()
+        with self._lock:
+            while self._pending and self._pending[0][1] <= now:
+                self._pending.popleft()  # its event never came: the write was a no-op
+            for i, (p, _) in enumerate(self._pending):
+                if abs(percent - p) <= ROUNDING:
+                    for _ in range(i + 1):
+                        self._pending.popleft()
+                    return True
+        return False
+
+    def sync(self):
+        """Read the mixer once; returns True if the state changed externally."""
+        percent, muted = self.source.read()
+        self.reads += 1
+        s = self.state
+        if percent == s.percent and muted == s.muted:
+            self._own(percent)  # a write of the value already there
+            return False
+        # The first read is the baseline, not a change
+        own = s.updated is None or (muted == s.muted and self._own(percent))
+        s.percent, s.muted, s.updated = percent, muted, self.clock()
+        if own:
+            return False
+        self.external += 1
+        if self.on_change:
+            self.on_change(s)
+        return True
+
+    def run(self, timeout=None):
+        """Block forever, syncing whenever ALSA signals a control change."""
+        poller = select.poll()
+        for fd in self.source.fds():
+            poller.register(fd, select.POLLIN)
+        self.sync()
+        while True:
+            if poller.poll(timeout):
+                self.sync()
@@ -0,0 +1,102 @@
+"""
+Power profiles for the control daemon: how hard it polls, redraws and
+drives the hardware depending on whether the handheld is plugged in.
+
+  performance  plugged in: fast polling, smooth OSD, full backlight
+  balanced     on battery: the old 50 ms polling, capped OSD
+  saver        low battery: slow polling, short OSD, dim ceiling, 4:1 AGC
+
+PowerProfileManager picks a profile from a power source (anything with
+read() -> (plugged, percent)) and tells its listeners when it changes.
+A manual override (the "profile" hotkey) wins until cycled back to auto.
+An overlay (per-emulator settings, see emulator_profiles.py) replaces
+individual fields of whichever profile is in effect.
+"""
+from collections import namedtuple
+
+PowerProfile = namedtuple("PowerProfile", [
+    "name",
+    "poll_interval",    # s between GPIO button polls
+    "osd_fps",          # OSD redraw cap; 0 disables the OSD
+    "osd_autohide",     # s the OSD stays up after the last change
+    "backlight_max",    # 0-255 ceiling
+    "amp_compression",  # TPA2016 compression ratio bits (0 = 1:1, 2 = 4:1)
+])
+
+PROFILES = {
+    "performance": PowerProfile("performance", 0.02, 30, 3.0, 255, 0),
+    "balanced":    PowerProfile("balanced",    0.05, 15, 2.0, 200, 0),
+    "saver":       PowerProfile("saver",       0.10,  5, 1.0, 120, 2),
+}
+PROFILE_ORDER = ("performance", "balanced", "saver")
+
+SAVER_PERCENT = 30   # on battery at or below this -> saver
+
+
+class BatteryPowerSource:
+    """Power source backed by battery.BatteryService's cached state."""
+    def __init__(self, battery):
+        self.battery = battery
+
+    def read(self):
+        s = self.battery.state
+        return s.plugged, s.percent
+
+
+class PowerProfileManager:
+    def __init__(self, source, profiles=PROFILES, default="balanced"):
+        self.source = source
+        self.profiles = profiles
+        self.current = profiles[default]
+        self.override = None
+        self.overlay = {}
+        self.listeners = []
+        self.switches = 0
+
+    def add_listener(self, fn):
+        """fn(profile) is called whenever the effective profile changes (and
+        once now); an overlay that leaves every field as it was is no change."""
+        self.listeners.append(fn)
+        fn(self.current)
+
+    def choose(self, plugged, percent):
+        if plugged:
+            return "performance"
+        if percent is not None and percent <= SAVER_PERCENT:
+            return "saver"
+        return "balanced"
+
+    def refresh(self, *_):
+        """Re-evaluate from the power source; usable as an on_change callback."""
+        name = self.override or self.choose(*self.source.read())
+        self._switch(name)
+
+    def set_override(self, name=None):
+        if name is not None and name not in self.profiles:
+            raise ValueError(f"Unknown power profile {name!r}")
+        self.override = name
+        self.refresh()
+
+    def cycle(self, name=None):
+        """Hotkey action: jump to name ("auto" clears the override), or step
+        performance -> balanced -> saver -> auto."""
+        if name is None:
+            steps = PROFILE_ORDER + ("auto",)
+            name = steps[(steps.index(self.override or "auto") + 1) % len(steps)]
+        self.set_override(None if name == "auto" else name)
+
+    def set_overlay(self, overlay=None):
+        """Override PowerProfile fields (e.g. {"osd_fps": 0}); None clears."""
+        self.overlay = dict(overlay or {})
+        self._switch(self.current.name, force=True)
+
+    def _switch(self, name, force=False):
+        if name == self.current.name and not force:
+            return
+        profile = self.profiles[name]._replace(**self.overlay)
+        if profile == self.current:
+            return
+        self.current = profile
+        self.switches += 1
+        for fn in self.listeners:
+            fn(self.current)
@@ -0,0 +1,137 @@
+"""
+Opt-in real-time scheduling for the control daemon's input thread.
+
+With RetroArch keeping all four cores of the Pi 3A+ busy, a normal-priority
+button thread can wait tens of milliseconds to run. make_realtime() moves
+the calling thread to SCHED_FIFO (or, without the privilege, a negative
+nice level), pins it to one core and locks the process's memory so a page
+fault never lands in the middle of a press. Everything slow (amixer, OSD
+rendering) goes to a Worker thread that lowers its own priority and stays
+off the input core.
+
+Each step is best effort: what actually got applied is returned (and
+logged by the caller), and a missing privilege never stops the daemon.
+Needs CAP_SYS_NICE and CAP_IPC_LOCK (or LimitRTPRIO / LimitMEMLOCK) for
+the full effect; see volume_backlight.service.txt.
+"""
+import ctypes
+import ctypes.util
+import os
+import queue
+import sys
+import threading
+
+MCL_CURRENT, MCL_FUTURE = 1, 2
+
+RT_PRIORITY = 40        # SCHED_FIFO 1-99; stays below the kernel's IRQ threads (50)
+RT_NICE = -10           # fallback when SCHED_FIFO is not allowed
+WORKER_NICE = 10
+RT_SWITCH_INTERVAL = 0.001   # s; how long another thread may hold the GIL (default 5 ms)
+
+
+def _tid():
+    # sched_* and setpriority with a thread id affect just that thread on Linux
+    return threading.get_native_id()
+
+
+def _other_cpus(cpu):
+    cpus = os.sched_getaffinity(0)
+    rest = cpus - {cpu}
+    return rest or cpus
+
+
+def mlockall():
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    if libc.mlockall(MCL_CURRENT | MCL_FUTURE) != 0:
+        raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+
+
+def make_realtime(cpu=None, priority=RT_PRIORITY, nice=RT_NICE, lock_memory=True):
+    """Raise the calling thread's priority; returns a list of what applied."""
+    applied = []
+    try:
+        os.sched_setscheduler(_tid(), os.SCHED_FIFO, os.sched_param(priority))
+        applied.append(f"SCHED_FIFO {priority}")
+    except (OSError, AttributeError):
+        try:
+            os.setpriority(os.PRIO_PROCESS, _tid(), nice)
+            applied.append(f"nice {nice}")
+        except OSError:
+            pass
+    if cpu is not None:
+        try:
+            os.sched_setaffinity(_tid(), {cpu})
+            applied.append(f"cpu {cpu}")
+        except (OSError, AttributeError):
+            pass
+    if lock_memory:
+        try:
+            mlockall()
+            applied.append("mlockall")
+        except OSError:
+            pass
+    # A busy OSD or worker thread hands the GIL back sooner
+    sys.setswitchinterval(RT_SWITCH_INTERVAL)
+    return applied
+
+
+def make_background(avoid_cpu=None, nice=WORKER_NICE):
+    """Lower the calling thread's priority and keep it off avoid_cpu."""
+    try:
+        os.setpriority(os.PRIO_PROCESS, _tid(), nice)
+    except OSError:
+        pass
+    if avoid_cpu is not None:
+        try:
+            os.sched_setaffinity(_tid(), _other_cpus(avoid_cpu))
+        except (OSError, AttributeError):
+            pass
+
+
+class Worker:
+    """Low-priority thread for slow calls queued by the input thread.
+
+    submit(key, fn, *args) coalesces by key: if a call with the same key is
+    still waiting, it is replaced, so ten quick volume presses become one
+    amixer run with the last value instead of a backlog.
+    """
+    def __init__(self, avoid_cpu=None, nice=WORKER_NICE, name="worker"):
+        self.avoid_cpu = avoid_cpu
+        self.nice = nice
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._queue = queue.SimpleQueue()
+        self.done = 0
+        self.coalesced = 0
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def submit(self, key, fn, *args):
+        with self._lock:
+            if key in self._pending:
+                self.coalesced += 1
+                self._pending[key] = (fn, args)
+                return
+            self._pending[key] = (fn, args)
+        self._queue.put(key)
+
+    def _run(self):
+        make_background(self.avoid_cpu, self.nice)
+        while True:
+            key = self._queue.get()
+            if key is None:
+                return
+            with self._lock:
+                fn, args = self._pending.pop(key)
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"Worker {key}: {e}")
+            self.done += 1
+
+    def stop(self):
+        self._queue.put(None)
+        self.thread.join()
@@ -0,0 +1,6 @@
+#!/bin/sh
+# RetroPie runcommand hook: restore the settings changed at onstart.
+# Install (or append the last line) to /opt/retropie/configs/all/runcommand-onend.sh
+FIFO=${PISWITCH_FIFO:-/run/piswitch/control}
+[ -p "$FIFO" ] && timeout 1 sh -c 'echo end > "$1"' _ "$FIFO"
+exit 0
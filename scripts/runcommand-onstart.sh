@@ -0,0 +1,9 @@
+#!/bin/sh
+# RetroPie runcommand hook: tell volume_backlight_control.py which emulator
+# is starting so it can apply emulator_profiles.json.
+# Install (or append the last line) to /opt/retropie/configs/all/runcommand-onstart.sh
+# runcommand passes: system emulator rom command
+FIFO=${PISWITCH_FIFO:-/run/piswitch/control}
+# The daemon keeps the FIFO open; the timeout only matters if it has died
+[ -p "$FIFO" ] && timeout 1 sh -c 'printf "start %s %s\n" "$1" "$2" > "$3"' _ "$1" "$2" "$FIFO"
+exit 0
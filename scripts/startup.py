@@ -0,0 +1,46 @@
+"""
+Startup profiling for the control daemon.
+
+StartupProfiler times each heavy import (imp) and named milestones (mark)
+relative to when it was created, which should be as early in the script as
+possible. report() prints both, so the journal shows how long the service
+took to get its buttons working and where that time went.
+"""
+import importlib
+import threading
+import time
+
+
+class StartupProfiler:
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.t0 = clock()
+        self.imports = []   # (module, seconds, thread name)
+        self.marks = []     # (label, seconds since t0)
+        self._lock = threading.Lock()
+
+    def imp(self, name):
+        """importlib.import_module(name), timed."""
+        t = self.clock()
+        module = importlib.import_module(name)
+        with self._lock:
+            self.imports.append((name, self.clock() - t, threading.current_thread().name))
+        return module
+
+    def mark(self, label):
+        elapsed = self.clock() - self.t0
+        with self._lock:
+            self.marks.append((label, elapsed))
+        return elapsed
+
+    def elapsed(self, label):
+        for name, t in self.marks:
+            if name == label:
+                return t
+        return None
+
+    def report(self, out=print):
+        for label, t in self.marks:
+            out(f"startup: {label:<24} {t * 1000:8.1f} ms")
+        for name, t, thread in self.imports:
+            out(f"startup:   import {name:<17} {t * 1000:8.1f} ms ({thread})")
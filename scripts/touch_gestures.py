@@ -0,0 +1,158 @@
+"""
+Gestures on the 7" DSI touchscreen, feeding the same actions as hotkeys.
+
+  swipe up/down along the left edge    backlight +/- (one step per STEP_PX)
+  swipe up/down along the right edge   volume +/-
+  hold one finger on the top edge      mute (LONG_PRESS)
+
+The touchscreen isn't grabbed, so EmulationStation and RetroArch see every
+touch too. Gestures therefore only start in the EDGE_MARGIN strips along
+the sides and top, where those UIs have nothing to tap; a touch anywhere
+else is left to them.
+
+Reads the kernel's multitouch protocol B (ABS_MT_SLOT / TRACKING_ID /
+POSITION_X/Y). Events only update a preallocated per-slot table; gestures
+are evaluated once per SYN_REPORT, so nothing is allocated per event.
+"""
+import threading
+import time
+
+EV_SYN, EV_ABS = 0x00, 0x03
+SYN_REPORT = 0
+ABS_MT_SLOT = 0x2F
+ABS_MT_POSITION_X = 0x35
+ABS_MT_POSITION_Y = 0x36
+ABS_MT_TRACKING_ID = 0x39
+
+MAX_SLOTS = 10        # FT5406 reports up to 10 contacts
+EDGE_MARGIN = 40      # px from the side (swipes) or top (mute hold) a gesture must start
+STEP_PX = 40          # vertical travel per action step
+LONG_PRESS = 0.8      # s
+SLOP = 20             # px a long-press may wander
+
+# (action, arg per step); up is +arg, down is -arg
+GESTURES = {
+    "left":  ("backlight", 16),
+    "right": ("volume", 1),
+    "hold":  ("mute", None),
+}
+
+# Per-slot state
+IDLE, NEW, EDGE_LEFT, EDGE_RIGHT, HOLD, DONE = range(6)
+
+
+class TouchGestures:
+    def __init__(self, actions, width=800, height=480, gestures=GESTURES,
+                 max_slots=MAX_SLOTS, lock=None, clock=time.time):
+        self.actions = actions
+        self.width = width
+        self.height = height
+        self.gestures = gestures
+        self.lock = lock or threading.Lock()
+        self.clock = clock   # evdev timestamps are CLOCK_REALTIME
+        self.max_slots = n = max_slots
+        self.tracking = [-1] * n
+        self.x = [0] * n
+        self.y = [0] * n
+        self.x0 = [0] * n
+        self.y0 = [0] * n
+        self.t0 = [0.0] * n
+        self.anchor = [0] * n   # y where the last swipe step fired
+        self.state = [IDLE] * n
+        self.slot = 0
+        self.fingers = 0
+        self.events = 0
+        self.fired = 0
+
+    def handle(self, events):
+        """Feed a chunk of evdev events; gestures run on each SYN_REPORT."""
+        for e in events:
+            self.events += 1
+            etype, code = e.type, e.code
+            if etype == EV_ABS:
+                if code == ABS_MT_SLOT:
+                    self.slot = e.value
+                    continue
+                s = self.slot
+                if s >= self.max_slots:
+                    continue   # contacts past the table are ignored
+                if code == ABS_MT_POSITION_X:
+                    self.x[s] = e.value
+                elif code == ABS_MT_POSITION_Y:
+                    self.y[s] = e.value
+                elif code == ABS_MT_TRACKING_ID:
+                    if e.value < 0:
+                        if self.tracking[s] >= 0:
+                            self.fingers -= 1
+                        self.state[s] = IDLE
+                    elif self.tracking[s] < 0:
+                        self.fingers += 1
+                        self.state[s] = NEW
+                    self.tracking[s] = e.value
+            elif etype == EV_SYN and code == SYN_REPORT:
+                self.report(e.sec + e.usec * 1e-6)
+
+    def report(self, now):
+        state, fingers = self.state, self.fingers
+        for s in range(self.max_slots):
+            st = state[s]
+            if st == IDLE or st == DONE:
+                continue
+            if st == NEW:
+                x, y = self.x[s], self.y[s]
+                self.x0[s], self.y0[s], self.t0[s], self.anchor[s] = x, y, now, y
+                if x < EDGE_MARGIN:
+                    state[s] = EDGE_LEFT
+                elif x >= self.width - EDGE_MARGIN:
+                    state[s] = EDGE_RIGHT
+                elif y < EDGE_MARGIN:
+                    state[s] = HOLD
+                else:
+                    state[s] = DONE   # mid-screen: belongs to ES/RetroArch
+                continue
+            if st == HOLD:
+                if fingers > 1 or abs(self.x[s] - self.x0[s]) > SLOP or abs(self.y[s] - self.y0[s]) > SLOP:
+                    state[s] = DONE   # moving or multi-finger: not a long-press
+                elif now - self.t0[s] >= LONG_PRESS:
+                    state[s] = DONE
+                    self.fire("hold", 1)
+                continue
+            # Edge swipe: one step per STEP_PX travelled, up is positive
+            side = "left" if st == EDGE_LEFT else "right"
+            travel = self.anchor[s] - self.y[s]
+            while travel >= STEP_PX:
+                self.fire(side, 1)
+                travel -= STEP_PX
+                self.anchor[s] -= STEP_PX
+            while travel <= -STEP_PX:
+                self.fire(side, -1)
+                travel += STEP_PX
+                self.anchor[s] += STEP_PX
+
+    def tick(self, now=None):
+        """Fire long-presses for fingers that have stopped sending events."""
+        if HOLD in self.state:
+            self.report(self.clock() if now is None else now)
+
+    def fire(self, gesture, direction):
+        binding = self.gestures.get(gesture)
+        if binding is None:
+            return
+        self.fired += 1
+        name, arg = binding
+        with self.lock:
+            if arg is None:
+                self.actions[name]()
+            else:
+                self.actions[name](arg * direction)
+
+
+def find_touchscreen(list_devices, InputDevice):
+    """First device reporting multitouch positions; returns (dev, width, height)."""
+    for path in list_devices():
+        dev = InputDevice(path)
+        codes = [c for c, _ in dev.capabilities(absinfo=True).get(EV_ABS, ())]
+        if ABS_MT_POSITION_X in codes and ABS_MT_POSITION_Y in codes:
+            return (dev, dev.absinfo(ABS_MT_POSITION_X).max + 1,
+                    dev.absinfo(ABS_MT_POSITION_Y).max + 1)
+    raise RuntimeError("Touchscreen not found")
@@ -5,43 +5,119 @@ Raspberry Pi 3A+ script for Retropie:
 - Toggle amp shutdown (mute) when both are pressed
 - Headphone jack detection mutes amp
 - OSD volume/mute/headphone status (blocky bar + pixel font)
+- ALSA mixer changes made elsewhere (RetroArch, EmulationStation) are
+  picked up from mixer events and shown on the OSD
 - Backlight adjust via Combined Joy-Con (Home + d-pad up/down)
+- Touchscreen: edge swipes for backlight (left) / volume (right), hold the
+  top edge to mute; mid-screen touches are left to ES/RetroArch
+- Button chords/long-presses/double-taps are configured in hotkeys.json
+- PiSugar battery telemetry, low-battery warning on the OSD
+- Power profiles (performance/balanced/saver) follow the power source
+- Status LEDs on hardware PWM (mute, headphones, charging, low battery)
+- Idle display sleep: the backlight dims, then goes off, when no button,
+  Joy-Con, touch or gamepad input arrives; any input lights it again at
+  once (idle.py)
+- Per-emulator profiles (governor, AGC, polling, OSD, backlight) from the
+  runcommand hooks; see emulator_profiles.py
+- Prometheus metrics on http://127.0.0.1:9105 (METRICS_PORT) and the
+  node-exporter textfile dir
+- Amp I2C writes on their own thread with retry, bus recovery and resync
+  (i2c_worker.py), so a NACK or stuck bus never stalls the buttons
+- Optional real-time mode: SCHED_FIFO button thread pinned to one core,
+  amixer/backlight writes and the OSD on lower-priority threads
 
 Dependencies:
-  sudo pip3 install adafruit-circuitpython-tpa2016 pygame evdev
-  Place a retro pixel TTF (e.g. Jersey10.ttf) alongside this script.
+  sudo pip3 install adafruit-circuitpython-tpa2016 pygame evdev pyalsaaudio
+  Place a retro pixel TTF (e.g. Jersey10.ttf) alongside this script, or
+  better, build the OSD font atlas once (python3 font_atlas.py): the OSD
+  then maps it instead of starting pygame's font engine.
 
 Run at startup (e.g. in /etc/rc.local or crontab @reboot).
+
+Startup is staged: the GPIO buttons, headphone detect and amp (mute path)
+come up first; pygame/OSD, evdev and the battery service load afterwards
+on background threads. The journal gets a startup report with the time to
+input-ready and the cost of each heavy import.
 """
 import time
-import re
+from startup import StartupProfiler
+startup = StartupProfiler()
+
+import errno
 import subprocess
 import threading
 import os
+import select
 
-import board, busio, digitalio, adafruit_tpa2016
-import pygame
-from evdev import InputDevice, list_devices, ecodes
+import metrics
+from battery import LOW_PERCENT, BatteryService, SMBusPiSugarReader
+from font_atlas import ATLAS_PATH, FontAtlas
+from emulator_profiles import CONTROL_FIFO, ControlFifo, CpuGovernor, EmulatorProfiles, load_table
+from hotkeys import HOTKEYS_FILE, HotkeyEngine, evdev_resolver, feed_evdev
+from i2c_worker import I2CWorker
+from idle import IdleManager, SysfsBacklight
+from led_status import LedStatus, SysfsPwm
+from input_router import (ADAFRUIT_VENDOR, InputRouter, create_virtual_gamepad, find_sources,
+                          is_combined_joycon)
+from mixer_watch import AlsaMixerSource, MixerWatcher
+from power_profiles import BatteryPowerSource, PowerProfileManager
+from rt_sched import Worker, make_background, make_realtime
+from touch_gestures import TouchGestures, find_touchscreen
+from volume_curve import VolumeModel, build_table
 
 # ─── CONFIG ────────────────────────────────────────────────────────────────────
 VOL_UP_PIN    = 17    # BCM 17
 VOL_DOWN_PIN  = 27    # BCM 27
 HP_DETECT_PIN = 23    # BCM 23
+GPIO_DEBOUNCE = 0.01  # s between pin samples; outlasts contact bounce, inside one frame
 
 OSD_FONT_PATH   = "./Jersey10.ttf"
 OSD_FONT_SIZE   = 24
+OSD_FONT_ATLAS  = ATLAS_PATH  # prebuilt by font_atlas.py; OSD_FONT_PATH if missing
 OSD_BAR_CHUNKS  = 10
 OSD_WIDTH       = 800
 OSD_HEIGHT      = 480
 
-VOLUME_STEP     = 5     # % per press
+VOLUME_STEP     = 1     # curve steps per press (see volume_curve.py)
+AMP_BASE_GAIN   = 0     # dB, amp gain while ALSA covers the lower range
 BACKLIGHT_STEP  = 16    # 0-255 increment
 BACKLIGHT_PATH  = "/sys/class/backlight"
 
-# ─── INIT HARDWARE ─────────────────────────────────────────────────────────────
-# I2C + TPA2016 amplifier
-i2c = busio.I2C(board.SCL, board.SDA)
-amp = adafruit_tpa2016.TPA2016(i2c)
+# Grab the Joy-Cons + ItsyBitsy pad and expose one virtual uinput gamepad
+# (point RetroArch at "Pi Switch Gamepad" when this is on)
+USE_INPUT_ROUTER = False
+
+BATTERY_ENABLED = True  # PiSugar 3 on the same I2C bus
+
+USE_TOUCH_GESTURES = True  # see touch_gestures.py
+
+# Status LEDs on PWM0 (GPIO12, green) / PWM1 (GPIO13, red); needs
+# dtoverlay=pwm-2chan,pin=12,func=4,pin2=13,func2=4, see led_status.py
+USE_LEDS = False
+
+# Dim, then switch off the backlight after this long without input
+IDLE_SLEEP       = True
+IDLE_DIM_AFTER   = 60    # s
+IDLE_BLANK_AFTER = 180   # s
+
+METRICS_PORT = 9105  # volumecombo.py uses 9106
+
+# Real-time input: button thread on SCHED_FIFO pinned to RT_CPU with locked
+# memory; amixer, backlight writes and the OSD run at lower priority elsewhere
+REALTIME_MODE = False
+RT_CPU        = 3
+
+# ─── METRICS ───────────────────────────────────────────────────────────────────
+M_I2C_ERRORS      = metrics.counter("piswitch_i2c_errors_total", "I2C operations that raised")
+M_AMIXER_FAILURES = metrics.counter("piswitch_amixer_failures_total", "amixer calls that exited non-zero")
+M_EVDEV_RECONNECT = metrics.counter("piswitch_evdev_reconnects_total", "Joy-Con evdev device reopened")
+M_OSD_FRAME       = metrics.histogram("piswitch_osd_frame_seconds", "Time to render one OSD frame")
+M_VOLUME_STEP     = metrics.histogram("piswitch_volume_step_seconds", "Time to apply one volume step")
+M_BATTERY_PERCENT = metrics.gauge("piswitch_battery_percent", "Last PiSugar battery reading")
+
+# ─── INIT HARDWARE (stage 1: input + mute) ─────────────────────────────────────
+board = digitalio = busio = adafruit_tpa2016 = GPIO = None
+i2c_port = amp = btn_up = btn_down = hp_detect = None
 
 # GPIO inputs (internal pull-ups, switches pull to GND)
 def make_input(pin):
@@ -50,19 +126,104 @@ def make_input(pin):
     d.pull = digitalio.Pull.UP
     return d
 
-btn_up    = make_input(VOL_UP_PIN)
-btn_down  = make_input(VOL_DOWN_PIN)
-hp_detect = make_input(HP_DETECT_PIN)
+def init_input():
+    global board, digitalio, busio, adafruit_tpa2016, btn_up, btn_down, hp_detect
+    board     = startup.imp("board")
+    digitalio = startup.imp("digitalio")
+    busio     = startup.imp("busio")
+    adafruit_tpa2016 = startup.imp("adafruit_tpa2016")
+    try:
+        open_amp()
+    except OSError as e:
+        print(f"{e}; the i2c worker keeps retrying")
+    btn_up    = make_input(VOL_UP_PIN)
+    btn_down  = make_input(VOL_DOWN_PIN)
+    hp_detect = make_input(HP_DETECT_PIN)
+    watch_edges((VOL_UP_PIN, VOL_DOWN_PIN, HP_DETECT_PIN))
+
+# digitalio has no edge events, but on the Pi Blinka drives the pins through
+# RPi.GPIO, whose edge callbacks can wake the button loop the moment a pin
+# changes. Without them the loop falls back to sampling every poll_interval.
+gpio_edge = threading.Event()
 
-# ─── OSD SETUP ─────────────────────────────────────────────────────────────────
-os.environ["SDL_VIDEODRIVER"] = "fbcon"
-pygame.init()
-screen = pygame.display.set_mode((OSD_WIDTH, OSD_HEIGHT), pygame.FULLSCREEN)
-font   = pygame.font.Font(OSD_FONT_PATH, OSD_FONT_SIZE)
+def watch_edges(pins):
+    global GPIO
+    try:
+        GPIO = startup.imp("RPi.GPIO")
+        for pin in pins:
+            GPIO.add_event_detect(pin, GPIO.BOTH, callback=lambda _pin: gpio_edge.set())
+    except (ImportError, RuntimeError, ValueError) as e:
+        GPIO = None
+        print(f"No GPIO edge events ({e}); buttons are polled")
+
+# I2C + TPA2016 amplifier. Only the i2c worker thread touches amp: callers
+# queue the new value and return, retries/recovery happen over there, and
+# after a fault the last value of every setting is written again.
+# amp is None (and i2c_port too) while the amp can't be opened.
+def open_amp():
+    global i2c_port, amp
+    port = busio.I2C(board.SCL, board.SDA)
+    try:
+        new = adafruit_tpa2016.TPA2016(port)  # probes: ValueError if no ACK
+    except (OSError, ValueError) as e:
+        port.deinit()
+        raise OSError(errno.ENODEV, f"TPA2016 not answering: {e}") from e
+    i2c_port, amp = port, new
+
+def reopen_amp():
+    global i2c_port, amp
+    if i2c_port is not None:
+        i2c_port.deinit()
+    i2c_port = amp = None
+    open_amp()
+
+def _amp_set(name, value):
+    if amp is None:
+        raise OSError(errno.ENODEV, "TPA2016 not open")  # retried; recovery reopens
+    setattr(amp, name, value)
+
+def on_i2c_error(e):
+    M_I2C_ERRORS.inc()
 
-def draw_osd(volume, muted, hp_inserted):
+i2c = I2CWorker(recovery=(reopen_amp,), on_error=on_i2c_error,
+                avoid_cpu=RT_CPU if REALTIME_MODE else None)
+
+compression = 2  # TPA2016 power-on default, 4:1
+def set_compression(ratio):
+    global compression
+    compression = ratio
+    i2c.submit("compression_ratio", _amp_set, "compression_ratio", ratio)
+
+# ─── OSD SETUP (lazy) ──────────────────────────────────────────────────────────
+OSD_PRELOAD = True  # warm pygame up in the background instead of on first draw
+
+pygame = screen = font = None
+osd_init_lock = threading.Lock()
+def ensure_osd():
+    global pygame, screen, font
+    with osd_init_lock:
+        if screen is not None:
+            return
+        pg = startup.imp("pygame")
+        os.environ["SDL_VIDEODRIVER"] = "fbcon"
+        try:
+            atlas = FontAtlas(pg, OSD_FONT_SIZE, OSD_FONT_ATLAS)
+        except (OSError, ValueError) as e:
+            print(f"OSD font atlas unavailable ({e}); using {OSD_FONT_PATH}")
+            atlas = None
+        if atlas:
+            pg.display.init()  # not pg.init(): leaves the font engine unloaded
+        else:
+            pg.init()
+        screen = pg.display.set_mode((OSD_WIDTH, OSD_HEIGHT), pg.FULLSCREEN)
+        font   = atlas or pg.font.Font(OSD_FONT_PATH, OSD_FONT_SIZE)
+        pygame = pg
+        startup.mark("osd ready")
+
+def draw_osd(volume, muted, hp_inserted, title=None):
     screen.fill((0,0,0))
-    title = "HEADPHONES" if hp_inserted else ("MUTED" if muted else "VOLUME")
+    if title is None:
+        title = "HEADPHONES" if hp_inserted else ("MUTED" if muted else "VOLUME")
     lbl = font.render(title, True, (255,255,255))
     screen.blit(lbl, (20,20))
     chunks  = int((volume/100) * OSD_BAR_CHUNKS)
@@ -73,21 +234,92 @@ def draw_osd(volume, muted, hp_inserted):
         pygame.draw.rect(screen, color, rect)
     pygame.display.update()
 
+def hide_osd():
+    screen.fill((0,0,0))
+    pygame.display.update()
+
+# Callers only record what to show; the OSD thread draws it at most
+# profile.osd_fps times a second and hides it after profile.osd_autohide.
+osd_event = threading.Event()
+osd_title = None
+def redraw_osd(title=None):
+    global osd_title
+    osd_title = title
+    osd_event.set()
+
+def osd_loop():
+    if REALTIME_MODE:
+        make_background(avoid_cpu=RT_CPU)
+    if OSD_PRELOAD:
+        ensure_osd()
+    visible, last_frame = False, 0.0
+    while True:
+        prof = profiles.current
+        if not osd_event.wait(prof.osd_autohide if visible else None):
+            hide_osd()
+            visible = False
+            continue
+        osd_event.clear()
+        if prof.osd_fps <= 0:
+            continue
+        wait = last_frame + 1.0 / prof.osd_fps - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)  # frame cap; requests made meanwhile coalesce
+            osd_event.clear()
+        ensure_osd()
+        with M_OSD_FRAME.time():
+            draw_osd(get_volume(), mute_state or mixer.state.muted, not hp_detect.value, osd_title)
+        last_frame, visible = time.monotonic(), True
+
 # ─── VOLUME HELPERS ────────────────────────────────────────────────────────────
 vol_lock = threading.Lock()
+worker = None  # rt_sched.Worker in REALTIME_MODE
+
+def _amixer_set(pct):
+    result = subprocess.run([
+        "amixer", "-qc", "0", "sset", "Master", f"{pct}%", "unmute"
+    ])
+    if result.returncode != 0:
+        M_AMIXER_FAILURES.inc()
+
+def set_alsa_percent(pct):
+    mixer.expect(pct)
+    if worker:
+        worker.submit("alsa", _amixer_set, pct)
+    else:
+        _amixer_set(pct)
+
+def set_amp_gain(db):
+    i2c.submit("fixed_gain", _amp_set, "fixed_gain", db)
+
+volume = VolumeModel(set_alsa_percent, set_amp_gain, build_table(AMP_BASE_GAIN))
+
 def change_volume(delta):
-    with vol_lock:
-        subprocess.run([
-            "amixer", "-qc", "0", "sset", "Master",
-            f"{abs(delta)}{'+' if delta>0 else '-'}", "unmute"
-        ])
+    # One step on the unified curve only writes the stage that changes
+    with vol_lock, M_VOLUME_STEP.time():
+        volume.set_step(volume.step + delta)
 
 def get_volume():
-    raw = subprocess.check_output([
-        "amixer", "-qc", "0", "sget", "Master"
-    ]).decode(errors="ignore")
-    m = re.search(r"(\d+)%", raw)
-    return int(m.group(1)) if m else 0
+    return volume.percent()
+
+# ─── MIXER EVENTS ──────────────────────────────────────────────────────────────
+def on_mixer_change(state):
+    # Someone else moved the ALSA volume or mute; follow it, don't fight it
+    with vol_lock:
+        volume.sync_alsa(state.percent)
+    led("mute", mute_state or state.muted)
+    redraw_osd()
+
+mixer = MixerWatcher(None, on_change=on_mixer_change)
+
+def mixer_stage():
+    try:
+        startup.imp("alsaaudio")
+    except ImportError:
+        print("pyalsaaudio missing; external volume changes won't reach the OSD")
+        return
+    mixer.source = AlsaMixerSource()
+    mixer.run()
 
 # ─── BACKLIGHT HELPERS ─────────────────────────────────────────────────────────
 def _find_backlight_file():
@@ -96,88 +328,361 @@ def _find_backlight_file():
         if os.path.isfile(p):
             return p
     raise RuntimeError("No backlight brightness file found")
-BL_FILE = _find_backlight_file()
+
+BL_FILE = None
+def bl_file():
+    global BL_FILE
+    if BL_FILE is None:
+        BL_FILE = _find_backlight_file()
+    return BL_FILE
 
 def get_backlight():
-    with open(BL_FILE) as f:
+    with open(bl_file()) as f:
         return int(f.read().strip())
 
-def adjust_backlight(delta):
-    curr = get_backlight()
-    new  = max(0, min(255, curr + delta))
+# Held open when the service user may write it (see idle.py), so a write
+# is one syscall; otherwise every write is a sudo tee
+backlight = None
+def open_backlight():
+    global backlight
+    try:
+        backlight = SysfsBacklight(bl_file()).open()
+    except PermissionError:
+        print(f"{bl_file()} not writable; using sudo tee (slower idle wake)")
+
+def _write_backlight(value):
+    if backlight:
+        backlight.write(value)
+        return
     subprocess.run(
-        ["sudo", "tee", BL_FILE],
-        input=str(new).encode(),
+        ["sudo", "tee", bl_file()],
+        input=str(value).encode(),
         stdout=subprocess.DEVNULL
     )
+
+def set_backlight(value):
+    new = max(0, min(profiles.current.backlight_max, value))
+    if worker:
+        worker.submit("backlight", _write_backlight, new)
+    else:
+        _write_backlight(new)
     return new
 
+def adjust_backlight(delta):
+    return set_backlight(get_backlight() + delta)
+
+# ─── IDLE DISPLAY SLEEP ────────────────────────────────────────────────────────
+# Input threads call idle.activity(); a wake restores the backlight from there.
+# button_loop ticks the long presses of every device, so any wake restarts it
+idle = IdleManager(get_backlight, set_backlight, IDLE_DIM_AFTER, IDLE_BLANK_AFTER,
+                   on_wake=gpio_edge.set)
+
+def idle_stage():
+    try:
+        open_backlight()
+    except (OSError, RuntimeError) as e:
+        print(f"Idle display sleep disabled: {e}")
+        return
+    idle.run()
+
 # ─── MAIN BUTTON LOOP ───────────────────────────────────────────────────────────
 mute_state = False
 def update_amp_shutdown():
+    led("mute", mute_state or mixer.state.muted)
+    led("headphones", not hp_detect.value)
     # headphone override
-    if not hp_detect.value:
-        amp.shutdown = True
-    else:
-        amp.shutdown = mute_state
+    i2c.submit("shutdown", _amp_set, "shutdown", True if not hp_detect.value else mute_state)
 
-def button_loop():
+# ─── HOTKEY ACTIONS ────────────────────────────────────────────────────────────
+def action_volume(steps=VOLUME_STEP):
+    change_volume(steps)
+    redraw_osd()
+
+def action_mute():
     global mute_state
+    mute_state = not mute_state
+    update_amp_shutdown()
+    redraw_osd()
+
+def action_backlight(delta=BACKLIGHT_STEP):
+    adjust_backlight(delta)
+    redraw_osd()
+
+def action_compression():
+    # 0 = 1:1 (AGC off), 2 = 4:1
+    set_compression(2 if compression == 0 else 0)
+
+def action_profile(name=None):
+    profiles.cycle(name)
+    redraw_osd(title=profiles.current.name.upper())
+
+ACTIONS = {
+    "volume":      action_volume,
+    "mute":        action_mute,
+    "backlight":   action_backlight,
+    "compression": action_compression,
+    "profile":     action_profile,
+}
+GPIO_KEYS = {"VOL_UP": VOL_UP_PIN, "VOL_DOWN": VOL_DOWN_PIN}
+
+# Both input threads feed the same engine; actions run under the lock
+hotkey_lock = threading.Lock()
+hotkeys = HotkeyEngine(ACTIONS)
+hotkeys.load(HOTKEYS_FILE, {"gpio": GPIO_KEYS.__getitem__})  # Joy-Con bindings: init_evdev()
+
+def button_loop():
+    if REALTIME_MODE:
+        print("Real-time input: " + (", ".join(make_realtime(cpu=RT_CPU)) or "not permitted"))
     last_u, last_d, last_hp = True, True, True
+    edge_sampled = 0.0
     while True:
         u, d, hp = btn_up.value, btn_down.value, hp_detect.value
+        if u != last_u or d != last_d or hp != last_hp:
+            idle.activity()
         # headphone inserted/removed
         if hp != last_hp:
             last_hp = hp
             update_amp_shutdown()
-            draw_osd(get_volume(), mute_state, not hp)
-        # both pressed -> toggle mute
-        if not u and not d and (last_u or last_d):
-            mute_state = not mute_state
-            update_amp_shutdown()
-            draw_osd(get_volume(), mute_state, not hp)
-        # vol up
-        if not u and last_u:
-            change_volume(+VOLUME_STEP)
-            draw_osd(get_volume(), mute_state, not hp)
-        # vol down
-        if not d and last_d:
-            change_volume(-VOLUME_STEP)
-            draw_osd(get_volume(), mute_state, not hp)
+            redraw_osd()
+        with hotkey_lock:
+            if u != last_u:
+                hotkeys.feed("gpio", VOL_UP_PIN, not u)
+            if d != last_d:
+                hotkeys.feed("gpio", VOL_DOWN_PIN, not d)
+            hotkeys.tick()  # long presses, for both devices
         last_u, last_d = u, d
-        time.sleep(0.05)
+        if GPIO is None:
+            time.sleep(profiles.current.poll_interval)
+            continue
+        # An edge (or a wake from any other device, see idle) ends the wait at
+        # once; the timeout only ticks long presses, which can't be in progress
+        # while the display sleeps
+        if gpio_edge.wait(profiles.current.poll_interval if idle.awake.is_set() else None):
+            gpio_edge.clear()
+            # A bouncing contact fires a burst of edges; sampling at most once
+            # per GPIO_DEBOUNCE after an edge turns the burst into one change.
+            # The first edge is still sampled at once, and no edge is dropped
+            # (no bouncetime), so a read in mid-bounce is fixed by the next one
+            time.sleep(max(0.0, edge_sampled + GPIO_DEBOUNCE - time.monotonic()))
+            edge_sampled = time.monotonic()
+
+# ─── JOYCON HOTKEY WATCHER (stage 2) ──────────────────────────────────────────
+evdev = None
+def init_evdev():
+    global evdev
+    evdev = startup.imp("evdev")
+    with hotkey_lock:
+        hotkeys.load(HOTKEYS_FILE, {"joycon": evdev_resolver(evdev.ecodes)})
+    startup.mark("evdev ready")
 
-# ─── JOYCON BACKLIGHT WATCHER ─────────────────────────────────────────────────
-home_pressed = False
 def find_combined_joycon():
-    for fn in list_devices():
-        dev = InputDevice(fn)
-        if 'Joy-Con' in dev.name or 'joycond' in dev.name:
+    for fn in evdev.list_devices():
+        dev = evdev.InputDevice(fn)
+        if is_combined_joycon(dev.name):
             return dev
     raise RuntimeError("Combined Joy-Con device not found")
 
 def joycon_watcher():
-    global home_pressed
-    dev = find_combined_joycon()
-    for e in dev.read_loop():
-        # Home button toggle
-        if e.type == ecodes.EV_KEY and e.code == ecodes.KEY_HOME:
-            home_pressed = (e.value == 1)
-        # D-pad up/down while Home held
-        if home_pressed and e.type == ecodes.EV_ABS and e.code == ecodes.ABS_HAT0Y and e.value != 0:
-            if e.value == -1:
-                adjust_backlight(+BACKLIGHT_STEP)
-            elif e.value == 1:
-                adjust_backlight(-BACKLIGHT_STEP)
-            draw_osd(get_volume(), mute_state, not hp_detect.value)
+    # Joy-Cons come and go (rails, Bluetooth); reopen instead of dying
+    while True:
+        try:
+            dev = find_combined_joycon()
+            for e in dev.read_loop():
+                idle.activity()
+                with hotkey_lock:
+                    feed_evdev(hotkeys, "joycon", e, evdev.ecodes.EV_KEY, evdev.ecodes.EV_ABS)
+        except (OSError, RuntimeError):
+            pass
+        M_EVDEV_RECONNECT.inc()
+        time.sleep(2)
+
+# ─── GAMEPAD ACTIVITY ─────────────────────────────────────────────────────────
+def find_gamepad():
+    for fn in evdev.list_devices():
+        dev = evdev.InputDevice(fn)
+        if dev.info.vendor == ADAFRUIT_VENDOR:
+            return dev
+    raise RuntimeError("ItsyBitsy gamepad not found")
+
+def gamepad_watcher():
+    # Without the router, RetroArch reads the pad itself: don't grab it, only
+    # note that someone is playing so the display stays on
+    while True:
+        try:
+            dev = find_gamepad()
+            for _ in dev.read_loop():
+                idle.activity()
+        except (OSError, RuntimeError):
+            pass
+        M_EVDEV_RECONNECT.inc()
+        time.sleep(2)
+
+# ─── INPUT ROUTER ──────────────────────────────────────────────────────────────
+# /dev/input gains or loses a node whenever a pad is plugged in or a Joy-Con
+# pairs, so its mtime is a hotplug signal that costs one stat()
+INPUT_DIR      = "/dev/input"
+ROUTER_RESCAN  = 5000  # ms between hotplug checks while the display sleeps
+
+def input_dir_stamp():
+    try:
+        return os.stat(INPUT_DIR).st_mtime_ns
+    except OSError:
+        return None
+
+def input_router_loop():
+    # Replaces joycon_watcher: the router owns the grabbed Joy-Con and feeds
+    # hotkeys itself, keeping chords out of what RetroArch sees
+    ui = create_virtual_gamepad()
+    router = InputRouter(ui.fd, hotkeys, hotkey_lock, on_input=idle.activity)
+    while True:
+        stamp = input_dir_stamp()
+        try:
+            for dev, name, table in find_sources(evdev.list_devices, evdev.InputDevice,
+                                                 skip=router.paths()):
+                router.add_source(dev, name, table)
+            if router.sources:
+                # ms; ticks long-press hotkeys between reads while the display is on,
+                # returns when something is plugged in so it joins the running set
+                router.run(timeout=lambda: 50 if idle.awake.is_set() else ROUTER_RESCAN,
+                           until=lambda: input_dir_stamp() != stamp)
+                continue
+        except OSError:
+            router.close()  # a source dropped off; release everything and rescan
+            M_EVDEV_RECONNECT.inc()
+            time.sleep(2)
+            continue
+        while input_dir_stamp() == stamp:  # nothing to route until a device appears
+            time.sleep(2)
+
+# ─── TOUCHSCREEN GESTURES ──────────────────────────────────────────────────────
+def touch_watcher():
+    while True:
+        try:
+            dev, width, height = find_touchscreen(evdev.list_devices, evdev.InputDevice)
+            gestures = TouchGestures(ACTIONS, width, height, lock=hotkey_lock)
+            while True:
+                # Wake up now and then so a still finger becomes a long-press;
+                # a sleeping display can't have a finger on it
+                timeout = 0.1 if idle.awake.is_set() else None
+                if select.select([dev.fd], [], [], timeout)[0]:
+                    idle.activity()
+                    gestures.handle(dev.read())
+                else:
+                    gestures.tick()
+        except (OSError, RuntimeError):
+            pass
+        M_EVDEV_RECONNECT.inc()
+        time.sleep(2)
+
+def evdev_stage():
+    init_evdev()
+    if USE_TOUCH_GESTURES:
+        threading.Thread(target=touch_watcher, daemon=True).start()
+    if USE_INPUT_ROUTER:
+        input_router_loop()
+    else:
+        threading.Thread(target=gamepad_watcher, daemon=True).start()
+        joycon_watcher()
+
+# ─── BATTERY ───────────────────────────────────────────────────────────────────
+def on_battery_low(state):
+    redraw_osd(title=f"BATTERY {state.percent}%")
+
+# Latest reading lives in battery.state; nothing else should poll the PiSugar
+battery = None
+def battery_stage():
+    global battery
+    battery = BatteryService(SMBusPiSugarReader(), on_low=on_battery_low,
+                             on_change=on_battery_change)
+    profiles.source = BatteryPowerSource(battery)
+    battery.run()
+
+# ─── POWER PROFILES ────────────────────────────────────────────────────────────
+class _MainsPowerSource:
+    def read(self):
+        return True, None
+
+# Until the battery service is up, assume mains power
+profiles = PowerProfileManager(_MainsPowerSource())
+def on_battery_change(state):
+    M_BATTERY_PERCENT.set(state.percent)
+    led("charging", state.charging)
+    led("low", state.percent is not None and state.percent <= LOW_PERCENT and not state.plugged)
+    profiles.refresh()
+
+# ─── STATUS LEDS ───────────────────────────────────────────────────────────────
+leds = None
+def led(status, on):
+    if leds:
+        leds.set(status, on)
+
+def led_stage():
+    global leds
+    try:
+        status = LedStatus([SysfsPwm(0, 0).open(), SysfsPwm(0, 1).open()])
+    except OSError as e:
+        print(f"Status LEDs unavailable: {e}")
+        return
+    leds = status
+    update_amp_shutdown()  # show the current mute/headphone state
+    status.run()
+
+# ─── EMULATOR PROFILES ─────────────────────────────────────────────────────────
+# Backlight through idle: a launch or exit while dimmed saves/restores the
+# user's level, not the dim one, and doesn't light the panel
+emulators = EmulatorProfiles(load_table(), profiles, idle.level, idle.set, CpuGovernor())
+
+def control_stage():
+    # runcommand-onstart.sh / -onend.sh write to this FIFO
+    try:
+        ControlFifo(CONTROL_FIFO, emulators.command).run()
+    except OSError as e:
+        print(f"Control FIFO {CONTROL_FIFO}: {e}")
+
+def apply_power_profile(prof):
+    print(f"Power profile: {prof.name}")
+    if leds:
+        leds.flash("profile")
+    set_compression(prof.amp_compression)
+    if get_backlight() > prof.backlight_max:
+        adjust_backlight(0)  # clamps to the new ceiling
 
 # ─── STARTUP ───────────────────────────────────────────────────────────────────
-if __name__ == "__main__":
+def start_input_stage():
+    """Stage 1: everything a button press or headphone plug needs."""
+    global worker
+    if REALTIME_MODE:
+        worker = Worker(avoid_cpu=RT_CPU).start()
+    init_input()
+    i2c.start()
+    volume.apply()
     update_amp_shutdown()
     threading.Thread(target=button_loop, daemon=True).start()
-    threading.Thread(target=joycon_watcher, daemon=True).start()
+    startup.mark("input ready")
+
+def start_background_stage():
+    """Stage 2: OSD, Joy-Con/evdev, battery, metrics; off the input path."""
+    threading.Thread(target=osd_loop, daemon=True).start()
+    threading.Thread(target=evdev_stage, daemon=True).start()
+    threading.Thread(target=mixer_stage, daemon=True).start()
+    threading.Thread(target=control_stage, daemon=True).start()
+    if USE_LEDS:
+        threading.Thread(target=led_stage, daemon=True).start()
+    if BATTERY_ENABLED:
+        threading.Thread(target=battery_stage, daemon=True).start()
+    if IDLE_SLEEP:
+        threading.Thread(target=idle_stage, daemon=True).start()
+    profiles.add_listener(apply_power_profile)
+    metrics.start_exporter(http_addr=("127.0.0.1", METRICS_PORT))
+
+if __name__ == "__main__":
+    start_input_stage()
+    start_background_stage()
+    time.sleep(3)
+    startup.report()
     try:
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
-        pygame.quit()
+        if pygame:
+            pygame.quit()
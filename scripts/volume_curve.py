@@ -0,0 +1,105 @@
+"""
+One volume control spread across the ALSA softvol and TPA2016 gain stages.
+
+Each user step maps to a precomputed (ALSA %, amp dB) pair on a curve that
+is evenly spaced in dB, which is roughly even in loudness. ALSA covers the
+quiet end with the amp at its base gain, and the amp only starts climbing
+once ALSA is at 100%, so a normal step touches exactly one stage.
+
+The table is built once (build_table) and VolumeModel only calls the
+apply_* callbacks for the stage whose value actually changed.
+"""
+
+# softvol's default range; amixer's percent is linear in these raw steps
+ALSA_MIN_DB = -51.0
+ALSA_MAX_DB = 0.0
+
+AMP_MIN_DB = -28
+AMP_MAX_DB = 30
+
+VOLUME_STEPS = 24        # user-visible steps above mute
+CURVE_MIN_DB = -40.0     # loudness of step 1, relative to ALSA 100% + amp base
+CURVE_MAX_DB = 6.0       # loudness of the top step (extra amp gain)
+DEFAULT_STEP = 16
+
+
+def alsa_db_to_percent(db):
+    db = max(ALSA_MIN_DB, min(ALSA_MAX_DB, db))
+    return int(round((db - ALSA_MIN_DB) * 100 / (ALSA_MAX_DB - ALSA_MIN_DB)))
+
+
+def build_table(amp_base_db=0, steps=VOLUME_STEPS, min_db=CURVE_MIN_DB, max_db=CURVE_MAX_DB):
+    """Return [(alsa_percent, amp_db), ...] for steps 0 (mute) .. steps."""
+    table = [(0, amp_base_db)]
+    for i in range(1, steps + 1):
+        total_db = min_db + (max_db - min_db) * (i - 1) / max(1, steps - 1)
+        if total_db <= 0:
+            pair = (alsa_db_to_percent(total_db), amp_base_db)
+        else:
+            amp_db = min(AMP_MAX_DB, amp_base_db + int(round(total_db)))
+            pair = (100, amp_db)
+        # quantisation can make neighbours collide; never let a step be a no-op
+        if pair <= table[-1]:
+            last_pct, last_amp = table[-1]
+            pair = (last_pct + 1, last_amp) if last_pct < 100 else (100, last_amp + 1)
+        table.append(pair)
+    return table
+
+
+class VolumeModel:
+    def __init__(self, apply_alsa, apply_amp, table=None, step=DEFAULT_STEP):
+        self.apply_alsa = apply_alsa
+        self.apply_amp = apply_amp
+        self.table = table or build_table()
+        self.step = max(0, min(len(self.table) - 1, step))
+        self.alsa_percent = None
+        self.amp_db = None
+
+    @property
+    def max_step(self):
+        return len(self.table) - 1
+
+    def percent(self):
+        """Position on the curve as 0-100, for the OSD bar."""
+        return self.step * 100 // self.max_step
+
+    def set_step(self, step):
+        """Move to step, writing only the stage(s) that change. Returns writes."""
+        self.step = max(0, min(self.max_step, step))
+        alsa_percent, amp_db = self.table[self.step]
+        writes = 0
+        if alsa_percent != self.alsa_percent:
+            self.apply_alsa(alsa_percent)
+            self.alsa_percent = alsa_percent
+            writes += 1
+        if amp_db != self.amp_db:
+            self.apply_amp(amp_db)
+            self.amp_db = amp_db
+            writes += 1
+        return writes
+
+    def sync_alsa(self, percent):
+        """ALSA was set behind our back (RetroArch, EmulationStation): adopt
+        percent without writing, and move to the nearest step that keeps the
+        current amp gain."""
+        self.alsa_percent = percent
+        self.step = min(range(len(self.table)), key=lambda i: (
+            self.table[i][1] != self.amp_db, abs(self.table[i][0] - percent)))
+        return self.step
+
+    def set_table(self, table):
+        """Swap in a new curve (e.g. another amp base gain) and move the
+        current step onto it, writing only the stage(s) that change."""
+        self.table = table
+        return self.set_step(self.step)
+
+    def apply(self):
+        """Write both stages unconditionally (startup)."""
+        self.alsa_percent = self.amp_db = None
+        return self.set_step(self.step)
+
+    def step_up(self):
+        return self.set_step(self.step + 1)
+
+    def step_down(self):
+        return self.set_step(self.step - 1)
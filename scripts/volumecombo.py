@@ -1,16 +1,26 @@
+import os
 import time
 import subprocess
 import sys
-import select
 import RPi.GPIO as GPIO
 from smbus2 import SMBus
 
+from amp_console import AmpConsole
+from amp_power import AmpPower
+import metrics
+from eventtrace import DEBUG, INFO, WARN, define, trace
+from hotkeys import HOTKEYS_FILE, HotkeyEngine
+from i2c_worker import I2CWorker
+from mixer_watch import ROUNDING
+from power_profiles import PROFILES
+from volume_curve import VolumeModel, build_table
+
 # ========== CONFIGURATION ==========
 BUTTON_UP = 17         # GPIO for Volume Up button
 BUTTON_DOWN = 27       # GPIO for Volume Down button
 SHDN_GPIO = 16         # TEMP: GPIO for TPA2016 SHDN pin (set back to 22 later)
 JACK_SWITCH_GPIO = 23  # GPIO for headphone jack detect switch
-DEBOUNCE_TIME = 0.05   # 50ms polling debounce
+POWER_PROFILE = "balanced"  # power_profiles.py; sets the GPIO mode poll interval
 
 # TPA2016 REGISTER MAP (Corrected)
 GAIN_REGISTER = 0x05        # Fixed gain setting
@@ -30,10 +40,97 @@ DEFAULT_MAXGAIN_BITS = 0b1100  # bits 7:4
 I2C_BUS = 1
 TPA2016_I2C_ADDR = 0x58
 FIXED_GAIN_DB = 0  # Set your preferred default gain here (-28 to +30 dB)
+AMP_WAKE_RAMP = False  # Ramp gain up after SHDN wake to avoid pops
+METRICS_PORT = 9106    # volume_backlight_control.py has 9105
+METRICS_TEXTFILE = "piswitch-volumecombo.prom"
+
+# ========== TRACE EVENTS ==========
+# Recorded into the in-memory ring buffer (eventtrace.py) instead of printed;
+# SIGUSR1 dumps it to /tmp/piswitch-trace.bin
+EV_GAIN = define("gain", "set {a} dB, read back 0x{b:02X}")
+EV_READBACK_MISMATCH = define("readback_mismatch", "reg 0x{a:02X} read back 0x{b:02X}, does not match written value")
+EV_COMPRESSION = define("compression", "ratio bits {a}, reg 0x07 = 0x{b:02X}")
+EV_AMP_SYNC = define("amp_sync", "fixed gain {a} dB, reg 0x07 = 0x{b:02X}")
+EV_SHDN = define("shdn", "SHDN {a} (1 = unmuted), ready after {b} poll(s), {dur} us")
+EV_SWS = define("sws", "software shutdown {a} (1 = muted)")
+EV_VOLUME_UP = define("volume_up", "ALSA {a}%, amp {b} dB, {dur} us")
+EV_VOLUME_DOWN = define("volume_down", "ALSA {a}%, amp {b} dB, {dur} us")
+EV_JACK = define("jack", "headphones {a} (1 = plugged in, speakers muted)")
+
+# ========== METRICS ==========
+M_I2C_ERRORS = metrics.counter("piswitch_i2c_errors_total", "I2C operations that raised")
+M_READBACK_MISMATCH = metrics.counter("piswitch_readback_mismatch_total", "TPA2016 register readbacks that differed")
+M_AMIXER_FAILURES = metrics.counter("piswitch_amixer_failures_total", "amixer calls that exited non-zero")
+M_VOLUME_STEP = metrics.histogram("piswitch_volume_step_seconds", "Time to apply one volume step")
+M_AMP_WAKE = metrics.histogram("piswitch_amp_wake_seconds", "SHDN high to amp registers restored")
 
 # ========== GLOBALS ==========
 current_gain_db = FIXED_GAIN_DB
+amp_base_db = FIXED_GAIN_DB  # amp gain at the quiet end of the volume curve
 compression_setting = COMPRESSION_1TO1  # Start at 1:1
+amp_power = None
+
+# ========== TPA2016 BUS / POWER STATE ==========
+def set_shdn(high):
+    GPIO.output(SHDN_GPIO, GPIO.HIGH if high else GPIO.LOW)
+
+def get_amp():
+    # One bus handle for the life of the script; AmpPower keeps the shadow
+    # registers that get replayed when the amp comes out of SHDN.
+    global amp_power
+    if amp_power is None:
+        amp_power = AmpPower(SMBus(I2C_BUS), set_shdn, TPA2016_I2C_ADDR)
+    return amp_power
+
+# All bus traffic runs on the i2c_worker thread: the loops below only update
+# AmpPower's shadow and queue the write, so a NACK or a stuck bus can't
+# stall or kill them. Recovery escalates from reopening the adapter to
+# pulsing SHDN (a reset TPA2016 releases SDA); afterwards the whole
+# register file is rewritten from the shadow.
+def reopen_bus():
+    amp = get_amp()
+    bus = SMBus(I2C_BUS)  # if this fails, the old handle is still in place
+    amp.bus.close()
+    amp.bus = bus
+
+def reset_amp():
+    amp = get_amp()
+    if amp.powered:
+        amp.set_shdn(False)
+        time.sleep(0.001)
+        amp.wake()
+
+def on_i2c_error(e):
+    M_I2C_ERRORS.inc()
+
+i2c = I2CWorker(recovery=(reopen_bus, reset_amp), resync=lambda: get_amp().restore(),
+                on_error=on_i2c_error)
+
+def _write_shadow(reg):
+    amp = get_amp()
+    amp.write_register(reg, amp.shadow[reg])
+
+def write_register(reg, value):
+    get_amp().shadow[reg] = value & 0xFF
+    i2c.submit(("reg", reg), _write_shadow, reg)
+
+def update_bits(reg, mask, value):
+    amp = get_amp()
+    new = (amp.shadow[reg] & ~mask) | (value & mask)
+    write_register(reg, new)
+    return new
+
+def _readback(reg, event, a):
+    # Runs on the i2c worker right after the write, so no settling pause: it
+    # would hold up every write queued behind it. In SHDN the amp doesn't
+    # ACK; the shadow is replayed on wake anyway, so there is nothing to check.
+    if not get_amp().powered:
+        return
+    readback = get_amp().bus.read_byte_data(TPA2016_I2C_ADDR, reg)
+    trace.record(event, INFO, a, readback)
+    if readback != get_amp().shadow[reg]:
+        M_READBACK_MISMATCH.inc()
+        trace.record(EV_READBACK_MISMATCH, WARN, reg, readback)
 
 # ========== TPA2016 CONTROL ==========
 def db_to_regval(db):
@@ -41,29 +138,20 @@ def db_to_regval(db):
     return int(db + 28)
 
 def set_fixed_gain_db(db):
-    global current_gain_db
-    db = max(-28, min(30, db))
-    current_gain_db = db
-    with SMBus(I2C_BUS) as bus:
-        gain_value = db_to_regval(db)
-        bus.write_byte_data(TPA2016_I2C_ADDR, GAIN_REGISTER, gain_value)
-        time.sleep(0.05)  # short pause
-        readback = bus.read_byte_data(TPA2016_I2C_ADDR, GAIN_REGISTER)
-    print(f"Set gain to {db} dB (wrote 0x{gain_value:02X}), read back 0x{readback:02X}")
-    if readback != gain_value:
-        print("WARNING: Register readback does not match written value!")
+    # The fixed gain is the volume curve's amp base: rebuild the curve around
+    # it so the model (and the next volume step) knows what the amp is at
+    global amp_base_db
+    amp_base_db = max(-28, min(30, db))
+    volume.set_table(build_table(amp_base_db))
+    i2c.submit(("readback", GAIN_REGISTER), _readback, GAIN_REGISTER, EV_GAIN, current_gain_db,
+               shadow=False)
 
 def set_compression_ratio(new_ratio_value):
     global compression_setting
-    with SMBus(I2C_BUS) as bus:
-        val = bus.read_byte_data(TPA2016_I2C_ADDR, COMPRESS_REGISTER)
-        val_new = (val & 0xFC) | (new_ratio_value & 0x03)
-        bus.write_byte_data(TPA2016_I2C_ADDR, COMPRESS_REGISTER, val_new)
-        time.sleep(0.05)
-        readback = bus.read_byte_data(TPA2016_I2C_ADDR, COMPRESS_REGISTER)
+    update_bits(COMPRESS_REGISTER, 0x03, new_ratio_value)
     compression_setting = new_ratio_value
-    ratio_map = {0: "1:1", 1: "2:1", 2: "4:1", 3: "8:1"}
-    print(f"Set compression to {ratio_map.get(new_ratio_value, '?')} (wrote 0x{val_new:02X}), read back 0x{readback:02X}")
+    i2c.submit(("readback", COMPRESS_REGISTER), _readback, COMPRESS_REGISTER, EV_COMPRESSION,
+               new_ratio_value, shadow=False)
 
 def toggle_compression():
     # 0 = 1:1, 2 = 4:1
@@ -74,43 +162,60 @@ def get_current_compression_label():
     return ratio_map.get(compression_setting, "?")
 
 def disable_agc_and_set_gain():
-    with SMBus(I2C_BUS) as bus:
-        gain_value = db_to_regval(current_gain_db)
-        bus.write_byte_data(TPA2016_I2C_ADDR, GAIN_REGISTER, gain_value)
-        # Don't overwrite register 0x07, just re-set compression bits
-        val = bus.read_byte_data(TPA2016_I2C_ADDR, COMPRESS_REGISTER)
-        val = (val & 0xFC) | (compression_setting & 0x03)
-        bus.write_byte_data(TPA2016_I2C_ADDR, COMPRESS_REGISTER, val)
-        print(f"Fixed gain set to {current_gain_db} dB (reg value {gain_value})")
-        print(f"Compression ratio re-applied: {get_current_compression_label()}, reg 0x07 = 0x{val:02X}")
+    amp = get_amp()
+    gain_value = db_to_regval(current_gain_db)
+    amp.shadow[GAIN_REGISTER] = gain_value
+    # Don't overwrite register 0x07, just re-set compression bits
+    amp.shadow[COMPRESS_REGISTER] = (amp.shadow[COMPRESS_REGISTER] & 0xFC) | (compression_setting & 0x03)
+    i2c.submit("sync", amp.sync)  # one block write of every non-default register
+    trace.record(EV_AMP_SYNC, INFO, current_gain_db, amp.shadow[COMPRESS_REGISTER])
 
 # ========== HARDWARE MUTE (SHDN) ==========
+# SHDN is a GPIO, but it goes through the worker too so a mute/unmute
+# can't overtake register writes queued before it.
+def _shutdown():
+    get_amp().shutdown()
+    trace.record(EV_SHDN, INFO, 0)
+
+def _wake():
+    # SHDN resets the amp's registers: poll until it ACKs, then replay only
+    # the registers that differ from power-on defaults in one block write.
+    t0 = time.monotonic_ns()
+    polls = get_amp().wake(ramp=AMP_WAKE_RAMP)
+    elapsed = time.monotonic_ns() - t0
+    M_AMP_WAKE.observe(elapsed / 1e9)
+    trace.record(EV_SHDN, INFO, 1, polls, elapsed // 1000)
+
 def mute_amp():
-    GPIO.output(SHDN_GPIO, GPIO.LOW)
-    print("Hardware SHDN: LOW (muted/shutdown)")
+    i2c.submit("power", _shutdown)
 
 def unmute_amp():
-    GPIO.output(SHDN_GPIO, GPIO.HIGH)
-    time.sleep(0.05)  # Give the amp a moment to power up
-    disable_agc_and_set_gain()  # Restore settings after power up
-    print("Hardware SHDN: HIGH (unmuted)")
+    i2c.submit("power", _wake)
 
 # ========== SOFTWARE MUTE (SWS, REG 0x01, BIT 5) ==========
 def sws_software_mute():
-    with SMBus(I2C_BUS) as bus:
-        reg = bus.read_byte_data(TPA2016_I2C_ADDR, CONFIG_REGISTER)
-        reg |= SOFTWARE_SHUTDOWN_BIT
-        bus.write_byte_data(TPA2016_I2C_ADDR, CONFIG_REGISTER, reg)
-        print("SWS Software Shutdown: ON (muted)")
+    update_bits(CONFIG_REGISTER, SOFTWARE_SHUTDOWN_BIT, SOFTWARE_SHUTDOWN_BIT)
+    trace.record(EV_SWS, INFO, 1)
 
 def sws_software_unmute():
-    with SMBus(I2C_BUS) as bus:
-        reg = bus.read_byte_data(TPA2016_I2C_ADDR, CONFIG_REGISTER)
-        reg &= ~SOFTWARE_SHUTDOWN_BIT
-        bus.write_byte_data(TPA2016_I2C_ADDR, CONFIG_REGISTER, reg)
-        print("SWS Software Shutdown: OFF (unmuted)")
+    update_bits(CONFIG_REGISTER, SOFTWARE_SHUTDOWN_BIT, 0)
+    trace.record(EV_SWS, INFO, 0)
     disable_agc_and_set_gain()  # Re-assert settings just in case
 
+# ========== UNIFIED VOLUME (ALSA + AMP GAIN) ==========
+def set_alsa_percent(pct):
+    result = subprocess.run(['/usr/bin/amixer', '-q', '-c', '0', 'sset', 'Master', f'{pct}%', 'unmute'])
+    if result.returncode != 0:
+        M_AMIXER_FAILURES.inc()
+
+def set_amp_gain_stage(db):
+    # No readback/sleep here: this is the hot path for every volume step
+    global current_gain_db
+    current_gain_db = db
+    write_register(GAIN_REGISTER, db_to_regval(db))
+
+volume = VolumeModel(set_alsa_percent, set_amp_gain_stage, build_table(FIXED_GAIN_DB))
+
 # ========== ALSA VOLUME ==========
 def get_current_volume():
     try:
@@ -125,93 +230,130 @@ def get_current_volume():
 
 def volume_up():
     try:
-        subprocess.run(['/usr/bin/amixer', '-q', '-c', '0', 'sset', 'Master', '5+', 'unmute'])
-        vol = get_current_volume()
-        print(f"Volume UP, now at {vol}")
+        t0 = time.monotonic_ns()
+        volume.step_up()
+        elapsed = time.monotonic_ns() - t0
+        M_VOLUME_STEP.observe(elapsed / 1e9)
+        trace.record(EV_VOLUME_UP, INFO, volume.alsa_percent, volume.amp_db, elapsed // 1000)
     except Exception as e:
         print(f"Volume UP error: {e}")
 
 def volume_down():
     try:
-        subprocess.run(['/usr/bin/amixer', '-q', '-c', '0', 'sset', 'Master', '5-', 'unmute'])
-        vol = get_current_volume()
-        print(f"Volume DOWN, now at {vol}")
+        t0 = time.monotonic_ns()
+        volume.step_down()
+        elapsed = time.monotonic_ns() - t0
+        M_VOLUME_STEP.observe(elapsed / 1e9)
+        trace.record(EV_VOLUME_DOWN, INFO, volume.alsa_percent, volume.amp_db, elapsed // 1000)
     except Exception as e:
         print(f"Volume DOWN error: {e}")
 
-# ========== BUTTON STATE ==========
-def both_buttons_pressed(up, down):
-    return up == 0 and down == 0
-
-def key_pressed():
-    return select.select([sys.stdin], [], [], 0) == ([sys.stdin], [], [])
-
-# ========== KEYBOARD TEST MODE ==========
-def keyboard_mode():
-    global current_gain_db, compression_setting
+# ========== AMP CONSOLE (replaces keyboard test mode) ==========
+# See amp_console.py: scripted bursts or manual commands, timed per op
+READ_ONLY_BITS = {CONFIG_REGISTER: 0x1C}  # fault/thermal status in reg 0x01
+
+def verify_amp():
+    """Read all seven registers back in one transaction; mismatches vs the shadow."""
+    result = []
+    def check():
+        amp = get_amp()
+        if not amp.powered:
+            result.append(0)
+            return
+        regs = amp.bus.read_i2c_block_data(TPA2016_I2C_ADDR, 0x01, 7)
+        bad = 0
+        for reg, value in zip(range(0x01, 0x08), regs):
+            mask = ~READ_ONLY_BITS.get(reg, 0) & 0xFF
+            if value & mask != amp.shadow[reg] & mask:
+                bad += 1
+                M_READBACK_MISMATCH.inc()
+                trace.record(EV_READBACK_MISMATCH, WARN, reg, value)
+        result.append(bad)
+    i2c.submit("verify", check, shadow=False)
+    i2c.drain()
+    return result[0] if result else 1  # the read itself failed
+
+def verify_mixer():
+    # amixer reports a rounded percent; the same ±ROUNDING slack as the mixer watcher
+    current = get_current_volume()
+    if not current.endswith("%"):
+        return 1
+    return 0 if abs(int(current[:-1]) - volume.alsa_percent) <= ROUNDING else 1
+
+def make_console(sync=True, verify=False):
+    state = {"shdn": False, "sws": False}
+
+    def gain(arg):
+        if arg in ("+", "-"):
+            db = amp_base_db + (1 if arg == "+" else -1)
+        else:
+            db = int(arg)
+        if not -28 <= db <= 30:
+            raise ValueError(f"gain {db} dB out of range (-28..30)")
+        set_fixed_gain_db(db)
+
+    def comp(arg=None):
+        ratios = {"1:1": COMPRESSION_1TO1, "4:1": COMPRESSION_4TO1}
+        if arg is None:
+            toggle_compression()
+        else:
+            set_compression_ratio(ratios[arg])
+
+    def switch(name, on, off):
+        def op(arg=None):
+            state[name] = not state[name] if arg is None else arg == "on"
+            (on if state[name] else off)()
+        return op
+
+    def jack():
+        print("headphones in" if GPIO.input(JACK_SWITCH_GPIO) == 0 else "headphones out")
+
+    ops = {"up": volume_up, "down": volume_down, "gain": gain, "comp": comp,
+           "sws": switch("sws", sws_software_mute, sws_software_unmute),
+           "shdn": switch("shdn", mute_amp, unmute_amp), "jack": jack}
+    stats = lambda: {"i2c_errors": i2c.errors, "coalesced": i2c.coalesced,
+                     "recoveries": i2c.recoveries, "resyncs": i2c.resyncs, "dropped": i2c.dropped}
+    return AmpConsole(ops, settle=i2c.drain, sync=sync, stats=stats,
+                      verify=(lambda: verify_amp() + verify_mixer()) if verify else None)
+
+def setup_console_gpio():
     GPIO.setmode(GPIO.BCM)
     GPIO.setup(SHDN_GPIO, GPIO.OUT, initial=GPIO.HIGH)
     GPIO.setup(JACK_SWITCH_GPIO, GPIO.IN, pull_up_down=GPIO.PUD_UP)
 
-    print("Keyboard test mode enabled.")
-    print("Press 'u' for Volume Up, 'd' for Volume Down, 'm' for HW mute toggle (SHDN), 'b' for BOTH buttons (HW mute), 's' for SWS software mute toggle, '+' to increase gain, '-' to decrease gain, 'c' to toggle compression, 'q' to quit.")
+def auto_mute_on_jack(console):
+    # keyboard_mode's auto-mute: SHDN while headphones are in. input() blocks the
+    # console, so the switch is watched by an edge callback instead of the loop.
+    plugged = [False]
+
+    def check(_pin=None):
+        jack_in = GPIO.input(JACK_SWITCH_GPIO) == 0
+        if jack_in == plugged[0]:
+            return
+        plugged[0] = jack_in
+        trace.record(EV_JACK, INFO, int(jack_in))
+        console.ops["shdn"]("on" if jack_in else "off")
+
+    check()
+    GPIO.add_event_detect(JACK_SWITCH_GPIO, GPIO.BOTH, callback=check, bouncetime=50)
+    return check
+
+def init_console_hw():
+    # amp_console.py entry point: what __main__ below does before a mode
+    setup_console_gpio()
+    i2c.start()
+    disable_agc_and_set_gain()
+    volume.apply()
+
+def console_mode():
+    setup_console_gpio()
+    trace.echo_level = DEBUG  # interactive: show every event as it happens
     print(f"Initial fixed gain: {current_gain_db} dB")
     print(f"Initial compression ratio: {get_current_compression_label()}")
-    amp_muted = False
-    amp_sws_muted = False
-    jack_inserted = False
+    console = make_console(verify=True)
+    auto_mute_on_jack(console)
     try:
-        while True:
-            jack_state = GPIO.input(JACK_SWITCH_GPIO)
-            if jack_state == 0 and not jack_inserted:
-                print("Headphone plugged in: muting speakers (HW)")
-                if not amp_muted:
-                    mute_amp()
-                    amp_muted = True
-                jack_inserted = True
-            elif jack_state == 1 and jack_inserted:
-                print("Headphone unplugged: unmuting speakers (HW)")
-                if amp_muted:
-                    unmute_amp()
-                    amp_muted = False
-                jack_inserted = False
-
-            if key_pressed():
-                key = sys.stdin.read(1)
-                if key == 'u':
-                    volume_up()
-                elif key == 'd':
-                    volume_down()
-                elif key == 'm' or key == 'b':
-                    if amp_muted:
-                        unmute_amp()
-                        amp_muted = False
-                    else:
-                        mute_amp()
-                        amp_muted = True
-                elif key == 's':
-                    if amp_sws_muted:
-                        sws_software_unmute()
-                        amp_sws_muted = False
-                    else:
-                        sws_software_mute()
-                        amp_sws_muted = True
-                elif key == '+':
-                    if current_gain_db < 30:
-                        set_fixed_gain_db(current_gain_db + 1)
-                    else:
-                        print("Gain already at maximum (+30 dB)")
-                elif key == '-':
-                    if current_gain_db > -28:
-                        set_fixed_gain_db(current_gain_db - 1)
-                    else:
-                        print("Gain already at minimum (-28 dB)")
-                elif key == 'c':
-                    toggle_compression()
-                elif key == 'q':
-                    print("Exiting keyboard test mode.")
-                    break
-            time.sleep(DEBOUNCE_TIME)
+        console.interactive()
     finally:
         GPIO.cleanup()
 
@@ -224,46 +366,54 @@ def gpio_mode():
     GPIO.setup(JACK_SWITCH_GPIO, GPIO.IN, pull_up_down=GPIO.PUD_UP)
 
     amp_muted = False
-    already_triggered = False
     last_up = 1
     last_down = 1
     jack_inserted = False
 
+    def volume_steps(steps=1):
+        for _ in range(abs(steps)):
+            if steps > 0:
+                volume_up()
+            else:
+                volume_down()
+
+    def toggle_hw_mute():
+        nonlocal amp_muted
+        if amp_muted:
+            unmute_amp()
+            amp_muted = False
+        else:
+            mute_amp()
+            amp_muted = True
+
+    # Volume buttons go through the hotkey table (hotkeys.json, device "gpio")
+    hotkeys = HotkeyEngine({"volume": volume_steps, "mute": toggle_hw_mute,
+                            "compression": toggle_compression})
+    hotkeys.load(HOTKEYS_FILE, {"gpio": {"VOL_UP": BUTTON_UP, "VOL_DOWN": BUTTON_DOWN}.__getitem__})
+
     try:
-        print("GPIO mode: Volume up/down = GPIO 17/27, MUTE toggle = both together. Auto-mute on headphone plug.")
+        print("GPIO mode: Volume up/down = GPIO 17/27, other chords from hotkeys.json. Auto-mute on headphone plug.")
         while True:
             up = GPIO.input(BUTTON_UP)
             down = GPIO.input(BUTTON_DOWN)
             jack_state = GPIO.input(JACK_SWITCH_GPIO)
 
-            # Volume up: Only triggers on transition from high to low (button press)
-            if up == 0 and last_up == 1 and down == 1:
-                volume_up()
-            # Volume down: Only triggers on transition from high to low (button press)
-            if down == 0 and last_down == 1 and up == 1:
-                volume_down()
-
-            # Combo for mute/unmute (triggers once per combo press, hardware mute)
-            if both_buttons_pressed(up, down) and not already_triggered:
-                if amp_muted:
-                    unmute_amp()
-                    amp_muted = False
-                else:
-                    mute_amp()
-                    amp_muted = True
-                already_triggered = True
-            elif not both_buttons_pressed(up, down):
-                already_triggered = False
+            # Only transitions are fed in; the engine tracks held keys and chords
+            if up != last_up:
+                hotkeys.feed("gpio", BUTTON_UP, up == 0)
+            if down != last_down:
+                hotkeys.feed("gpio", BUTTON_DOWN, down == 0)
+            hotkeys.tick()
 
             # Auto mute/unmute on headphone plug (hardware mute)
             if jack_state == 0 and not jack_inserted:
-                print("Headphone plugged in: muting speakers (HW)")
+                trace.record(EV_JACK, INFO, 1)
                 if not amp_muted:
                     mute_amp()
                     amp_muted = True
                 jack_inserted = True
             elif jack_state == 1 and jack_inserted:
-                print("Headphone unplugged: unmuting speakers (HW)")
+                trace.record(EV_JACK, INFO, 0)
                 if amp_muted:
                     unmute_amp()
                     amp_muted = False
@@ -272,7 +422,7 @@ def gpio_mode():
             last_up = up
             last_down = down
 
-            time.sleep(DEBOUNCE_TIME)
+            time.sleep(PROFILES[POWER_PROFILE].poll_interval)
     except KeyboardInterrupt:
         print("\nExiting.")
     finally:
@@ -280,15 +430,20 @@ def gpio_mode():
 
 # ========== MAIN ==========
 if __name__ == "__main__":
-    current_gain_db = FIXED_GAIN_DB
+    current_gain_db = amp_base_db = FIXED_GAIN_DB
     compression_setting = COMPRESSION_1TO1
+    trace.install_signal_dump()
+    metrics.start_exporter(os.path.join(metrics.TEXTFILE_DIR, METRICS_TEXTFILE),
+                           http_addr=("127.0.0.1", METRICS_PORT))
+    i2c.start()
     disable_agc_and_set_gain()  # At startup
+    volume.apply()  # Put both gain stages on the curve
 
     if sys.stdin.isatty():
-        mode = input("Select mode: [g]pio or [k]eyboard? ").strip().lower()
-        if mode == 'k':
+        mode = input("Select mode: [g]pio or [c]onsole? ").strip().lower()
+        if mode in ('c', 'k'):
             print("\nNOTE: SHDN_GPIO is currently set to GPIO 16 (change back to 22 later!)\n")
-            keyboard_mode()
+            console_mode()
         else:
             print("\nNOTE: SHDN_GPIO is currently set to GPIO 16 (change back to 22 later!)\n")
             gpio_mode()